@@ -0,0 +1,112 @@
+# benchmarks/bench_anomaly_sink.py
+"""
+anomaly DB 쓰기 처리량 벤치마크.
+
+패킷 단위 (한 번에 --rows-per-call 행) 로 들어오는 이상 탐지 결과를 세 가지 방식으로 SQLite 임시 파일에 씁니다.
+- per_call: 호출마다 새 sqlite3 커넥션 + DataFrame.to_sql (기본 journal 설정, 이전 insert_anomalies 방식)
+- insert_anomalies: 호출마다 공유 sink 에 넣고 commit 까지 기다림 (동기)
+- sink: AnomalySink.add_rows 만 호출하고 마지막에 한 번 flush (--producers 개 스레드가 동시에 씀)
+
+    python benchmarks/bench_anomaly_sink.py --calls 20000 --producers 4
+"""
+import argparse
+import contextlib
+import io
+import os
+import sqlite3
+import sys
+import tempfile
+import threading
+import time
+
+import pandas as pd
+
+project_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if project_root not in sys.path:
+    sys.path.append(project_root)
+
+from db_utils import ANOMALY_TABLE_SQL, AnomalySink, close_anomaly_sinks, insert_anomalies
+
+
+def make_rows(n_rows, offset=0):
+    return [(f"2025-05-11 16:{(i // 60) % 60:02d}:{i % 60:02d}", f"client-{i % 50}", f"sensor/{i % 7}/temp",
+             i % 3, 'dos' if i % 2 else 'bruteforce', 'legitimate') for i in range(offset, offset + n_rows)]
+
+
+def frame(rows):
+    return pd.DataFrame(rows, columns=['timestamp', 'client_id', 'topic', 'qos', 'prediction', 'true_label'])
+
+
+def bench_per_call(db_path, calls, rows_per_call):
+    connection = sqlite3.connect(db_path)
+    connection.execute(ANOMALY_TABLE_SQL)
+    connection.close()
+    for i in range(calls):
+        connection = sqlite3.connect(db_path)
+        frame(make_rows(rows_per_call, i * rows_per_call)).to_sql('anomalies', connection, if_exists='append', index=False)
+        connection.close()
+
+
+def bench_insert_anomalies(db_path, calls, rows_per_call):
+    with contextlib.redirect_stdout(io.StringIO()):
+        for i in range(calls):
+            insert_anomalies(frame(make_rows(rows_per_call, i * rows_per_call)), db_path=db_path)
+    close_anomaly_sinks()
+
+
+def bench_sink(db_path, calls, rows_per_call, producers, batch_size, flush_interval):
+    sink = AnomalySink(db_path, batch_size=batch_size, flush_interval=flush_interval)
+
+    def produce(worker):
+        for i in range(worker, calls, producers):
+            sink.add_rows(make_rows(rows_per_call, i * rows_per_call))
+
+    threads = [threading.Thread(target=produce, args=(w,)) for w in range(producers)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    sink.close()
+    return sink.stats()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark anomaly DB write paths")
+    parser.add_argument('--calls', type=int, default=20000, help="쓰기 호출 수 (sink 방식)")
+    parser.add_argument('--per-call-calls', type=int, default=500, help="per_call / insert_anomalies 방식의 호출 수 (느림)")
+    parser.add_argument('--rows-per-call', type=int, default=1)
+    parser.add_argument('--producers', type=int, default=4, help="sink 에 동시에 넣는 스레드 수")
+    parser.add_argument('--batch-size', type=int, default=1000)
+    parser.add_argument('--flush-interval', type=float, default=0.5)
+    args = parser.parse_args()
+
+    results = []
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        for name in ('per_call', 'insert_anomalies', 'sink'):
+            db_path = os.path.join(tmp_dir, f'{name}.db')
+            calls = args.calls if name == 'sink' else args.per_call_calls
+            start = time.perf_counter()
+            if name == 'per_call':
+                bench_per_call(db_path, calls, args.rows_per_call)
+            elif name == 'insert_anomalies':
+                bench_insert_anomalies(db_path, calls, args.rows_per_call)
+            else:
+                stats = bench_sink(db_path, calls, args.rows_per_call, args.producers, args.batch_size,
+                                   args.flush_interval)
+            elapsed = time.perf_counter() - start
+            with sqlite3.connect(db_path) as connection:
+                loaded = connection.execute("SELECT COUNT(*) FROM anomalies").fetchone()[0]
+            if loaded != calls * args.rows_per_call:
+                raise AssertionError(f"{name}: expected {calls * args.rows_per_call} rows, found {loaded}")
+            results.append((name, loaded, elapsed, loaded / elapsed))
+
+    print(f"\nRows per call: {args.rows_per_call}, sink producers: {args.producers}, batch size: {args.batch_size}")
+    print(f"{'method':<18}{'rows':>10}{'seconds':>10}{'rows/sec':>14}")
+    for name, rows, elapsed, rows_per_sec in results:
+        print(f"{name:<18}{rows:>10}{elapsed:>10.3f}{rows_per_sec:>14,.0f}")
+    print(f"sink: {stats['flushes']} flushes, avg {stats['avg_flush_rows']:.0f} rows, max {stats['max_flush_ms']:.1f} ms, "
+          f"insert throughput {stats['insert_rows_per_sec']:,.0f} rows/s")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,100 @@
+# benchmarks/bench_db_writers.py
+"""
+db_loader 적재 방식별 처리량 벤치마크.
+
+전처리 결과와 같은 형태의 DataFrame 을 만들어 방식마다 별도 테이블에 적재하고 rows/sec 을 출력합니다.
+기본값은 SQLite 임시 파일 (MySQL 대용) 이며, --url 로 로컬 MySQL 을 지정할 수 있습니다.
+load_data 는 MySQL 에서만 실제 LOAD DATA LOCAL INFILE 을 사용합니다 (그 외에는 executemany 로 대체).
+
+    python benchmarks/bench_db_writers.py --rows 200000
+    python benchmarks/bench_db_writers.py --url "mysql+mysqlconnector://user:pw@localhost:3306/bench" --rows 1000000
+"""
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+import numpy as np
+import pandas as pd
+from sqlalchemy import create_engine, text
+
+project_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if project_root not in sys.path:
+    sys.path.append(project_root)
+
+from src.database.db_utils import create_target_table_if_not_exists
+from src.data_processing.db_loader import load_data_to_db, WRITE_METHODS
+
+
+def make_processed_frame(n_rows, seed=0):
+    """preprocess_for_new_schema 출력과 같은 컬럼 구성의 합성 데이터."""
+    rng = np.random.default_rng(seed)
+    timestamp = pd.to_datetime(1.6e9 + np.sort(rng.random(n_rows)) * 3600, unit='s')
+    df = pd.DataFrame({
+        'timestamp': timestamp,
+        'ip_src': rng.choice(['10.0.0.1', '10.0.0.2', '192.168.0.7'], size=n_rows).astype(object),
+        'ip_dst': '10.0.0.254',
+        'tcp_srcport': rng.integers(1024, 65535, size=n_rows).astype(float),
+        'tcp_dstport': 1883.0,
+        'frame_len': rng.integers(60, 1500, size=n_rows).astype(float),
+        'client_id': rng.choice(np.array(['sensor-1', 'sensor-2', np.nan], dtype=object), size=n_rows),
+        'topic': rng.choice(np.array(['home/temp', 'home/humidity', np.nan], dtype=object), size=n_rows),
+        'mqtt_len': rng.choice([np.nan, 12.0, 2048.0], size=n_rows),
+        'payload': rng.choice(np.array(['21.5', 'tab\there', 'line\nbreak', 'back\\slash', np.nan], dtype=object), size=n_rows),
+        'msg_type': rng.choice([np.nan, 1.0, 3.0, 12.0], size=n_rows),
+        'ip_proto': 6.0,
+        'attack_type': 'Legitimate_MQTT',
+        'is_anomaly': np.zeros(n_rows, dtype=np.int8),
+    })
+    df['date'] = df['timestamp'].dt.strftime('%Y-%m-%d')
+    df['time'] = df['timestamp'].dt.strftime('%H:%M:%S.%f')
+    return df
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark db_loader write methods")
+    parser.add_argument('--url', default=None, help="SQLAlchemy URL (기본값: 임시 SQLite 파일)")
+    parser.add_argument('--rows', type=int, default=200000)
+    parser.add_argument('--batch-size', type=int, default=10000)
+    parser.add_argument('--methods', nargs='+', default=list(WRITE_METHODS), choices=list(WRITE_METHODS))
+    args = parser.parse_args()
+
+    tmp_dir = None
+    url = args.url
+    if url is None:
+        tmp_dir = tempfile.TemporaryDirectory()
+        url = f"sqlite:///{os.path.join(tmp_dir.name, 'bench.db')}"
+    connect_args = {'allow_local_infile': True} if url.startswith('mysql+mysqlconnector') else {}
+    engine = create_engine(url, connect_args=connect_args)
+
+    df = make_processed_frame(args.rows)
+    results = []
+    for method in args.methods:
+        table_name = f"bench_logs_{method}"
+        with engine.begin() as connection:
+            connection.execute(text(f"DROP TABLE IF EXISTS {table_name}"))
+        create_target_table_if_not_exists(engine, engine.url.database, table_name)
+
+        start = time.perf_counter()
+        load_data_to_db(df, table_name, engine, method=method, batch_size=args.batch_size)
+        elapsed = time.perf_counter() - start
+
+        with engine.connect() as connection:
+            loaded = connection.execute(text(f"SELECT COUNT(*) FROM {table_name}")).scalar()
+        if loaded != len(df):
+            raise AssertionError(f"{method}: expected {len(df)} rows, found {loaded}")
+        results.append((method, elapsed, len(df) / elapsed))
+
+    print(f"\nBackend: {engine.dialect.name}, rows: {args.rows}, batch size: {args.batch_size}")
+    print(f"{'method':<14}{'seconds':>10}{'rows/sec':>14}")
+    for method, elapsed, rows_per_sec in results:
+        print(f"{method:<14}{elapsed:>10.3f}{rows_per_sec:>14,.0f}")
+
+    engine.dispose()
+    if tmp_dir is not None:
+        tmp_dir.cleanup()
+
+
+if __name__ == "__main__":
+    main()
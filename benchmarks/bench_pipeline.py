@@ -0,0 +1,227 @@
+# benchmarks/bench_pipeline.py
+"""
+합성 데이터로 파이프라인 단계별 시간을 재는 end-to-end 벤치마크.
+
+데이터 크기마다 synthetic_traffic 으로 클래스별 CSV 를 만들고 다음 단계를 순서대로 실행합니다.
+    load_raw_data               원본 CSV 읽기 (columns.keep + schema read dtype)
+    preprocess_for_new_schema   전처리 + 라벨링
+    load_data_to_db             SQLite 임시 DB 에 적재 (--write-method)
+    build_dataset               preprocessing.build_augmented_dataset 으로 train/test CSV 생성
+    load_data                   train_model.load_data (인코딩 + 스케일링)
+    train:<model>               모델 학습 (--models)
+    predict:<model>             X_test 예측 (트리 모델은 tree_compiler 예측도 predict_compiled:<model>)
+결과는 JSON (커밋, 환경, 단계별 seconds / rows / rows_per_sec) 으로 저장하고,
+--compare 로 이전 결과를 주면 단계별 비율을 출력해 커밋 간 회귀를 확인할 수 있습니다.
+
+    python benchmarks/bench_pipeline.py --sizes 10000 100000
+    python benchmarks/bench_pipeline.py --sizes 100000 --compare benchmarks/results/<이전 결과>.json
+"""
+import argparse
+import contextlib
+import io
+import json
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+import time
+
+import numpy as np
+import pandas as pd
+import yaml
+from sqlalchemy import create_engine
+
+project_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if project_root not in sys.path:
+    sys.path.append(project_root)
+
+from benchmarks.synthetic_traffic import DEFAULT_CONFIG_PATH, generate_dataset, parse_mix
+from preprocessing import AUGMENTED_DATASET_PLAN, build_augmented_dataset
+from src.data_processing.db_loader import WRITE_METHODS, load_data_to_db
+from src.data_processing.loader import load_raw_data
+from src.data_processing.preprocessor import preprocess_for_new_schema
+from src.data_processing.schema import raw_read_dtypes
+from src.database.db_utils import create_target_table_if_not_exists
+from train_model import MODEL_SPECS, build_model, load_data
+
+DEFAULT_RESULTS_DIR = os.path.join(project_root, 'benchmarks', 'results')
+# 원본 파일 이름 -> 학습 라벨 (preprocessing.AUGMENTED_DATASET_PLAN 과 동일)
+_FILE_LABELS = {os.path.basename(entry['path']): entry['label'] for entry in AUGMENTED_DATASET_PLAN}
+_REGRESSION_RATIO = 1.2
+_MIN_COMPARE_SECONDS = 0.05 # 이보다 짧은 단계는 측정 잡음이 커서 회귀로 표시하지 않음
+
+
+def environment_info():
+    import sklearn
+
+    def git(*args):
+        try:
+            return subprocess.run(['git', *args], cwd=project_root, capture_output=True, text=True,
+                                  check=True).stdout.strip()
+        except (OSError, subprocess.CalledProcessError):
+            return None
+
+    return {
+        'commit': git('rev-parse', '--short', 'HEAD'),
+        'dirty': bool(git('status', '--porcelain', '--untracked-files=no')),
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'cpu_count': os.cpu_count(),
+        'numpy': np.__version__,
+        'pandas': pd.__version__,
+        'sklearn': sklearn.__version__,
+    }
+
+
+class StageTimer:
+    def __init__(self, verbose=False):
+        self.verbose = verbose
+        self.results = []
+
+    @contextlib.contextmanager
+    def stage(self, size, name, rows):
+        """with 블록의 실행 시간을 기록합니다. verbose 가 아니면 단계 안의 print 출력은 숨깁니다."""
+        output = contextlib.nullcontext() if self.verbose else contextlib.redirect_stdout(io.StringIO())
+        start = time.perf_counter()
+        with output:
+            yield
+        seconds = time.perf_counter() - start
+        result = {'size': size, 'stage': name, 'seconds': round(seconds, 4), 'rows': int(rows),
+                  'rows_per_sec': round(rows / seconds, 1) if seconds > 0 else None}
+        self.results.append(result)
+        print(f"  {name:<36}{seconds:>9.3f}s{int(rows):>12} rows"
+              + (f"{result['rows_per_sec']:>14,.0f} rows/s" if result['rows_per_sec'] else ""))
+
+
+def run_size(size, args, config, timer, work_dir):
+    print(f"\n=== size {size} ===")
+    data_dir = os.path.join(work_dir, f'raw_{size}')
+    with timer.stage(size, 'generate', size):
+        files = generate_dataset(data_dir, size, mix=parse_mix(args.mix), seed=args.seed, config_path=args.config)
+
+    columns_config = config['columns']
+    labeling_config = config.get('anomaly_labeling')
+    read_dtypes = raw_read_dtypes(columns_config['keep'])
+    raw_frames = {}
+    with timer.stage(size, 'load_raw_data', size):
+        for filename, info in files.items():
+            raw_frames[filename] = load_raw_data(info['path'], usecols=columns_config['keep'], dtype=read_dtypes)
+
+    processed = {}
+    with timer.stage(size, 'preprocess_for_new_schema', size):
+        for filename, info in files.items():
+            processed[filename] = preprocess_for_new_schema(
+                raw_frames[filename], columns_config['keep'], columns_config['rename'],
+                source_file_info={'filename': filename, 'assumed_attack_type': info['assumed_attack_type']},
+                labeling_config=labeling_config)
+    del raw_frames
+
+    db_path = os.path.join(work_dir, f'bench_{size}.db')
+    engine = create_engine(f"sqlite:///{db_path}")
+    with contextlib.redirect_stdout(io.StringIO()):
+        create_target_table_if_not_exists(engine, engine.url.database, 'bench_logs')
+    with timer.stage(size, f'load_data_to_db:{args.write_method}', size):
+        for df in processed.values():
+            load_data_to_db(df, 'bench_logs', engine, method=args.write_method)
+    engine.dispose()
+    del processed
+
+    # 학습 데이터셋: 파일별 라벨로 70/30 분할 후 셔플
+    plan = []
+    for filename, info in files.items():
+        n_train = int(info['rows'] * 0.7)
+        plan.append({'path': info['path'], 'label': _FILE_LABELS.get(filename, info['assumed_attack_type']),
+                     'segments': [{'head': None, 'repeat': 1}], 'train': n_train, 'test': info['rows'] - n_train})
+    train_path = os.path.join(work_dir, f'train_{size}.csv')
+    test_path = os.path.join(work_dir, f'test_{size}.csv')
+    with timer.stage(size, 'build_dataset', size):
+        build_augmented_dataset(plan, train_path, test_path, tmp_dir=work_dir)
+
+    with timer.stage(size, 'load_data', size):
+        X_train, y_train, X_test, y_test, _, _ = load_data(train_path, test_path)
+
+    for name in args.models:
+        model = build_model(name, n_jobs=args.n_jobs)
+        if hasattr(model, 'verbose'):
+            model.set_params(verbose=0)
+        with timer.stage(size, f'train:{name}', len(X_train)):
+            model.fit(X_train, y_train)
+        with timer.stage(size, f'predict:{name}', len(X_test)):
+            model.predict(X_test)
+        if MODEL_SPECS[name]['compiled_path']:
+            from tree_compiler import compile_tree_model
+            compiled = compile_tree_model(model)
+            with timer.stage(size, f'predict_compiled:{name}', len(X_test)):
+                compiled.predict(X_test)
+
+
+def compare_results(current, previous):
+    """(size, stage) 가 같은 항목의 시간 비율을 출력하고 회귀 (비율 > 1.2) 개수를 반환합니다."""
+    before = {(r['size'], r['stage']): r['seconds'] for r in previous['results']}
+    print(f"\nComparison with {previous['environment'].get('commit')} ({previous.get('created_at')})")
+    print(f"{'size':>10}  {'stage':<36}{'before (s)':>12}{'now (s)':>10}{'ratio':>8}")
+    regressions = 0
+    for result in current['results']:
+        key = (result['size'], result['stage'])
+        if key not in before or result['stage'] == 'generate' or not before[key]:
+            continue
+        ratio = result['seconds'] / before[key]
+        flag = ''
+        if ratio > _REGRESSION_RATIO and before[key] >= _MIN_COMPARE_SECONDS:
+            flag = '  REGRESSION'
+            regressions += 1
+        print(f"{result['size']:>10}  {result['stage']:<36}{before[key]:>12.3f}{result['seconds']:>10.3f}{ratio:>8.2f}{flag}")
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="End-to-end pipeline stage benchmark on synthetic MQTT data")
+    parser.add_argument('--sizes', type=int, nargs='+', default=[10000, 100000], help="전체 원본 행 수 목록")
+    parser.add_argument('--mix', nargs='*', default=None, metavar='ATTACK_TYPE=WEIGHT', help="클래스 비율 (기본값: 균등)")
+    parser.add_argument('--models', nargs='*', default=['dt', 'rf', 'nb'], choices=list(MODEL_SPECS))
+    parser.add_argument('--n-jobs', type=int, default=-1, help="병렬 모델 (rf) 의 n_jobs")
+    parser.add_argument('--write-method', default='executemany', choices=list(WRITE_METHODS))
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--config', default=DEFAULT_CONFIG_PATH)
+    parser.add_argument('--output', default=None, help="결과 JSON 경로 (기본값: benchmarks/results/ 아래)")
+    parser.add_argument('--compare', default=None, help="비교할 이전 결과 JSON")
+    parser.add_argument('--work-dir', default=None, help="중간 파일 디렉터리 (기본값: 임시 디렉터리, 끝나면 삭제)")
+    parser.add_argument('--verbose', action='store_true', help="단계 내부 출력도 표시")
+    args = parser.parse_args(argv)
+
+    with open(args.config, 'r', encoding='utf-8') as f:
+        config = yaml.safe_load(f)
+    timer = StageTimer(verbose=args.verbose)
+    created_at = time.strftime('%Y-%m-%dT%H:%M:%S')
+    with contextlib.ExitStack() as stack:
+        work_dir = args.work_dir or stack.enter_context(tempfile.TemporaryDirectory(prefix='bench_pipeline_'))
+        os.makedirs(work_dir, exist_ok=True)
+        for size in args.sizes:
+            run_size(size, args, config, timer, work_dir)
+
+    report = {
+        'created_at': created_at,
+        'environment': environment_info(),
+        'parameters': {'sizes': args.sizes, 'mix': args.mix, 'models': args.models, 'n_jobs': args.n_jobs,
+                       'write_method': args.write_method, 'seed': args.seed},
+        'results': timer.results,
+    }
+    output = args.output or os.path.join(
+        DEFAULT_RESULTS_DIR, f"bench_pipeline_{time.strftime('%Y%m%d-%H%M%S')}_{report['environment']['commit'] or 'nogit'}.json")
+    output_dir = os.path.dirname(output)
+    if output_dir:
+        os.makedirs(output_dir, exist_ok=True)
+    with open(output, 'w', encoding='utf-8') as f:
+        json.dump(report, f, indent=2)
+    print(f"\nResults written to {output}")
+
+    if args.compare:
+        with open(args.compare, 'r', encoding='utf-8') as f:
+            regressions = compare_results(report, json.load(f))
+        return 1 if regressions else 0
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
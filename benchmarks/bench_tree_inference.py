@@ -0,0 +1,113 @@
+# benchmarks/bench_tree_inference.py
+"""
+tree_compiler 로 변환한 모델과 sklearn predict 의 parity 검사 + 배치 크기별 지연 벤치마크.
+
+--model 로 저장된 모델 (models/rf_model.pkl 등) 을 주면 그 모델을, 아니면 합성 데이터로
+DecisionTree / RandomForest / GradientBoosting 을 학습해서 비교합니다.
+
+    python benchmarks/bench_tree_inference.py --batch-sizes 1 64 4096 1000000
+    python benchmarks/bench_tree_inference.py --model models/rf_model.pkl --features 30
+"""
+import argparse
+import os
+import sys
+import time
+
+import numpy as np
+
+project_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if project_root not in sys.path:
+    sys.path.append(project_root)
+
+from tree_compiler import compile_tree_model, CompiledTreeEnsemble
+
+
+def make_synthetic_data(n_rows, n_features, n_classes, seed=42):
+    rng = np.random.default_rng(seed)
+    X = rng.normal(size=(n_rows, n_features))
+    logits = X[:, :n_classes] * 2.0 + 0.5 * X[:, n_classes:2 * n_classes].sum(axis=1, keepdims=True)
+    y = np.array(['legitimate', 'dos', 'bruteforce', 'flood', 'malformed', 'slowite'])[np.argmax(logits, axis=1)]
+    return X, y
+
+
+def train_synthetic_models(X, y):
+    from sklearn.ensemble import GradientBoostingClassifier, RandomForestClassifier
+    from sklearn.tree import DecisionTreeClassifier
+
+    print(f"Training synthetic models on {X.shape[0]} rows x {X.shape[1]} features...")
+    return {
+        'Decision Tree': DecisionTreeClassifier(random_state=42).fit(X, y),
+        'Random Forest': RandomForestClassifier(random_state=42, n_jobs=-1).fit(X, y),
+        'Gradient Boost': GradientBoostingClassifier(n_estimators=50, random_state=42).fit(X, y),
+    }
+
+
+def time_per_call(fn, X, batch_size, min_seconds=0.5, max_calls=1000):
+    """batch_size 행씩 잘라 fn 을 반복 호출하고 (호출당 평균 초, rows/sec) 를 반환합니다."""
+    n_batches = max(1, len(X) // batch_size)
+    calls = 0
+    start = time.perf_counter()
+    while True:
+        i = calls % n_batches
+        fn(X[i * batch_size:(i + 1) * batch_size])
+        calls += 1
+        elapsed = time.perf_counter() - start
+        if elapsed >= min_seconds or calls >= max_calls:
+            break
+    per_call = elapsed / calls
+    return per_call, batch_size / per_call
+
+
+def check_parity(model, compiled, X):
+    expected = model.predict(X)
+    actual = compiled.predict(X)
+    mismatches = int(np.sum(expected != actual))
+    proba_diff = float(np.max(np.abs(model.predict_proba(X) - compiled.predict_proba(X))))
+    return mismatches, proba_diff
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark compiled tree inference against sklearn")
+    parser.add_argument('--model', default=None, help="joblib 으로 저장된 트리 모델 (기본값: 합성 데이터로 학습)")
+    parser.add_argument('--features', type=int, default=30, help="합성 입력의 feature 수 (--model 사용 시 모델에 맞춰 지정)")
+    parser.add_argument('--train-rows', type=int, default=50000)
+    parser.add_argument('--batch-sizes', type=int, nargs='+', default=[1, 64, 4096, 1000000])
+    args = parser.parse_args()
+
+    if args.model:
+        import joblib
+        models = {os.path.basename(args.model): joblib.load(args.model)}
+        n_features = next(iter(models.values())).n_features_in_
+    else:
+        n_features = args.features
+        X_train, y_train = make_synthetic_data(args.train_rows, n_features, 6)
+        models = train_synthetic_models(X_train, y_train)
+
+    X_eval = make_synthetic_data(max(args.batch_sizes), n_features, 6, seed=7)[0]
+    for name, model in models.items():
+        if hasattr(model, 'n_jobs'):
+            model.set_params(n_jobs=-1) # 학습 설정 그대로 (rf_model 은 n_jobs=-1)
+        start = time.perf_counter()
+        compiled = compile_tree_model(model)
+        compiled.save('/tmp/_bench_compiled.npz')
+        compile_seconds = time.perf_counter() - start
+        start = time.perf_counter()
+        compiled = CompiledTreeEnsemble.load('/tmp/_bench_compiled.npz')
+        load_seconds = time.perf_counter() - start
+        size_mb = os.path.getsize('/tmp/_bench_compiled.npz') / 1e6
+        os.remove('/tmp/_bench_compiled.npz')
+
+        mismatches, proba_diff = check_parity(model, compiled, X_eval[:200000])
+        print(f"\n=== {name}: {compiled.n_trees} trees, {len(compiled.feature)} nodes, max depth {compiled.max_depth} ===")
+        print(f"compile+save {compile_seconds:.2f}s, load {load_seconds * 1000:.1f} ms, artifact {size_mb:.1f} MB")
+        print(f"parity: {mismatches} mismatched predictions, max |proba diff| {proba_diff:.2e}")
+        print(f"{'batch':>10}{'sklearn ms/call':>18}{'compiled ms/call':>18}{'sklearn rows/s':>16}{'compiled rows/s':>17}{'speedup':>9}")
+        for batch_size in args.batch_sizes:
+            sk_call, sk_rate = time_per_call(model.predict, X_eval, batch_size)
+            cp_call, cp_rate = time_per_call(compiled.predict, X_eval, batch_size)
+            print(f"{batch_size:>10}{sk_call * 1000:>18.3f}{cp_call * 1000:>18.3f}{sk_rate:>16.0f}{cp_rate:>17.0f}"
+                  f"{sk_call / cp_call:>8.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,305 @@
+# benchmarks/synthetic_traffic.py
+"""
+seed 로 재현 가능한 합성 MQTT 트래픽 생성기.
+
+config.yaml 의 data.file_list 항목 (assumed_attack_type) 마다 클래스 특성 (메시지 타입 분포, 패킷 속도,
+클라이언트 수, payload 크기, MQTT 가 아닌 트래픽 비율) 을 흉내 낸 CSV 를 만듭니다.
+컬럼은 columns.keep (tshark 필드 이름) 과 학습용 데이터셋에 남는 MQTT/TCP 필드 (FEATURE_COLUMNS) 이고,
+mqtt.len / frame.len 은 실제 패킷 바이트 수와 일치하므로 --pcap 으로 같은 행을 pcap 파일로도 쓸 수 있습니다.
+
+    python benchmarks/synthetic_traffic.py --out data/synthetic --rows 1000000
+    python benchmarks/synthetic_traffic.py --out data/synthetic --rows 200000 \
+        --mix Legitimate=0.5 MQTT_Flood=0.2 BruteForce_Attempt=0.3 --pcap
+
+생성된 디렉터리를 data.base_dir 로 쓰면 run_pipeline.py 로 그대로 적재할 수 있습니다.
+"""
+import argparse
+import os
+import socket
+import struct
+import sys
+
+import numpy as np
+import pandas as pd
+import yaml
+
+project_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if project_root not in sys.path:
+    sys.path.append(project_root)
+
+DEFAULT_CONFIG_PATH = os.path.join(project_root, 'config', 'config.yaml')
+
+# columns.keep 외에 함께 쓰는 필드 (preprocessing.cleandata 가 지우지 않아 학습 feature 로 남는 컬럼)
+FEATURE_COLUMNS = [
+    'tcp.flags', 'tcp.len', 'mqtt.hdrflags', 'mqtt.qos', 'mqtt.retain', 'mqtt.dupflag',
+    'mqtt.conflags', 'mqtt.kalive', 'mqtt.ver', 'mqtt.protoname',
+]
+
+# msg_type: MQTT 메시지 타입 -> 확률 (NaN 은 1883 포트의 해석 불가 패킷)
+# rate: 초당 패킷 수, clients: 서로 다른 client 수, payload: PUBLISH payload 바이트 범위,
+# large_payload: payload 가 1000~4000 바이트인 PUBLISH 비율, non_mqtt: MQTT 가 아닌 패킷 비율
+CLASS_PROFILES = {
+    'Legitimate': {'msg_type': {3: .45, 4: .1, 12: .1, 13: .1, 1: .05, 2: .05, 8: .05, 9: .05, 14: .05},
+                   'rate': 50, 'clients': 20, 'payload': (4, 64), 'large_payload': 0.0, 'non_mqtt': 0.1},
+    'MQTT_Flood': {'msg_type': {3: .85, 4: .05, 1: .05, 2: .05},
+                   'rate': 2000, 'clients': 3, 'payload': (16, 512), 'large_payload': 0.05, 'non_mqtt': 0.02},
+    'BruteForce_Attempt': {'msg_type': {1: .6, 2: .3, 14: .1},
+                           'rate': 300, 'clients': 5000, 'payload': (4, 32), 'large_payload': 0.0, 'non_mqtt': 0.05},
+    'Malformed_Packet': {'msg_type': {3: .3, 1: .1, np.nan: .3, 0: .15, 15: .15},
+                         'rate': 100, 'clients': 10, 'payload': (1, 128), 'large_payload': 0.0, 'non_mqtt': 0.1},
+    'Slowloris_Like': {'msg_type': {1: .45, 2: .1, 12: .35, 13: .1},
+                       'rate': 20, 'clients': 200, 'payload': (4, 32), 'large_payload': 0.0, 'non_mqtt': 0.2},
+    'Malware_Traffic': {'msg_type': {3: .4, 1: .1, 2: .1, 12: .1, 13: .1, 4: .2},
+                        'rate': 100, 'clients': 30, 'payload': (16, 256), 'large_payload': 0.3, 'non_mqtt': 0.2},
+}
+DEFAULT_PROFILE = 'Legitimate'
+
+_BROKER_IP = '10.0.0.254'
+_MQTT_PORT = 1883
+# 브로커 -> 클라이언트 방향 메시지 (CONNACK, PUBACK, SUBACK, PINGRESP)
+_FROM_BROKER = (2, 4, 9, 13)
+_TOPIC_WORDS = np.array(['home', 'plant', 'sensors', 'line1', 'line2', 'room', 'hvac', 'meter'])
+_METRIC_WORDS = np.array(['temp', 'humidity', 'pressure', 'power', 'status', 'co2', 'door', 'light'])
+_HEADER_BYTES = 14 + 20 + 20 # Ethernet + IPv4 + TCP (옵션 없음)
+
+
+def load_file_list(config_path=DEFAULT_CONFIG_PATH):
+    """config.yaml 에서 (columns.keep, data.file_list) 를 읽습니다."""
+    with open(config_path, 'r', encoding='utf-8') as f:
+        config = yaml.safe_load(f) or {}
+    return config['columns']['keep'], config['data']['file_list']
+
+
+def _varint_size(values):
+    return 1 + (values >= 128) + (values >= 16384) + (values >= 2097152)
+
+
+def generate_class_frame(attack_type, n_rows, seed=0, start_epoch=1.6e9, columns_keep=None):
+    """
+    assumed_attack_type 하나의 합성 패킷 n_rows 개를 tshark 필드 이름 컬럼의 DataFrame 으로 만듭니다.
+    columns_keep 이 주어지면 그 컬럼 + FEATURE_COLUMNS 만 (그 순서로) 남깁니다.
+    """
+    profile = CLASS_PROFILES.get(attack_type, CLASS_PROFILES[DEFAULT_PROFILE])
+    rng = np.random.default_rng(seed)
+    n = int(n_rows)
+
+    timestamps = start_epoch + np.cumsum(rng.exponential(1.0 / profile['rate'], size=n))
+    type_values = np.array(list(profile['msg_type']), dtype=np.float64)
+    type_probs = np.array(list(profile['msg_type'].values()), dtype=np.float64)
+    msg_type = rng.choice(type_values, size=n, p=type_probs / type_probs.sum())
+    non_mqtt = rng.random(n) < profile['non_mqtt']
+    msg_type[non_mqtt] = np.nan
+    is_mqtt = ~non_mqtt
+    has_type = is_mqtt & ~np.isnan(msg_type)
+    mt = np.where(has_type, msg_type, -1).astype(np.int64)
+
+    client_index = rng.integers(0, profile['clients'], size=n)
+    client_ip = np.array([f'10.0.{i // 250}.{i % 250 + 1}' for i in range(profile['clients'])], dtype=object)[client_index]
+    client_port = 30000 + (client_index * 7 + rng.integers(0, 50, size=n)) % 30000
+    from_broker = np.isin(mt, _FROM_BROKER)
+    client_ids = np.array([f'{attack_type.lower()}-{i:05d}' for i in range(profile['clients'])], dtype=object)
+
+    # 토픽 / payload / qos
+    topic_pool = np.array([f'{a}/{b}/{c}' for a in _TOPIC_WORDS for b in range(4) for c in _METRIC_WORDS], dtype=object)
+    topic = topic_pool[rng.integers(0, len(topic_pool), size=n)]
+    low, high = profile['payload']
+    payload_len = rng.integers(low, high + 1, size=n)
+    large = rng.random(n) < profile['large_payload']
+    payload_len[large] = rng.integers(1000, 4001, size=int(large.sum()))
+    qos = np.where(mt == 3, rng.choice([0, 1, 2], size=n, p=[.7, .2, .1]), 0)
+    retain = np.where(mt == 3, (rng.random(n) < 0.05).astype(np.int64), 0)
+
+    # remaining length (MQTT 3.1.1 형식)
+    topic_len = np.fromiter((len(t) for t in topic), dtype=np.int64, count=n)
+    client_id_len = np.fromiter((len(c) for c in client_ids[client_index]), dtype=np.int64, count=n)
+    remaining = np.select(
+        [mt == 1, mt == 3, mt == 8, np.isin(mt, (2, 4)), mt == 9, np.isin(mt, (0, 15))],
+        [10 + 2 + client_id_len, 2 + topic_len + np.where(qos > 0, 2, 0) + payload_len, 2 + 2 + topic_len + 1, 2, 3,
+         payload_len],
+        default=0)
+    mqtt_bytes = 1 + _varint_size(remaining) + remaining
+    unparsable = is_mqtt & ~has_type # 1883 포트지만 MQTT 로 해석되지 않는 segment
+    other_len = rng.integers(0, 1200, size=n)
+    tcp_len = np.where(has_type, mqtt_bytes, other_len)
+    udp = non_mqtt & (rng.random(n) < 0.3)
+    frame_len = np.where(udp, 14 + 20 + 8 + other_len, _HEADER_BYTES + tcp_len)
+
+    pool_hex = rng.bytes(4096 + 4000).hex()
+    starts = rng.integers(0, 4096, size=n) * 2
+    payload_hex = np.array([pool_hex[s:s + 2 * length] if t == 3 else None
+                            for s, length, t in zip(starts.tolist(), payload_len.tolist(), mt.tolist())], dtype=object)
+
+    other_port = rng.choice([80, 443, 22, 8080], size=n)
+    mqtt_port = np.where(has_type | unparsable, _MQTT_PORT, other_port)
+    src_port = np.where(from_broker, mqtt_port, client_port)
+    dst_port = np.where(from_broker, client_port, mqtt_port)
+    ip_src = np.where(from_broker, _BROKER_IP, client_ip)
+    ip_dst = np.where(from_broker, client_ip, _BROKER_IP)
+    hdrflags = (np.maximum(mt, 0) << 4) | (qos << 1) | retain
+
+    df = pd.DataFrame({
+        'frame.time_epoch': np.round(timestamps, 6),
+        'ip.src': ip_src,
+        'ip.dst': ip_dst,
+        'tcp.srcport': pd.array(np.where(udp, np.nan, src_port), dtype='Int64'),
+        'tcp.dstport': pd.array(np.where(udp, np.nan, dst_port), dtype='Int64'),
+        'frame.len': frame_len,
+        'mqtt.clientid': np.where(mt == 1, client_ids[client_index], None),
+        'mqtt.topic': np.where((mt == 3) | (mt == 8), topic, None),
+        'mqtt.len': pd.array(np.where(has_type, remaining, np.nan), dtype='Int64'),
+        'mqtt.msg': payload_hex,
+        'mqtt.msgtype': pd.array(np.where(has_type, mt, np.nan), dtype='Int64'),
+        'ip.proto': np.where(udp, 17, 6),
+        'tcp.flags': np.where(udp, None, np.where(has_type, '0x00000018', '0x00000010')),
+        'tcp.len': pd.array(np.where(udp, np.nan, tcp_len), dtype='Int64'),
+        'mqtt.hdrflags': np.where(has_type, pd.Series(hdrflags).map('0x{:08x}'.format), None),
+        'mqtt.qos': pd.array(np.where(mt == 3, qos, np.nan), dtype='Int64'),
+        'mqtt.retain': pd.array(np.where(mt == 3, retain, np.nan), dtype='Int64'),
+        'mqtt.dupflag': pd.array(np.where(mt == 3, 0, np.nan), dtype='Int64'),
+        'mqtt.conflags': np.where(mt == 1, '0x00000002', None),
+        'mqtt.kalive': pd.array(np.where(mt == 1, 60, np.nan), dtype='Int64'),
+        'mqtt.ver': pd.array(np.where(mt == 1, 4, np.nan), dtype='Int64'),
+        'mqtt.protoname': np.where(mt == 1, 'MQTT', None),
+    })
+    if columns_keep is not None:
+        ordered = list(dict.fromkeys(list(columns_keep) + FEATURE_COLUMNS))
+        df = df[[col for col in ordered if col in df.columns]]
+    return df
+
+
+def parse_mix(values):
+    """['Legitimate=0.5', ...] -> {'Legitimate': 0.5, ...}"""
+    mix = {}
+    for value in values or []:
+        name, _, weight = value.partition('=')
+        mix[name] = float(weight)
+    return mix
+
+
+def plan_rows(file_list, total_rows, mix=None):
+    """파일별 행 수. mix ({assumed_attack_type: 가중치}) 가 없으면 균등, mix 에 없는 클래스는 0 행입니다."""
+    weights = np.array([(mix or {}).get(entry['assumed_attack_type'], 0.0 if mix else 1.0) for entry in file_list])
+    if weights.sum() <= 0:
+        raise ValueError("Class mix selects no files from data.file_list.")
+    rows = np.floor(total_rows * weights / weights.sum()).astype(int)
+    rows[np.argmax(weights)] += total_rows - rows.sum()
+    return {entry['filename']: int(r) for entry, r in zip(file_list, rows)}
+
+
+def generate_dataset(out_dir, total_rows, mix=None, seed=0, config_path=DEFAULT_CONFIG_PATH, write_pcaps=False):
+    """
+    out_dir 에 data.file_list 의 파일 이름으로 클래스별 CSV (와 선택적으로 .pcap) 를 씁니다.
+    반환값: {filename: {'path', 'rows', 'assumed_attack_type', 'pcap'}}
+    """
+    columns_keep, file_list = load_file_list(config_path)
+    rows_per_file = plan_rows(file_list, total_rows, mix)
+    os.makedirs(out_dir, exist_ok=True)
+    written = {}
+    for i, entry in enumerate(file_list):
+        n_rows = rows_per_file[entry['filename']]
+        if n_rows == 0:
+            continue
+        df = generate_class_frame(entry['assumed_attack_type'], n_rows, seed=seed * 1000 + i,
+                                  columns_keep=columns_keep)
+        path = os.path.join(out_dir, entry['filename'])
+        df.to_csv(path, index=False)
+        pcap_path = None
+        if write_pcaps:
+            pcap_path = os.path.splitext(path)[0] + '.pcap'
+            write_pcap(df, pcap_path, seed=seed * 1000 + i)
+        written[entry['filename']] = {'path': path, 'rows': n_rows,
+                                      'assumed_attack_type': entry['assumed_attack_type'], 'pcap': pcap_path}
+        print(f"Generated {n_rows} rows of '{entry['assumed_attack_type']}' -> {path}"
+              + (f" (+ {pcap_path})" if pcap_path else ""))
+    return written
+
+
+# --- pcap 출력 ---
+
+def _mqtt_string(text):
+    data = text.encode('utf-8')
+    return struct.pack('>H', len(data)) + data
+
+
+def _varint(value):
+    out = bytearray()
+    while True:
+        digit = value % 128
+        value //= 128
+        out.append(digit | 0x80 if value else digit)
+        if not value:
+            return bytes(out)
+
+
+def _mqtt_message(msg_type, qos, retain, client_id, topic, payload, body_len, rng):
+    if msg_type == 1:
+        body = _mqtt_string('MQTT') + bytes([4, 2]) + struct.pack('>H', 60) + _mqtt_string(client_id)
+    elif msg_type == 3:
+        body = _mqtt_string(topic) + (b'\x00\x01' if qos else b'') + payload
+    elif msg_type == 8:
+        body = b'\x00\x01' + _mqtt_string(topic) + b'\x00'
+    elif msg_type in (2, 4):
+        body = b'\x00\x00'
+    elif msg_type == 9:
+        body = b'\x00\x01\x00'
+    elif msg_type in (0, 15):
+        body = rng.bytes(body_len)
+    else:
+        body = b''
+    return bytes([(msg_type << 4) | (qos << 1) | retain]) + _varint(len(body)) + body
+
+
+def write_pcap(df, path, seed=0):
+    """generate_class_frame 결과를 Ethernet/IPv4/TCP(UDP) 패킷의 pcap (마이크로초) 파일로 씁니다."""
+    rng = np.random.default_rng(seed)
+
+    def column(name):
+        return df[name].astype(object).where(df[name].notna(), None).tolist()
+
+    rows = zip(column('frame.time_epoch'), column('ip.src'), column('ip.dst'), column('tcp.srcport'),
+               column('tcp.dstport'), column('ip.proto'), column('mqtt.msgtype'), column('mqtt.qos'),
+               column('mqtt.retain'), column('mqtt.clientid'), column('mqtt.topic'), column('mqtt.msg'),
+               column('tcp.len'), column('mqtt.len'), column('frame.len'))
+    with open(path, 'wb') as f:
+        f.write(struct.pack('<IHHiIII', 0xA1B2C3D4, 2, 4, 0, 0, 65535, 1))
+        for (epoch, ip_src, ip_dst, sport, dport, proto, msg_type, qos, retain, client_id, topic, payload_hex,
+             tcp_len, mqtt_len, frame_len) in rows:
+            if proto == 17:
+                udp_payload = rng.bytes(int(frame_len) - 14 - 20 - 8)
+                transport = struct.pack('>HHHH', 40000, 53, 8 + len(udp_payload), 0) + udp_payload
+            else:
+                if msg_type is not None:
+                    payload = bytes.fromhex(payload_hex) if payload_hex else b''
+                    segment = _mqtt_message(int(msg_type), int(qos or 0), int(retain or 0), client_id, topic,
+                                            payload, int(mqtt_len), rng)
+                else:
+                    # MQTT 로 해석되지 않도록 첫 바이트 (메시지 타입) 를 0 으로
+                    segment = b'\x00' + rng.bytes(max(0, int(tcp_len) - 1)) if tcp_len else b''
+                flags = 0x18 if segment else 0x10
+                transport = struct.pack('>HHIIBBHHH', int(sport), int(dport), 1, 0, 5 << 4, flags, 1024, 0, 0) + segment
+            ip = struct.pack('>BBHHHBBH4s4s', 0x45, 0, 20 + len(transport), 0, 0, 64, int(proto), 0,
+                             socket.inet_aton(ip_src), socket.inet_aton(ip_dst)) + transport
+            frame = b'\x00' * 12 + struct.pack('>H', 0x0800) + ip
+            seconds = int(epoch)
+            micros = int(round((epoch - seconds) * 1e6))
+            if micros >= 1000000:
+                seconds, micros = seconds + 1, micros - 1000000
+            f.write(struct.pack('<IIII', seconds, micros, len(frame), len(frame)) + frame)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Generate seeded synthetic MQTT traffic CSVs (and pcaps)")
+    parser.add_argument('--out', required=True, help="출력 디렉터리 (data.base_dir 로 사용 가능)")
+    parser.add_argument('--rows', type=int, default=100000, help="전체 행 수 (클래스 mix 비율로 나눔)")
+    parser.add_argument('--mix', nargs='*', default=None, metavar='ATTACK_TYPE=WEIGHT',
+                        help="assumed_attack_type 별 가중치 (기본값: 균등)")
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--config', default=DEFAULT_CONFIG_PATH)
+    parser.add_argument('--pcap', action='store_true', help="같은 행을 .pcap 파일로도 씀")
+    args = parser.parse_args(argv)
+    generate_dataset(args.out, args.rows, mix=parse_mix(args.mix), seed=args.seed, config_path=args.config,
+                     write_pcaps=args.pcap)
+
+
+if __name__ == "__main__":
+    main()
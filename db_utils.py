@@ -1,37 +1,293 @@
 # src/db_utils.py
+"""
+anomaly DB (SQLite) 저장.
+
+AnomalySink: 패킷 단위로 들어오는 이상 탐지 결과를 모아서 쓰는 sink.
+- 커넥션 하나를 계속 쓰고, WAL + synchronous=NORMAL + 큰 page cache 로 commit 비용을 줄입니다.
+  (WAL 에서는 commit 이 fsync 없이 WAL 파일에 append 되고, 읽는 쪽은 쓰기와 동시에 조회할 수 있음)
+- add() 는 행을 버퍼에 넣기만 하고, 백그라운드 스레드가 batch_size 행이 모이거나 flush_interval 초가 지나면
+  한 트랜잭션에서 prepared INSERT 의 executemany 로 씁니다.
+- 버퍼가 max_buffer 행을 넘으면 add() 가 기다립니다 (backpressure, 메모리 상한).
+- stats() / report() 로 쓴 행 수와 insert 처리량 (rows/sec) 을 확인할 수 있습니다.
+
+insert_anomalies 는 경로별로 공유하는 sink 에 넣고 flush 까지 기다리므로 반환되면 DB 에 commit 되어 있습니다.
+쓰기 실패는 실패한 batch 의 행 범위와 함께 기록되어, 그 행을 넣은 호출자의 flush(rows) 에만 전달됩니다
+(공유 sink 에서 다른 호출자가 대신 받거나 지워 버리지 않음).
+"""
+import atexit
+import os
 import sqlite3
+import threading
+import time
+
+import numpy as np
 import pandas as pd
-import os
+
+from src.database.db_utils import get_engine
+
+ANOMALY_TABLE = 'anomalies'
+ANOMALY_COLUMNS = ('timestamp', 'client_id', 'topic', 'qos', 'prediction', 'true_label')
+
+ANOMALY_TABLE_SQL = '''
+    CREATE TABLE IF NOT EXISTS anomalies (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        timestamp TEXT,
+        client_id TEXT,
+        topic TEXT,
+        qos INTEGER,
+        prediction TEXT,
+        true_label TEXT
+    )
+'''
+
+# 시간 구간 조회, 예측 라벨별 시간 구간 조회용
+ANOMALY_INDEX_SQL = (
+    "CREATE INDEX IF NOT EXISTS idx_anomalies_timestamp ON anomalies (timestamp)",
+    "CREATE INDEX IF NOT EXISTS idx_anomalies_prediction_timestamp ON anomalies (prediction, timestamp)",
+)
+
+SQLITE_PRAGMAS = (
+    ('journal_mode', 'WAL'),
+    ('synchronous', 'NORMAL'), # WAL 에서는 checkpoint 때만 fsync (전원 장애 시 마지막 commit 몇 개만 잃을 수 있음)
+    ('cache_size', -65536),    # 음수는 KiB 단위: 64MB
+    ('temp_store', 'MEMORY'),
+)
+
+# numpy 정수는 sqlite3 가 바인딩하지 못하므로 파이썬 int 로 (float64 는 float 의 subclass 라 그대로 됨),
+# nullable 정수 컬럼에서 온 pd.NA 는 NULL 로
+for _numpy_int in (np.int8, np.int16, np.int32, np.int64, np.uint8, np.uint16, np.uint32, np.uint64):
+    sqlite3.register_adapter(_numpy_int, int)
+sqlite3.register_adapter(type(pd.NA), lambda value: None)
+
+
+def get_anomaly_engine(db_path='data/anomaly_logs.db'):
+    """anomaly DB (SQLite) 엔진 (조회용). 경로마다 한 번 만들고 커넥션 풀을 재사용합니다."""
+    return get_engine(f"sqlite:///{os.path.abspath(db_path)}")
+
+
+def _rows_from_frame(df):
+    """
+    DataFrame 을 ANOMALY_COLUMNS 순서의 튜플로 바꿉니다 (없는 컬럼 / 결측은 None).
+    테이블에 없는 컬럼은 저장되지 않으므로 경고를 출력합니다.
+    """
+    unknown = [col for col in df.columns if col not in ANOMALY_COLUMNS]
+    if unknown:
+        print(f"Warning: column(s) {', '.join(map(str, unknown))} are not in the '{ANOMALY_TABLE}' table "
+              f"({', '.join(ANOMALY_COLUMNS)}) and will not be stored.")
+    columns = {}
+    for col in ANOMALY_COLUMNS:
+        if col not in df.columns:
+            columns[col] = pd.Series(None, index=df.index, dtype=object)
+            continue
+        series = df[col]
+        if pd.api.types.is_datetime64_any_dtype(series):
+            series = series.dt.strftime('%Y-%m-%d %H:%M:%S.%f')
+        series = series.astype(object)
+        columns[col] = series.where(series.notna(), None)
+    return list(zip(*(columns[col].tolist() for col in ANOMALY_COLUMNS)))
+
+
+class AnomalySink:
+    def __init__(self, db_path='data/anomaly_logs.db', batch_size=1000, flush_interval=0.5, max_buffer=100000):
+        self.db_path = db_path
+        self.batch_size = max(1, batch_size)
+        self.flush_interval = flush_interval
+        self.max_buffer = max(self.batch_size, max_buffer)
+        if os.path.dirname(db_path):
+            os.makedirs(os.path.dirname(db_path), exist_ok=True)
+        # 트랜잭션은 직접 BEGIN / COMMIT (isolation_level=None), 쓰기는 백그라운드 스레드에서만
+        self._connection = sqlite3.connect(db_path, isolation_level=None, check_same_thread=False)
+        for name, value in SQLITE_PRAGMAS:
+            self._connection.execute(f"PRAGMA {name} = {value}")
+        self._connection.execute(ANOMALY_TABLE_SQL)
+        for index_sql in ANOMALY_INDEX_SQL:
+            self._connection.execute(index_sql)
+        self._insert_sql = (f"INSERT INTO {ANOMALY_TABLE} ({', '.join(ANOMALY_COLUMNS)}) "
+                            f"VALUES ({', '.join('?' for _ in ANOMALY_COLUMNS)})")
+
+        self._condition = threading.Condition()
+        self._buffer = []
+        self._added = 0          # add() 로 받은 행 수
+        self._done = 0           # 쓰기를 마친 (성공 또는 실패) 행 수
+        self._flush_requested = False
+        self._closed = False
+        self._failures = []      # 쓰기에 실패한 batch: [시작 행 번호, 끝 행 번호, 예외, 전달 여부]
+        self._written = 0
+        self._dropped = 0
+        self._flushes = 0
+        self._insert_seconds = 0.0
+        self._max_flush_seconds = 0.0
+        self._started_at = time.perf_counter()
+        self._thread = threading.Thread(target=self._run, name='anomaly-sink', daemon=True)
+        self._thread.start()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+    def _raise_error(self, rows=None):
+        """
+        rows ((시작, 끝) 행 번호) 와 겹치는 실패한 batch 가 있으면 예외를 냅니다.
+        rows 가 없으면 아직 어느 호출자에게도 전달되지 않은 실패를 냅니다.
+        """
+        for failure in self._failures:
+            start, end, error, delivered = failure
+            if (start < rows[1] and rows[0] < end) if rows is not None else not delivered:
+                failure[3] = True
+                raise RuntimeError(f"Anomaly sink failed to write to '{self.db_path}': {error}") from error
+
+    def add_rows(self, rows):
+        """
+        ANOMALY_COLUMNS 순서의 튜플들을 버퍼에 넣습니다. 버퍼가 가득 차 있으면 자리가 날 때까지 기다립니다.
+        넣은 행의 (시작, 끝) 행 번호를 반환합니다 (flush(rows) 에 넘기면 이 행들의 쓰기 결과만 확인).
+        """
+        rows = list(rows)
+        with self._condition:
+            if self._closed:
+                raise RuntimeError("Anomaly sink is closed.")
+            if not rows:
+                return self._added, self._added
+            self._condition.wait_for(lambda: len(self._buffer) < self.max_buffer or self._closed)
+            if self._closed:
+                # 기다리는 동안 close 됨: writer 가 이미 끝났으므로 넣어도 쓰이지 않음
+                raise RuntimeError("Anomaly sink is closed.")
+            start = self._added
+            self._buffer.extend(rows)
+            self._added += len(rows)
+            if len(self._buffer) >= self.batch_size:
+                self._condition.notify_all()
+            return start, self._added
+
+    def add(self, df):
+        """DataFrame (ANOMALY_COLUMNS 컬럼) 의 행을 버퍼에 넣고 (시작, 끝) 행 번호를 반환합니다."""
+        return self.add_rows(_rows_from_frame(df) if not df.empty else [])
+
+    def flush(self, rows=None):
+        """
+        지금까지 add 한 행이 모두 commit 될 때까지 기다립니다.
+        rows (add / add_rows 의 반환값) 를 주면 그 행들이 쓰일 때까지만 기다리고, 그 행들의 쓰기 실패만 예외로 냅니다.
+        """
+        with self._condition:
+            target = self._added if rows is None else rows[1]
+            self._flush_requested = True
+            self._condition.notify_all()
+            self._condition.wait_for(lambda: self._done >= target)
+            self._raise_error(rows)
+
+    def close(self):
+        """남은 행을 쓰고 백그라운드 스레드와 커넥션을 닫습니다."""
+        with self._condition:
+            if self._closed:
+                return
+            self._closed = True
+            self._condition.notify_all()
+        self._thread.join()
+        self._connection.close()
+        with self._condition:
+            self._raise_error()
+
+    def _run(self):
+        while True:
+            with self._condition:
+                self._condition.wait_for(
+                    lambda: self._closed or self._flush_requested or len(self._buffer) >= self.batch_size,
+                    timeout=self.flush_interval)
+                rows, self._buffer = self._buffer, []
+                self._flush_requested = False
+                closing = self._closed
+                # 버퍼가 비었으니 기다리던 add() 를 깨움
+                self._condition.notify_all()
+            if rows:
+                # 버퍼는 들어온 순서대로 이 스레드만 쓰므로 이번 batch 는 행 번호 _done ~ _done + len(rows)
+                self._write(rows, self._done)
+                with self._condition:
+                    self._done += len(rows)
+                    self._condition.notify_all()
+            if closing:
+                return
+
+    def _write(self, rows, start):
+        started = time.perf_counter()
+        try:
+            self._connection.execute("BEGIN")
+            self._connection.executemany(self._insert_sql, rows)
+            self._connection.execute("COMMIT")
+        except Exception as e:
+            if self._connection.in_transaction:
+                self._connection.execute("ROLLBACK")
+            print(f"Error writing {len(rows)} anomalies to '{self.db_path}': {e}")
+            with self._condition:
+                self._failures.append([start, start + len(rows), e, False])
+                self._dropped += len(rows)
+            return
+        seconds = time.perf_counter() - started
+        with self._condition:
+            self._written += len(rows)
+            self._flushes += 1
+            self._insert_seconds += seconds
+            self._max_flush_seconds = max(self._max_flush_seconds, seconds)
+
+    def stats(self):
+        with self._condition:
+            elapsed = time.perf_counter() - self._started_at
+            return {
+                'rows_written': self._written,
+                'rows_dropped': self._dropped,
+                'rows_buffered': len(self._buffer),
+                'flushes': self._flushes,
+                'avg_flush_rows': self._written / self._flushes if self._flushes else 0.0,
+                'max_flush_ms': self._max_flush_seconds * 1000.0,
+                'insert_rows_per_sec': self._written / self._insert_seconds if self._insert_seconds > 0 else 0.0,
+                'rows_per_sec': self._written / elapsed if elapsed > 0 else 0.0,
+            }
+
+    def report(self, prefix="Anomaly sink"):
+        s = self.stats()
+        print(f"[{prefix}] {s['rows_written']} rows in {s['flushes']} flushes (avg {s['avg_flush_rows']:.0f} rows, "
+              f"max {s['max_flush_ms']:.1f} ms), insert throughput {s['insert_rows_per_sec']:.0f} rows/s"
+              + (f", {s['rows_dropped']} rows dropped" if s['rows_dropped'] else ""))
+
+
+_sinks_lock = threading.Lock()
+_sinks = {}
+
+
+def get_anomaly_sink(db_path='data/anomaly_logs.db'):
+    """경로별로 공유하는 AnomalySink (프로세스 종료 시 남은 행을 쓰고 닫음)."""
+    key = os.path.abspath(db_path)
+    with _sinks_lock:
+        sink = _sinks.get(key)
+        if sink is None:
+            sink = _sinks[key] = AnomalySink(db_path)
+    return sink
+
+
+@atexit.register
+def close_anomaly_sinks():
+    with _sinks_lock:
+        sinks = list(_sinks.values())
+        _sinks.clear()
+    for sink in sinks:
+        sink.close()
+
 
 def init_db(db_path='data/anomaly_logs.db'):
-    """DB 파일과 테이블 초기화"""
-    os.makedirs(os.path.dirname(db_path), exist_ok=True)
-    conn = sqlite3.connect(db_path)
-    cursor = conn.cursor()
-    cursor.execute('''
-        CREATE TABLE IF NOT EXISTS anomalies (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            timestamp TEXT,
-            client_id TEXT,
-            topic TEXT,
-            qos INTEGER,
-            prediction TEXT,
-            true_label TEXT
-        )
-    ''')
-    conn.commit()
-    conn.close()
+    """DB 파일과 테이블 / 인덱스 초기화 (WAL 모드)"""
+    get_anomaly_sink(db_path)
     print(f"✅ anomaly DB initialized at {db_path}")
 
 
 def insert_anomalies(df: pd.DataFrame, db_path='data/anomaly_logs.db'):
-    """이상 탐지 결과를 DB에 저장"""
+    """이상 탐지 결과를 DB에 저장 (commit 될 때까지 기다림)"""
     if df.empty:
         print("⚠️ No anomaly data to insert.")
         return
 
-    with sqlite3.connect(db_path) as conn:
-        df.to_sql('anomalies', conn, if_exists='append', index=False)
+    sink = get_anomaly_sink(db_path)
+    # 공유 sink 이므로 이 호출에서 넣은 행의 결과만 확인
+    sink.flush(sink.add(df))
     print(f"✅ {len(df)} rows inserted into DB.")
 
 
@@ -1,17 +1,244 @@
-# src/detection/features.py 예시
+# src/detection/features.py
+"""
+출발지별 트래픽 통계를 계산하는 슬라이딩 윈도우 feature 엔진.
+
+key (기본: ip_src, client_id) 와 윈도우 (기본: 1s/10s/60s) 조합마다
+    {key}_{window}_count                 윈도우 안 패킷 수
+    {key}_{window}_bytes                 윈도우 안 frame_len 합
+    {key}_{window}_distinct_topics       윈도우 안 서로 다른 topic 수
+    {key}_{window}_msgtype_{m}_count     윈도우 안 msg_type == m 패킷 수
+를 만듭니다. 윈도우는 (t - w, t] 이고, 같은 key 의 패킷을 시간 순 (동시각이면 입력 순) 으로
+하나씩 받았을 때 현재 패킷까지 포함한 값입니다. key 가 결측인 행의 feature 는 NaN 입니다.
+
+- compute_window_features: 배치 모드. 정렬 + searchsorted + 누적합으로 한 번에 계산
+- WindowFeatureEngine: 스트리밍 모드. 패킷 하나당 O(1) (amortized) 갱신
+두 모드는 같은 입력에 대해 같은 값을 냅니다.
+"""
+from collections import deque
+
+import numpy as np
 import pandas as pd
 
-def add_time_window_features(df, window_size='1T'): # 1분 윈도우
+DEFAULT_WINDOWS = ('1s', '10s', '60s')
+DEFAULT_KEYS = ('ip_src', 'client_id')
+DEFAULT_MSG_TYPES = (1, 3, 8, 12, 14) # CONNECT, PUBLISH, SUBSCRIBE, PINGREQ, DISCONNECT
+
+
+def _window_label(window):
+    return window if isinstance(window, str) else f"{int(pd.Timedelta(window).total_seconds())}s"
+
+
+def window_feature_names(windows=DEFAULT_WINDOWS, keys=DEFAULT_KEYS, msg_types=DEFAULT_MSG_TYPES):
+    """compute_window_features / WindowFeatureEngine 이 만드는 컬럼 이름 목록."""
+    names = []
+    for key in keys:
+        for window in windows:
+            prefix = f"{key}_{_window_label(window)}"
+            names += [f"{prefix}_count", f"{prefix}_bytes", f"{prefix}_distinct_topics"]
+            names += [f"{prefix}_msgtype_{m}_count" for m in msg_types]
+    return names
+
+
+def _distinct_in_windows(topic_codes, start):
+    """
+    정렬된 행 i 마다 [start[i], i] 구간의 서로 다른 topic 수를 구합니다 (topic_codes < 0 은 결측).
+    start 는 그룹 안에서 단조 증가하고 그룹 첫 행에서는 start[i] == i 이므로,
+    왼쪽 포인터를 당기는 것만으로 이전 그룹의 상태가 모두 빠집니다.
+    """
+    n_topics = int(topic_codes.max()) + 1 if len(topic_codes) else 0
+    counts = [0] * n_topics
+    codes = topic_codes.tolist()
+    starts = start.tolist()
+    result = [0] * len(codes)
+    distinct = 0
+    lo = 0
+    for i, code in enumerate(codes):
+        window_start = starts[i]
+        while lo < window_start:
+            old = codes[lo]
+            if old >= 0:
+                counts[old] -= 1
+                if counts[old] == 0:
+                    distinct -= 1
+            lo += 1
+        if code >= 0:
+            counts[code] += 1
+            if counts[code] == 1:
+                distinct += 1
+        result[i] = distinct
+    return np.asarray(result, dtype=np.float64)
+
+
+def compute_window_features(df, windows=DEFAULT_WINDOWS, keys=DEFAULT_KEYS, msg_types=DEFAULT_MSG_TYPES,
+                            timestamp_col='timestamp', bytes_col='frame_len', topic_col='topic',
+                            msg_type_col='msg_type'):
+    """
+    배치 모드: df 의 각 행에 대한 윈도우 feature 를 df.index 에 맞춘 DataFrame 으로 반환합니다.
+    df 는 정렬되어 있지 않아도 됩니다.
+    """
+    n_rows = len(df)
+    timestamps = pd.to_datetime(df[timestamp_col])
+    t_ns = timestamps.to_numpy(dtype='datetime64[ns]').astype(np.int64)
+    t_valid = timestamps.notna().to_numpy()
+    nbytes = pd.to_numeric(df[bytes_col], errors='coerce').fillna(0).to_numpy(dtype=np.float64) \
+        if bytes_col in df.columns else np.zeros(n_rows)
+    msg_type = pd.to_numeric(df[msg_type_col], errors='coerce').to_numpy(dtype=np.float64) \
+        if msg_type_col in df.columns else np.full(n_rows, np.nan)
+    topic_codes = pd.factorize(df[topic_col])[0] if topic_col in df.columns else np.full(n_rows, -1)
+    windows_ns = [(_window_label(w), pd.Timedelta(w).value) for w in windows]
+
+    features = {}
+    for key in keys:
+        key_values = df[key] if key in df.columns else pd.Series(np.nan, index=df.index)
+        rows = np.flatnonzero(key_values.notna().to_numpy() & t_valid)
+        group = pd.factorize(key_values.to_numpy()[rows])[0]
+        # key -> 시간 -> 입력 순서로 정렬 (lexsort 는 마지막 키가 1순위)
+        order = np.lexsort((rows, t_ns[rows], group))
+        rows, group = rows[order], group[order]
+        t_sorted = t_ns[rows]
+
+        # 그룹 경계를 넘지 않도록 (그룹, 시각 순위) 를 하나의 정수로 합쳐 searchsorted
+        unique_times = np.unique(t_sorted)
+        stride = len(unique_times) + 1
+        composite = group.astype(np.int64) * stride + np.searchsorted(unique_times, t_sorted)
+        end = np.arange(1, len(rows) + 1)
+
+        bytes_cumsum = np.concatenate(([0.0], np.cumsum(nbytes[rows])))
+        msg_cumsums = {m: np.concatenate(([0], np.cumsum(msg_type[rows] == m))) for m in msg_types}
+
+        for label, window_ns in windows_ns:
+            prefix = f"{key}_{label}"
+            lo_rank = np.searchsorted(unique_times, t_sorted - window_ns, side='right')
+            start = np.searchsorted(composite, group.astype(np.int64) * stride + lo_rank, side='left')
+
+            columns = {
+                f"{prefix}_count": end - start,
+                f"{prefix}_bytes": bytes_cumsum[end] - bytes_cumsum[start],
+                f"{prefix}_distinct_topics": _distinct_in_windows(topic_codes[rows], start),
+            }
+            for m in msg_types:
+                columns[f"{prefix}_msgtype_{m}_count"] = msg_cumsums[m][end] - msg_cumsums[m][start]
+            for name, values in columns.items():
+                column = np.full(n_rows, np.nan)
+                column[rows] = values
+                features[name] = column
+
+    return pd.DataFrame(features, index=df.index, columns=window_feature_names(windows, keys, msg_types))
+
+
+class _WindowState:
+    """key 값 하나 x 윈도우 하나의 상태. 윈도우 안 패킷을 deque 로 들고 합계를 갱신합니다."""
+    __slots__ = ('packets', 'count', 'bytes', 'msg_counts', 'topic_counts')
+
+    def __init__(self):
+        self.packets = deque()
+        self.count = 0
+        self.bytes = 0.0
+        self.msg_counts = {}
+        self.topic_counts = {}
+
+    def push(self, t_ns, nbytes, msg_type, topic):
+        self.packets.append((t_ns, nbytes, msg_type, topic))
+        self.count += 1
+        self.bytes += nbytes
+        self.msg_counts[msg_type] = self.msg_counts.get(msg_type, 0) + 1
+        if topic is not None:
+            self.topic_counts[topic] = self.topic_counts.get(topic, 0) + 1
+
+    def evict(self, cutoff_ns):
+        """시각이 cutoff 이하인 패킷을 뺍니다."""
+        packets = self.packets
+        while packets and packets[0][0] <= cutoff_ns:
+            _, nbytes, msg_type, topic = packets.popleft()
+            self.count -= 1
+            self.bytes -= nbytes
+            self.msg_counts[msg_type] -= 1
+            if topic is not None:
+                remaining = self.topic_counts[topic] - 1
+                if remaining:
+                    self.topic_counts[topic] = remaining
+                else:
+                    del self.topic_counts[topic]
+        if not packets:
+            self.bytes = 0.0 # 부동소수 오차 누적 방지
+
+
+class WindowFeatureEngine:
+    """
+    스트리밍 모드: update() 로 패킷을 하나씩 넣으면 그 패킷 기준 윈도우 feature dict 를 돌려줍니다.
+    key 별로 시각이 단조 증가하는 순서로 넣어야 합니다.
+    """
+
+    def __init__(self, windows=DEFAULT_WINDOWS, keys=DEFAULT_KEYS, msg_types=DEFAULT_MSG_TYPES):
+        self.windows = [(_window_label(w), pd.Timedelta(w).value) for w in windows]
+        self.keys = tuple(keys)
+        self.msg_types = tuple(msg_types)
+        self.feature_names = window_feature_names(windows, keys, msg_types)
+        self._states = {key: {} for key in self.keys}
+        self._last_seen = {key: {} for key in self.keys}
+
+    def update(self, record):
+        """
+        record: {'timestamp', 'frame_len', 'msg_type', 'topic', <keys>...} (pandas Timestamp / datetime / epoch ns)
+        반환값: {feature 이름: 값}
+        """
+        t_ns = pd.Timestamp(record['timestamp']).value
+        nbytes = record.get('frame_len')
+        nbytes = 0.0 if nbytes is None or pd.isna(nbytes) else float(nbytes)
+        msg_type = record.get('msg_type')
+        msg_type = None if msg_type is None or pd.isna(msg_type) else float(msg_type)
+        topic = record.get('topic')
+        topic = None if topic is None or (not isinstance(topic, str) and pd.isna(topic)) else topic
+
+        features = {}
+        for key in self.keys:
+            key_value = record.get(key)
+            missing = key_value is None or (not isinstance(key_value, str) and pd.isna(key_value))
+            states = None if missing else self._states[key].setdefault(key_value, [_WindowState() for _ in self.windows])
+            if not missing:
+                self._last_seen[key][key_value] = t_ns
+            for (label, window_ns), state in zip(self.windows, states or [None] * len(self.windows)):
+                prefix = f"{key}_{label}"
+                if state is None:
+                    features[f"{prefix}_count"] = np.nan
+                    features[f"{prefix}_bytes"] = np.nan
+                    features[f"{prefix}_distinct_topics"] = np.nan
+                    for m in self.msg_types:
+                        features[f"{prefix}_msgtype_{m}_count"] = np.nan
+                    continue
+                state.push(t_ns, nbytes, msg_type, topic)
+                state.evict(t_ns - window_ns)
+                features[f"{prefix}_count"] = state.count
+                features[f"{prefix}_bytes"] = state.bytes
+                features[f"{prefix}_distinct_topics"] = len(state.topic_counts)
+                for m in self.msg_types:
+                    features[f"{prefix}_msgtype_{m}_count"] = state.msg_counts.get(float(m), 0)
+        return features
+
+    def expire(self, now):
+        """가장 긴 윈도우보다 오래 조용했던 key 의 상태를 지워 메모리를 회수합니다. 지운 key 수를 반환합니다."""
+        cutoff_ns = pd.Timestamp(now).value - max(window_ns for _, window_ns in self.windows)
+        removed = 0
+        for key in self.keys:
+            last_seen = self._last_seen[key]
+            stale = [value for value, t_ns in last_seen.items() if t_ns <= cutoff_ns]
+            for value in stale:
+                del last_seen[value]
+                del self._states[key][value]
+            removed += len(stale)
+        return removed
+
+
+def add_time_window_features(df, window_size='1min'): # 1분 윈도우
     if 'timestamp' not in df.columns or not pd.api.types.is_datetime64_any_dtype(df['timestamp']):
         print("Error: 'timestamp' column is missing or not datetime type.")
         return df
 
-    df_sorted = df.sort_values(by='timestamp')
+    df_sorted = df.sort_values(by='timestamp', kind='stable')
+    features = compute_window_features(df_sorted, windows=(window_size,), keys=('ip_src',), msg_types=(1,))
+    prefix = f"ip_src_{_window_label(window_size)}"
     # ip_src별, 시간 윈도우별 패킷 수
-    df_sorted['packets_in_window_by_ip'] = df_sorted.groupby('ip_src')['timestamp'].transform(
-        lambda x: x.rolling(window_size).count()
-    )
-    # ip_src별, 시간 윈도우별 특정 msg_type (예: CONNECT=1) 수
-    # 이 부분은 더 복잡하므로, apply나 다른 방식 필요할 수 있음. 여기서는 개념만.
-    # df_sorted['connects_in_window_by_ip'] = df_sorted[df_sorted['msg_type']==1].groupby('ip_src')['timestamp'].transform(...)
+    df_sorted['packets_in_window_by_ip'] = features[f"{prefix}_count"]
+    # ip_src별, 시간 윈도우별 CONNECT (msg_type=1) 수
+    df_sorted['connects_in_window_by_ip'] = features[f"{prefix}_msgtype_1_count"]
     return df_sorted
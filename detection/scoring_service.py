@@ -0,0 +1,381 @@
+# src/detection/scoring_service.py
+"""
+실시간 MQTT 트래픽 점수화 데몬 (asyncio).
+
+    packet source --> feature 갱신 (WindowFeatureEngine) --> bounded queue --> micro-batcher --> model.predict
+                                                                                   |
+                                                                      이상 행 -> AnomalySink (db_utils)
+
+- packet source: pcap 재생 (pcap_replay_source) 또는 로컬 TCP tap 대용 (tcp_tap_source, 줄 단위 JSON)
+- micro-batcher: max_batch 행이 모이거나 가장 오래 기다린 행이 max_delay 에 도달하면 한 번에 predict.
+  predict 는 executor 스레드에서 실행되어 이벤트 루프를 막지 않습니다.
+- 이상 행은 AnomalySink 버퍼에 넣기만 하고 (SQLite 쓰기는 sink 의 백그라운드 스레드가 batch 로),
+  종료 시 남은 행을 쓴 뒤 insert 처리량을 출력합니다.
+- 결정 지연 (패킷 수신 -> 판정) 의 p50/p99 와 처리량 (packets/sec) 을 주기적으로 출력합니다.
+
+사용 예:
+    python -m detection.scoring_service --model models/rf_model.pkl --pcap data/pcap/bruteforce.pcapng
+    python -m detection.scoring_service --model models/rf_model.pkl --listen 127.0.0.1:9099
+    python -m detection.scoring_service --model registry:rf --pcap data/pcap/bruteforce.pcapng   # model_registry 최신 버전
+"""
+import argparse
+import asyncio
+import json
+import time
+from collections import deque
+
+import joblib
+import numpy as np
+import pandas as pd
+
+from detection.features import WindowFeatureEngine
+from db_utils import AnomalySink
+from model_registry import get_registry, parse_model_ref
+from tree_compiler import prefer_compiled
+
+# pcap_reader 컬럼 (tshark 필드 이름) -> 점수화에 쓰는 레코드 키
+_PCAP_FIELD_MAP = {
+    'frame.time_epoch': 'timestamp', 'ip.src': 'ip_src', 'ip.dst': 'ip_dst',
+    'tcp.srcport': 'tcp_srcport', 'tcp.dstport': 'tcp_dstport', 'frame.len': 'frame_len',
+    'mqtt.clientid': 'client_id', 'mqtt.topic': 'topic', 'mqtt.len': 'mqtt_len',
+    'mqtt.msgtype': 'msg_type', 'mqtt.qos': 'qos', 'ip.proto': 'ip_proto',
+}
+# 학습 데이터 컬럼 (tshark 필드 이름) 도 같은 레코드 키로 찾음 (예: mqtt.msgtype -> msg_type)
+_RECORD_KEY_BY_FIELD = {field: key for field, key in _PCAP_FIELD_MAP.items() if key != 'timestamp'}
+_BASE_NUMERIC_FIELDS = ('tcp_srcport', 'tcp_dstport', 'frame_len', 'mqtt_len', 'msg_type', 'qos', 'ip_proto')
+
+_STOP = object()
+
+
+class LatencyStats:
+    """최근 max_samples 개의 결정 지연 (초) 과 누적 처리량을 기록합니다."""
+
+    def __init__(self, max_samples=100000):
+        self.latencies = deque(maxlen=max_samples)
+        self.packets = 0
+        self.anomalies = 0
+        self.batches = 0
+        self.started_at = time.perf_counter()
+
+    def record_batch(self, latencies, n_anomalies):
+        self.latencies.extend(latencies)
+        self.packets += len(latencies)
+        self.anomalies += n_anomalies
+        self.batches += 1
+
+    def summary(self):
+        elapsed = time.perf_counter() - self.started_at
+        latencies_ms = np.asarray(self.latencies) * 1000.0
+        p50, p99 = np.percentile(latencies_ms, [50, 99]) if len(latencies_ms) else (np.nan, np.nan)
+        return {
+            'packets': self.packets,
+            'anomalies': self.anomalies,
+            'batches': self.batches,
+            'seconds': elapsed,
+            'packets_per_sec': self.packets / elapsed if elapsed > 0 else 0.0,
+            'avg_batch_size': self.packets / self.batches if self.batches else 0.0,
+            'latency_p50_ms': float(p50),
+            'latency_p99_ms': float(p99),
+        }
+
+    def report(self, prefix="Scoring"):
+        s = self.summary()
+        print(f"[{prefix}] {s['packets']} packets ({s['packets_per_sec']:.0f}/s), {s['anomalies']} anomalies, "
+              f"avg batch {s['avg_batch_size']:.1f}, latency p50 {s['latency_p50_ms']:.2f} ms / "
+              f"p99 {s['latency_p99_ms']:.2f} ms")
+
+
+def pcap_record_fields():
+    """pcap_replay_source 가 만드는 레코드 키 목록."""
+    from src.data_processing.pcap_reader import PCAP_COLUMNS
+
+    return [_PCAP_FIELD_MAP.get(column, column) for column in PCAP_COLUMNS]
+
+
+async def pcap_replay_source(pcap_path, speed=None, batch_size=None):
+    """
+    pcap/pcapng 를 읽어 레코드 dict 를 yield 합니다.
+    speed=None 이면 최대 속도, 1.0 이면 캡처 시각 간격 그대로 (2.0 이면 2배속) 재생합니다.
+    """
+    from src.data_processing.pcap_reader import iter_pcap_batches
+
+    # 실시간 재생에서는 디코딩 batch 가 크면 그동안 GIL 을 잡고 있어 지연이 튀므로 작게 읽음
+    batch_size = batch_size or (1000 if speed else 10000)
+    batches = iter_pcap_batches(pcap_path, batch_size=batch_size)
+    replay_start = capture_start = None
+    while True:
+        # 파일 읽기/디코딩은 블로킹이므로 스레드에서 실행
+        df = await asyncio.to_thread(next, batches, None)
+        if df is None:
+            return
+        df = df.rename(columns=_PCAP_FIELD_MAP)
+        df['timestamp'] = pd.to_datetime(df['timestamp'], unit='s')
+        for record in df.to_dict('records'):
+            if speed:
+                if replay_start is None:
+                    replay_start, capture_start = time.perf_counter(), record['timestamp']
+                due = replay_start + (record['timestamp'] - capture_start).total_seconds() / speed
+                delay = due - time.perf_counter()
+                if delay > 0:
+                    await asyncio.sleep(delay)
+            yield record
+
+
+async def tcp_tap_source(host, port):
+    """
+    로컬 TCP tap 대용: 접속한 클라이언트가 보내는 줄 단위 JSON 레코드를 yield 합니다.
+    레코드 키는 timestamp (epoch 초 또는 ISO 문자열), ip_src, client_id, topic, msg_type, frame_len 등.
+    """
+    records = asyncio.Queue(maxsize=10000)
+
+    async def handle(reader, writer):
+        try:
+            async for line in reader:
+                line = line.strip()
+                if not line:
+                    continue
+                try:
+                    record = json.loads(line)
+                except ValueError as e:
+                    print(f"Warning: dropping malformed tap record: {e}")
+                    continue
+                timestamp = record.get('timestamp')
+                record['timestamp'] = pd.Timestamp.now() if timestamp is None else \
+                    pd.to_datetime(timestamp, unit='s') if isinstance(timestamp, (int, float)) else pd.Timestamp(timestamp)
+                await records.put(record)
+        finally:
+            writer.close()
+
+    server = await asyncio.start_server(handle, host, port)
+    print(f"Listening for tap records on {host}:{port} (newline-delimited JSON)")
+    async with server:
+        while True:
+            yield await records.get()
+
+
+class ScoringService:
+    def __init__(self, model, feature_columns=None, scaler=None, normal_label='legitimate',
+                 max_batch=256, max_delay=0.005, queue_size=None, db_path='data/anomaly_logs.db',
+                 feature_engine=None, report_interval=5.0, encoder=None, sink_batch_size=1000, sink_flush_interval=0.5,
+                 source_fields=None):
+        """
+        feature_columns 는 학습 때 컬럼 이름 (tshark 필드 이름 또는 레코드 키) 으로 주고, 레코드에서는
+        _PCAP_FIELD_MAP 으로 바꾼 키로 찾습니다. source_fields (source 가 만드는 레코드 키 목록) 를 주면
+        윈도우 feature 도 레코드 키도 아닌 컬럼이 있을 때 시작 전에 ValueError 를 냅니다.
+        """
+        self.model = model
+        self.scaler = scaler
+        self.encoder = encoder
+        self.normal_label = normal_label
+        self.max_batch = max(1, max_batch)
+        self.max_delay = max_delay
+        self.queue_size = queue_size or self.max_batch * 8
+        self.db_path = db_path
+        self.sink_batch_size = sink_batch_size
+        self.sink_flush_interval = sink_flush_interval
+        self.sink = None
+        self.engine = feature_engine or WindowFeatureEngine()
+        self.report_interval = report_interval
+        if feature_columns is None:
+            feature_columns = list(getattr(model, 'feature_names_in_', [])) or \
+                list(getattr(encoder, 'feature_columns', None) or []) or \
+                list(_BASE_NUMERIC_FIELDS) + self.engine.feature_names
+        self.feature_columns = list(feature_columns)
+        # 기본 컬럼 목록 (기본 필드 + 윈도우 feature) 은 학습된 모델과 맞지 않을 수 있으므로 시작 전에 확인
+        for name, fitted in (('model', model), ('scaler', scaler)):
+            n_features = getattr(fitted, 'n_features_in_', None)
+            if n_features is not None and n_features != len(self.feature_columns):
+                raise ValueError(f"The {name} expects {n_features} input features but {len(self.feature_columns)} "
+                                 f"feature columns were resolved ({', '.join(self.feature_columns[:5])}, ...). "
+                                 f"Pass --features with the training columns or use a registry model.")
+        self._record_keys = [_RECORD_KEY_BY_FIELD.get(column, column) for column in self.feature_columns]
+        if source_fields is not None:
+            producible = set(source_fields) | set(self.engine.feature_names)
+            missing = [column for column, key in zip(self.feature_columns, self._record_keys)
+                       if key not in producible]
+            if missing:
+                raise ValueError(f"The packet source cannot produce {len(missing)} model input column(s): "
+                                 f"{', '.join(missing)}. Pass --features with columns the source provides "
+                                 f"or use a model trained on them.")
+        self.stats = LatencyStats()
+
+    def _vectorize(self, record, features):
+        values = []
+        for column, key in zip(self.feature_columns, self._record_keys):
+            value = features.get(column, record.get(key))
+            values.append(np.nan if value is None or value is pd.NA else value)
+        return values
+
+    async def _ingest(self, source, queue):
+        try:
+            async for record in source:
+                arrived_at = time.perf_counter()
+                features = self.engine.update(record)
+                # 큐가 가득 차면 batcher 가 따라올 때까지 대기 (backpressure)
+                await queue.put((arrived_at, record, self._vectorize(record, features)))
+        except Exception:
+            # source 가 예외로 끝나도 batcher 가 멈춰 기다리지 않도록 종료 표시를 보낸 뒤 다시 raise (run 에서 전달)
+            await queue.put(_STOP)
+            raise
+        await queue.put(_STOP)
+
+    def _predict(self, rows):
+        if self.encoder is not None:
+            # 학습 때와 같은 어휘로 범주형 값을 코드로 바꾼 뒤 scaler 적용, 예측 코드는 라벨로 되돌림
+            X = self.encoder.transform(pd.DataFrame(rows, columns=self.feature_columns))
+            X = np.nan_to_num(X.to_numpy(dtype=np.float64))
+        else:
+            X = np.nan_to_num(np.asarray(rows, dtype=np.float64))
+        if self.scaler is not None:
+            X = self.scaler.transform(X)
+        predictions = self.model.predict(X)
+        if self.encoder is not None and self.encoder.target_classes is not None:
+            return self.encoder.decode_target(predictions)
+        return predictions
+
+    def _store_anomalies(self, records, predictions):
+        # db_utils.ANOMALY_COLUMNS 순서의 튜플 (timestamp, client_id, topic, qos, prediction, true_label)
+        self.sink.add_rows(
+            (str(r.get('timestamp')), r.get('client_id'), r.get('topic'), r.get('qos'), str(p), r.get('label'))
+            for r, p in zip(records, predictions))
+
+    async def _score(self, queue):
+        loop = asyncio.get_running_loop()
+        last_report = time.perf_counter()
+        done = False
+        while not done:
+            item = await queue.get()
+            if item is _STOP:
+                break
+            batch = [item]
+            deadline = item[0] + self.max_delay
+            # 지연 예산 안에서 가능한 만큼 모아 한 번에 predict
+            while len(batch) < self.max_batch:
+                timeout = deadline - time.perf_counter()
+                try:
+                    item = queue.get_nowait() if timeout <= 0 else await asyncio.wait_for(queue.get(), timeout)
+                except (asyncio.QueueEmpty, asyncio.TimeoutError):
+                    break
+                if item is _STOP:
+                    done = True
+                    break
+                batch.append(item)
+
+            predictions = await loop.run_in_executor(None, self._predict, [row for _, _, row in batch])
+            decided_at = time.perf_counter()
+            anomalous = [i for i, p in enumerate(predictions) if p != self.normal_label]
+            self.stats.record_batch([decided_at - arrived_at for arrived_at, _, _ in batch], len(anomalous))
+            if anomalous:
+                # 버퍼에 넣기만 함 (DB 쓰기는 sink 스레드가 batch 로, 판정 지연에 포함되지 않음)
+                self._store_anomalies([batch[i][1] for i in anomalous], [predictions[i] for i in anomalous])
+            if self.report_interval and decided_at - last_report >= self.report_interval:
+                self.stats.report()
+                self.sink.report()
+                last_report = decided_at
+
+    async def run(self, source):
+        """source (레코드 dict 의 async iterator) 가 끝날 때까지 점수화하고 통계 요약을 반환합니다."""
+        self.sink = AnomalySink(self.db_path, batch_size=self.sink_batch_size, flush_interval=self.sink_flush_interval)
+        queue = asyncio.Queue(maxsize=self.queue_size)
+        print(f"Scoring service: {len(self.feature_columns)} features, max batch {self.max_batch}, "
+              f"latency budget {self.max_delay * 1000:.1f} ms")
+        self.stats = LatencyStats()
+        ingest = asyncio.create_task(self._ingest(source, queue))
+        try:
+            await self._score(queue)
+            # 이미 받은 레코드를 모두 점수화한 뒤 source 쪽 예외가 있으면 그대로 전달
+            await ingest
+        finally:
+            ingest.cancel()
+            # 남은 이상 행을 쓰고 닫음 (블로킹이므로 스레드에서)
+            await asyncio.to_thread(self.sink.close)
+        self.stats.report(prefix="Scoring summary")
+        self.sink.report(prefix="Anomaly sink summary")
+        return self.stats.summary()
+
+
+def _parse_label(value):
+    try:
+        return int(value)
+    except ValueError:
+        return value
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Online MQTT anomaly scoring service")
+    parser.add_argument('--model', required=True,
+                        help="joblib 로 저장된 모델 (예: models/rf_model.pkl), tree_compiler 로 변환한 .npz "
+                             "(RandomForest / GradientBoosting 을 --max-batch 64 / 16 이하로 돌릴 때만 더 빠르고 "
+                             "DecisionTree 는 항상 더 느림), 또는 registry:NAME[@VERSION] (model_registry, "
+                             "--max-batch 가 그 손익분기 이하인 트리 모델은 compiled 배열을 memory-map 으로 열어 "
+                             "프로세스끼리 공유하고, --encoder / --scaler 를 주지 않으면 등록된 것을 씀)")
+    parser.add_argument('--scaler', default=None, help="입력에 적용할 scaler (예: models/scaler.pkl)")
+    parser.add_argument('--encoder', default=None,
+                        help="학습 때 저장한 범주형 encoder (예: models/encoder.pkl). 주면 예측을 라벨 문자열로 되돌림")
+    parser.add_argument('--features', default=None,
+                        help="모델 입력 컬럼 목록 (쉼표 구분). 기본값: registry 에 등록된 학습 컬럼, model.feature_names_in_, "
+                             "encoder 의 컬럼, 기본 + 윈도우 feature 순 (모델의 입력 수와 다르면 시작하지 않음)")
+    parser.add_argument('--pcap', default=None, help="재생할 pcap/pcapng 파일")
+    parser.add_argument('--speed', type=float, default=None, help="pcap 재생 배속 (기본: 최대 속도)")
+    parser.add_argument('--listen', default=None, help="tap 레코드를 받을 host:port")
+    parser.add_argument('--normal-label', default='legitimate', help="정상으로 볼 예측값 (정수면 정수로 해석)")
+    parser.add_argument('--max-batch', type=int, default=256, help="한 번에 predict 할 최대 행 수")
+    parser.add_argument('--max-delay-ms', type=float, default=5.0, help="행이 batch 를 기다리는 최대 시간 (ms)")
+    parser.add_argument('--db', default='data/anomaly_logs.db', help="anomalies 테이블이 있는 SQLite 파일")
+    args = parser.parse_args(argv)
+
+    if bool(args.pcap) == bool(args.listen):
+        parser.error("exactly one of --pcap or --listen is required")
+    if args.pcap:
+        source = pcap_replay_source(args.pcap, speed=args.speed)
+        source_fields = pcap_record_fields()
+    else:
+        host, port = args.listen.rsplit(':', 1)
+        source = tcp_tap_source(host, int(port))
+        # tap 레코드의 키는 클라이언트가 정하므로 미리 확인할 수 없음
+        source_fields = None
+
+    encoder = joblib.load(args.encoder) if args.encoder else None
+    scaler = joblib.load(args.scaler) if args.scaler else None
+    feature_columns = args.features.split(',') if args.features else None
+    model_ref = parse_model_ref(args.model)
+    if model_ref is not None:
+        name, version = model_ref
+        registry = get_registry()
+        metadata = registry.metadata(name, version)
+        # compiled 배열은 batch 가 손익분기보다 작을 때만 더 빠름 (tree_compiler.COMPILED_MAX_BATCH)
+        has_compiled = metadata.get('compiled_bytes') is not None and \
+            prefer_compiled(metadata.get('model_class'), args.max_batch)
+        # 등록할 때 기록한 학습 컬럼 (--features 가 없을 때)
+        feature_columns = feature_columns or metadata.get('feature_columns')
+        model = registry.load(name, version, compiled=has_compiled)
+        registered_encoder, registered_scaler = registry.load_preprocessors(name, version)
+        encoder = encoder or registered_encoder
+        scaler = scaler or registered_scaler
+    elif args.model.endswith('.npz'):
+        from tree_compiler import CompiledTreeEnsemble
+        model = CompiledTreeEnsemble.load(args.model)
+        if not prefer_compiled(model.kind, args.max_batch):
+            print(f"Note: the compiled {model.kind} predictor is slower than sklearn at --max-batch {args.max_batch} "
+                  f"(see tree_compiler.COMPILED_MAX_BATCH); consider the .pkl model.")
+    else:
+        model = joblib.load(args.model)
+    service = ScoringService(
+        model,
+        feature_columns=feature_columns,
+        scaler=scaler,
+        encoder=encoder,
+        normal_label=_parse_label(args.normal_label),
+        max_batch=args.max_batch,
+        max_delay=args.max_delay_ms / 1000.0,
+        db_path=args.db,
+        source_fields=source_fields,
+    )
+    try:
+        asyncio.run(service.run(source))
+    except KeyboardInterrupt:
+        service.stats.report(prefix="Scoring summary")
+
+
+if __name__ == "__main__":
+    main()
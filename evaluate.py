@@ -1,45 +1,30 @@
 # src/evaluate.py
-import pandas as pd
-from sklearn.metrics import accuracy_score, f1_score, confusion_matrix, classification_report
-import joblib
+import numpy as np
+
+from evaluation_runner import UNKNOWN_LABEL, confusion_counts, format_report, metrics_from_confusion
 
 
 def evaluate_model(model, X_test, y_test, model_name="model"):
     print(f"\n📊 Evaluation for {model_name}")
     y_pred = model.predict(X_test)
-    acc = accuracy_score(y_test, y_pred)
-    f1 = f1_score(y_test, y_pred, average='weighted')
-    matrix = confusion_matrix(y_test, y_pred)
-
-    print(f"Accuracy: {acc:.4f} | F1-score: {f1:.4f}")
+    # accuracy / F1 / report 모두 confusion matrix 한 번에서 계산 (실제/예측에 나온 라벨을 정렬한 위치를 코드로)
+    y_true = np.asarray(y_test)
+    y_pred_values = np.asarray(y_pred)
+    labels = np.unique(np.concatenate([y_true, y_pred_values]))
+    matrix = confusion_counts(np.searchsorted(labels, y_true), np.searchsorted(labels, y_pred_values), len(labels))
+    metrics = metrics_from_confusion(matrix)
+    present = [i for i, flag in enumerate(metrics['present']) if flag]
+
+    print(f"Accuracy: {metrics['accuracy']:.4f} | F1-score: {metrics['f1_weighted']:.4f}")
     print("Confusion Matrix:")
-    print(matrix)
+    print(matrix[np.ix_(present, present)])
     print("Classification Report:")
-    print(classification_report(y_test, y_pred))
+    print(format_report(metrics, list(labels) + [UNKNOWN_LABEL]))
     return y_pred
 
 
 if __name__ == "__main__":
-    # 평가용 테스트 데이터 로딩
-    df_test = pd.read_csv("data/processed/test30_reduced.csv")
-    df_test = df_test.astype("category")
-    cat_columns = df_test.select_dtypes(['category']).columns
-    df_test[cat_columns] = df_test[cat_columns].apply(lambda x: x.cat.codes)
-    X_test = df_test.drop("target", axis=1)
-    y_test = df_test["target"]
-
-    # 저장된 모델 불러오기
-    rf_model = joblib.load("models/rf_model.pkl")
-    evaluate_model(rf_model, X_test, y_test, model_name="Random Forest")
-
-    dt_model = joblib.load("models/dt_model.pkl")
-    evaluate_model(dt_model, X_test, y_test, model_name="Decision Tree")
-
-    nb_model = joblib.load("models/nb_model.pkl")
-    evaluate_model(nb_model, X_test, y_test, model_name="Naive Bayes")
-
-    gb_model = joblib.load("models/gb_model.pkl")
-    evaluate_model(gb_model, X_test, y_test, model_name="Gradient Boost")
+    # 등록된 모델 전체를 memory-map test 행렬로 동시에 평가하고 비교 표를 출력 (evaluation_runner 참고)
+    from evaluation_runner import main
 
-    mlp_model = joblib.load("models/mlp_model.pkl")
-    evaluate_model(mlp_model, X_test, y_test, model_name="MLP")
+    raise SystemExit(main())
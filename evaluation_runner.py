@@ -0,0 +1,350 @@
+# src/evaluation_runner.py
+"""
+여러 모델을 같은 test 행렬로 동시에 평가하는 러너.
+
+- test CSV 는 feature_cache.load_test_matrix 로 한 번만 인코딩해 .npy 로 캐시하고, 각 worker 는 경로만 받아
+  읽기 전용 memmap 으로 엽니다 (모든 worker 가 같은 페이지 캐시를 공유).
+- 모델마다 별도 프로세스 (spawn) 에서 --chunk-size 행씩 예측하고 chunk 의 결과는 confusion matrix 에 더하기만 합니다.
+  전체 예측 배열을 만들지 않으므로 메모리는 chunk 크기만큼만 씁니다.
+- accuracy / precision / recall / F1 은 모두 confusion matrix 하나에서 계산합니다 (예측을 다시 훑지 않음).
+- chunk 별 predict 시간으로 처리량 (rows/s), 행당 지연, chunk 지연 p95 를, 한 행짜리 predict 로 단건 지연을 잽니다.
+- registry 에 등록된 모델은 최신 버전을, 아니면 models/*.pkl 을 씁니다. 트리 모델의 compiled 예측기는
+  --chunk-size 가 손익분기 (tree_compiler.COMPILED_MAX_BATCH) 이하이거나 --engine compiled 일 때만 씁니다
+  (큰 chunk 에서는 sklearn 이 3-5배 빠름).
+
+    python evaluation_runner.py --models rf dt nb gb mlp --cores 8
+"""
+import argparse
+import json
+import multiprocessing
+import os
+import resource
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+import joblib
+import numpy as np
+
+from feature_cache import load_test_matrix
+from model_registry import DEFAULT_REGISTRY_DIR, ModelRegistry
+from train_model import MODEL_SPECS
+from tree_compiler import KIND_FOREST, KIND_GRADIENT_BOOSTING, KIND_TREE, CompiledTreeEnsemble, prefer_compiled
+
+DEFAULT_TEST_PATH = 'data/processed/test30_reduced.csv'
+DEFAULT_SUMMARY_PATH = 'models/evaluation_summary.json'
+DEFAULT_CHUNK_SIZE = 100000
+UNKNOWN_LABEL = '(unknown)'
+
+ENGINE_AUTO = 'auto'
+ENGINE_SKLEARN = 'sklearn'
+ENGINE_COMPILED = 'compiled'
+
+# build_model 이 만드는 트리 모델의 tree_compiler 종류
+_COMPILED_KINDS = {'dt': KIND_TREE, 'rf': KIND_FOREST, 'gb': KIND_GRADIENT_BOOSTING}
+
+
+def confusion_counts(y_true, y_pred, n_classes):
+    """
+    클래스 코드 0..n_classes-1 의 confusion matrix ((n_classes + 1) x (n_classes + 1), 행: 실제, 열: 예측).
+    범위 밖의 값 (encoder 가 모르는 클래스 -1 등) 은 마지막 칸으로 셉니다.
+    """
+    size = n_classes + 1
+
+    def index(values):
+        values = np.asarray(values, dtype=np.int64)
+        return np.where((values >= 0) & (values < n_classes), values, n_classes)
+
+    return np.bincount(index(y_true) * size + index(y_pred), minlength=size * size).reshape(size, size)
+
+
+def metrics_from_confusion(matrix):
+    """
+    confusion matrix 에서 accuracy, 클래스별 precision / recall / F1 / support 와 macro / weighted F1 을 계산합니다.
+    sklearn 처럼 실제나 예측에 한 번이라도 나온 클래스만 macro 평균에 넣고, 0 으로 나누는 값은 0 으로 봅니다.
+    """
+    matrix = np.asarray(matrix, dtype=np.int64)
+    tp = np.diag(matrix).astype(np.float64)
+    support = matrix.sum(axis=1)
+    predicted = matrix.sum(axis=0)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        precision = np.where(predicted > 0, tp / predicted, 0.0)
+        recall = np.where(support > 0, tp / support, 0.0)
+        f1 = np.where(precision + recall > 0, 2 * precision * recall / (precision + recall), 0.0)
+    present = (support + predicted) > 0
+    total = int(matrix.sum())
+    return {
+        'rows': total,
+        'accuracy': float(tp.sum() / total) if total else 0.0,
+        'f1_weighted': float((f1 * support).sum() / support.sum()) if support.sum() else 0.0,
+        'f1_macro': float(f1[present].mean()) if present.any() else 0.0,
+        'precision': precision.tolist(),
+        'recall': recall.tolist(),
+        'f1': f1.tolist(),
+        'support': support.tolist(),
+        'present': present.tolist(),
+    }
+
+
+def format_report(metrics, labels=None):
+    """metrics_from_confusion 결과를 classification_report 와 비슷한 표 문자열로 만듭니다."""
+    n = len(metrics['support'])
+    labels = [str(label) for label in labels] if labels is not None else [str(i) for i in range(n)]
+    present = [i for i in range(n) if metrics['present'][i]]
+    width = max([len(labels[i]) for i in present] + [len('weighted avg')])
+    lines = [f"{'':>{width}} {'precision':>9} {'recall':>9} {'f1-score':>9} {'support':>9}", ""]
+    for i in present:
+        lines.append(f"{labels[i]:>{width}} {metrics['precision'][i]:>9.4f} {metrics['recall'][i]:>9.4f} "
+                     f"{metrics['f1'][i]:>9.4f} {metrics['support'][i]:>9}")
+    support = np.asarray(metrics['support'], dtype=np.float64)
+    total = int(support.sum())
+    lines.append("")
+    lines.append(f"{'accuracy':>{width}} {'':>9} {'':>9} {metrics['accuracy']:>9.4f} {total:>9}")
+    for name, weights in (('macro avg', None), ('weighted avg', support[present])):
+        averages = [np.average(np.asarray(metrics[key])[present], weights=weights) if total else 0.0
+                    for key in ('precision', 'recall', 'f1')]
+        lines.append(f"{name:>{width}} " + ' '.join(f"{value:>9.4f}" for value in averages) + f" {total:>9}")
+    return '\n'.join(lines)
+
+
+def find_models(models, registry_root=DEFAULT_REGISTRY_DIR, engine=ENGINE_AUTO, chunk_size=DEFAULT_CHUNK_SIZE):
+    """
+    평가할 모델 목록. models 의 각 항목은 'rf' (최신 버전) 또는 'rf@3' 입니다.
+    registry 에 없는 모델은 MODEL_SPECS 의 models/*.pkl (.npz) 을 쓰고, 둘 다 없으면 건너뜁니다.
+    engine 이 auto 면 chunk_size 가 손익분기 이하인 트리 모델만, compiled 면 compiled 배열이 있는 트리 모델 모두
+    compiled 예측기로 평가합니다.
+    """
+    registry = ModelRegistry(registry_root)
+    entries = []
+    for ref in models:
+        name, _, version = ref.partition('@')
+        if name not in MODEL_SPECS:
+            raise ValueError(f"Unknown model '{name}'. Expected one of {list(MODEL_SPECS)}.")
+        spec = MODEL_SPECS[name]
+        compiled = engine == ENGINE_COMPILED or \
+            (engine == ENGINE_AUTO and name in _COMPILED_KINDS and prefer_compiled(_COMPILED_KINDS[name], chunk_size))
+        entry = {'ref': ref, 'model': name, 'label': spec['label'], 'registry_root': None, 'version': None,
+                 'path': None, 'compiled_path': None, 'compiled': False}
+        if version or registry.versions(name):
+            version = int(version) if version else registry.latest_version(name)
+            meta = registry.metadata(name, version)
+            preprocessors = meta.get('preprocessors') or {}
+            entry.update(registry_root=registry_root, version=version, source=f"registry v{version}",
+                         compiled=compiled and meta.get('compiled_bytes') is not None,
+                         preprocessors=(preprocessors.get('encoder'), preprocessors.get('scaler')))
+        elif os.path.exists(spec['path']):
+            compiled_path = spec['compiled_path']
+            entry.update(path=spec['path'], source=spec['path'], preprocessors=(None, None))
+            if compiled and compiled_path and os.path.exists(compiled_path):
+                entry.update(compiled_path=compiled_path, compiled=True)
+        else:
+            print(f"Skipping {spec['label']}: not trained yet.")
+            continue
+        entries.append(entry)
+    return entries
+
+
+def _load_preprocessors(entry):
+    """entry 에 기록된 (encoder, scaler). 기록이 없으면 models/encoder.pkl, models/scaler.pkl."""
+    encoder = scaler = None
+    if entry['registry_root'] and None not in entry['preprocessors']:
+        encoder, scaler = ModelRegistry(entry['registry_root']).load_preprocessors(entry['model'], entry['version'])
+    return encoder or joblib.load('models/encoder.pkl'), scaler or joblib.load('models/scaler.pkl')
+
+
+def _load_model(entry, cores):
+    if entry['registry_root']:
+        model = ModelRegistry(entry['registry_root']).load(entry['model'], entry['version'], compiled=entry['compiled'])
+    elif entry['compiled']:
+        model = CompiledTreeEnsemble.load(entry['compiled_path'])
+    else:
+        model = joblib.load(entry['path'], mmap_mode='r')
+    if hasattr(model, 'n_jobs'):
+        model.n_jobs = cores # 학습 때의 n_jobs 대신 worker 예산
+    return model
+
+
+def _peak_rss_mb():
+    # Linux 의 ru_maxrss 는 KB 단위 (memmap 으로 읽은 페이지도 포함)
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024.0
+
+
+def _evaluate_model_job(entry, X_path, y_path, n_classes, chunk_size, cores, single_row_probes):
+    """worker 프로세스: memmap test 행렬을 chunk 단위로 예측해 confusion matrix 와 지연 측정값을 반환합니다."""
+    from threadpoolctl import threadpool_limits
+
+    X_test = np.load(X_path, mmap_mode='r')
+    y_test = np.load(y_path, mmap_mode='r')
+    with threadpool_limits(limits=cores):
+        start = time.perf_counter()
+        model = _load_model(entry, cores)
+        load_seconds = time.perf_counter() - start
+
+        matrix = np.zeros((n_classes + 1, n_classes + 1), dtype=np.int64)
+        chunk_seconds = []
+        for start in range(0, len(X_test), chunk_size):
+            # 페이지를 읽는 시간은 predict 지연에서 빼기 위해 chunk 를 먼저 메모리로 복사
+            X_chunk = np.array(X_test[start:start + chunk_size])
+            began = time.perf_counter()
+            y_pred = model.predict(X_chunk)
+            chunk_seconds.append(time.perf_counter() - began)
+            matrix += confusion_counts(y_test[start:start + chunk_size], y_pred, n_classes)
+
+        single_row_seconds = []
+        for i in range(min(single_row_probes, len(X_test))):
+            row = np.array(X_test[i:i + 1])
+            began = time.perf_counter()
+            model.predict(row)
+            single_row_seconds.append(time.perf_counter() - began)
+
+    chunk_seconds = np.asarray(chunk_seconds)
+    predict_seconds = float(chunk_seconds.sum())
+    return {
+        'ref': entry['ref'],
+        'model': entry['model'],
+        'label': entry['label'],
+        'source': entry['source'],
+        'engine': 'compiled' if entry['compiled'] else 'sklearn',
+        'cores': cores,
+        'confusion_matrix': matrix.tolist(),
+        'load_ms': round(load_seconds * 1000.0, 2),
+        'predict_seconds': round(predict_seconds, 3),
+        'rows_per_sec': len(X_test) / predict_seconds if predict_seconds > 0 else 0.0,
+        'us_per_row': predict_seconds * 1e6 / len(X_test),
+        'chunk_p50_ms': float(np.percentile(chunk_seconds, 50) * 1000.0),
+        'chunk_p95_ms': float(np.percentile(chunk_seconds, 95) * 1000.0),
+        'single_row_p50_ms': float(np.median(single_row_seconds) * 1000.0) if single_row_seconds else None,
+        'peak_rss_mb': round(_peak_rss_mb(), 1),
+        'pid': os.getpid(),
+        'error': None,
+    }
+
+
+def evaluate_models(models, test_path=DEFAULT_TEST_PATH, registry_root=DEFAULT_REGISTRY_DIR, engine=ENGINE_AUTO,
+                    total_cores=None, workers=None, chunk_size=DEFAULT_CHUNK_SIZE, single_row_probes=50,
+                    summary_path=DEFAULT_SUMMARY_PATH):
+    """
+    models 를 동시에 평가하고 summary (dict) 를 반환 / summary_path 에 저장합니다.
+    같은 encoder / scaler 를 쓰는 모델들은 test 행렬 하나를 공유합니다.
+    """
+    entries = find_models(models, registry_root, engine=engine, chunk_size=chunk_size)
+    if not entries:
+        raise ValueError("No trained models to evaluate.")
+    total_cores = total_cores or os.cpu_count() or 1
+    workers = max(1, min(workers or total_cores, len(entries)))
+    cores = max(1, total_cores // workers)
+
+    # 전처리 조합마다 test 행렬을 한 번만 만듦
+    matrices = {}
+    for entry in entries:
+        key = entry['preprocessors']
+        if key not in matrices:
+            encoder, scaler = _load_preprocessors(entry)
+            _, _, entry_dir = load_test_matrix(test_path, encoder, scaler)
+            matrices[key] = (os.path.join(entry_dir, 'X_test.npy'), os.path.join(entry_dir, 'y_test.npy'),
+                             list(encoder.target_classes) + [UNKNOWN_LABEL])
+    X_path, _, _ = matrices[entries[0]['preprocessors']]
+    n_rows, n_features = np.load(X_path, mmap_mode='r').shape
+    print(f"Evaluating {len(entries)} model(s) on {n_rows} rows x {n_features} features "
+          f"with {workers} worker(s) x {cores} core(s), chunk {chunk_size} rows")
+
+    run_start = time.time()
+    results = [None] * len(entries) # entries 순서 (같은 모델의 여러 버전도 따로)
+    with ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context('spawn'),
+                             max_tasks_per_child=1) as executor:
+        futures = {}
+        for index, entry in enumerate(entries):
+            X_path, y_path, labels = matrices[entry['preprocessors']]
+            future = executor.submit(_evaluate_model_job, entry, X_path, y_path, len(labels) - 1, chunk_size, cores,
+                                     single_row_probes)
+            futures[future] = (index, entry, labels)
+        for future in as_completed(futures):
+            index, entry, labels = futures[future]
+            try:
+                result = future.result()
+            except Exception as e:
+                result = {'ref': entry['ref'], 'model': entry['model'], 'label': entry['label'],
+                          'source': entry['source'], 'error': f"{type(e).__name__}: {e}"}
+                print(f"[{entry['ref']}] Evaluation failed: {result['error']}")
+            else:
+                result['labels'] = labels
+                result['metrics'] = metrics_from_confusion(result['confusion_matrix'])
+                print(f"[{entry['ref']}] done: accuracy {result['metrics']['accuracy']:.4f}, "
+                      f"{result['rows_per_sec']:,.0f} rows/s")
+            results[index] = result
+
+    summary = {
+        'started_at': time.strftime('%Y-%m-%dT%H:%M:%S', time.localtime(run_start)),
+        'total_seconds': round(time.time() - run_start, 3),
+        'test_path': test_path,
+        'test_rows': int(n_rows),
+        'chunk_size': chunk_size,
+        'workers': workers,
+        'cores_per_worker': cores,
+        'models': results,
+    }
+    if summary_path:
+        summary_dir = os.path.dirname(summary_path)
+        if summary_dir:
+            os.makedirs(summary_dir, exist_ok=True)
+        with open(summary_path, 'w', encoding='utf-8') as f:
+            json.dump(summary, f, indent=2)
+        print(f"Evaluation summary written to {summary_path}")
+    return summary
+
+
+def print_summary(summary, reports=False):
+    if reports:
+        for result in summary['models']:
+            if result['error']:
+                continue
+            print(f"\n📊 Evaluation for {result['label']} ({result['source']}, {result['engine']})")
+            print("Confusion Matrix:")
+            present = [i for i, flag in enumerate(result['metrics']['present']) if flag]
+            print(np.asarray(result['confusion_matrix'])[np.ix_(present, present)])
+            print("Classification Report:")
+            print(format_report(result['metrics'], result['labels']))
+
+    print("\n" + "=" * 118)
+    print(f"{'model':<6}{'source':<14}{'engine':<10}{'accuracy':>9}{'F1 (w)':>9}{'F1 (m)':>9}{'rows/s':>13}"
+          f"{'us/row':>9}{'p95 chunk (ms)':>16}{'1-row (ms)':>12}{'load (ms)':>11}  status")
+    for result in summary['models']:
+        if result['error']:
+            print(f"{result['ref']:<6}{result['source']:<14}{'':<10}{'':>9}{'':>9}{'':>9}{'':>13}{'':>9}{'':>16}"
+                  f"{'':>12}{'':>11}  {result['error']}")
+            continue
+        metrics = result['metrics']
+        single_row = f"{result['single_row_p50_ms']:.3f}" if result['single_row_p50_ms'] is not None else '-'
+        print(f"{result['ref']:<6}{result['source']:<14}{result['engine']:<10}{metrics['accuracy']:>9.4f}"
+              f"{metrics['f1_weighted']:>9.4f}{metrics['f1_macro']:>9.4f}{result['rows_per_sec']:>13,.0f}"
+              f"{result['us_per_row']:>9.2f}{result['chunk_p95_ms']:>16.1f}{single_row:>12}{result['load_ms']:>11.1f}  ok")
+    print(f"Total: {summary['total_seconds']:.1f}s, {summary['test_rows']} rows, {summary['workers']} worker(s) x "
+          f"{summary['cores_per_worker']} core(s)")
+    print("=" * 118)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Evaluate several models concurrently on a memory-mapped test set")
+    parser.add_argument('--test', default=DEFAULT_TEST_PATH)
+    parser.add_argument('--models', nargs='+', default=list(MODEL_SPECS),
+                        help=f"평가할 모델 ({', '.join(MODEL_SPECS)}), 버전 지정은 NAME@VERSION")
+    parser.add_argument('--cores', type=int, default=None, help="전체 코어 예산 (기본값: os.cpu_count())")
+    parser.add_argument('--workers', type=int, default=None, help="동시에 평가할 모델 수 (기본값: 모델 수와 코어 수 중 작은 값)")
+    parser.add_argument('--chunk-size', type=int, default=DEFAULT_CHUNK_SIZE, help="한 번에 예측하는 행 수")
+    parser.add_argument('--single-row-probes', type=int, default=50, help="단건 (1행) 지연 측정 횟수")
+    parser.add_argument('--registry', default=DEFAULT_REGISTRY_DIR, help="모델 registry 디렉터리")
+    parser.add_argument('--engine', choices=[ENGINE_AUTO, ENGINE_SKLEARN, ENGINE_COMPILED], default=ENGINE_AUTO,
+                        help="트리 모델 예측기. auto (기본값): --chunk-size 가 tree_compiler.COMPILED_MAX_BATCH 이하일 때만 "
+                             "compiled, sklearn: 항상 sklearn, compiled: compiled 배열이 있으면 항상 compiled")
+    parser.add_argument('--summary', default=DEFAULT_SUMMARY_PATH, help="evaluation summary JSON 경로")
+    parser.add_argument('--report', action='store_true', help="모델별 confusion matrix / classification report 도 출력")
+    args = parser.parse_args(argv)
+
+    summary = evaluate_models(args.models, test_path=args.test, registry_root=args.registry, engine=args.engine,
+                              total_cores=args.cores, workers=args.workers, chunk_size=args.chunk_size,
+                              single_row_probes=args.single_row_probes, summary_path=args.summary)
+    print_summary(summary, reports=args.report)
+    return 0 if all(result['error'] is None for result in summary['models']) else 1
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,209 @@
+# src/feature_cache.py
+"""
+전처리(인코딩/스케일링)된 학습/평가 데이터 캐시.
+
+train_model.load_data 결과 (X_train, y_train, X_test, y_test, scaler, encoder) 를
+data/cache/<key>/ 아래에 .npy 로 저장하고, 다음 실행부터는 np.load(mmap_mode='r') 로 엽니다.
+memory-map 이므로 CSV 파싱 없이 바로 시작하고, 같은 캐시를 여는 여러 프로세스가 페이지 캐시를 공유합니다.
+
+key 는 원본 CSV 내용의 SHA-256 과 인코딩/스케일링 설정으로 만들어지므로
+CSV 나 설정이 바뀌면 자동으로 새 캐시가 만들어집니다.
+파일 해시는 (경로, 크기, mtime) 기준으로 index.json 에 기억해 두어 매번 파일 전체를 읽지 않습니다.
+"""
+import hashlib
+import json
+import os
+import shutil
+import tempfile
+
+import joblib
+import numpy as np
+import pandas as pd
+
+DEFAULT_CACHE_DIR = 'data/cache'
+
+# load_data 의 인코딩/스케일링 방식. 방식이 바뀌면 version 을 올려 기존 캐시를 무효화합니다.
+DEFAULT_ENCODING_CONFIG = {
+    'version': 2,
+    'categorical': 'fitted_vocabulary',
+    'scaler': 'standard',
+    'target': 'target',
+}
+
+_ARRAY_NAMES = ('X_train', 'y_train', 'X_test', 'y_test')
+
+
+def _file_sha256(path, block_size=8 * 1024 * 1024):
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        while True:
+            block = f.read(block_size)
+            if not block:
+                break
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def _load_index(cache_dir):
+    index_path = os.path.join(cache_dir, 'index.json')
+    if not os.path.exists(index_path):
+        return {}
+    try:
+        with open(index_path, 'r', encoding='utf-8') as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+
+def _save_index(cache_dir, index):
+    os.makedirs(cache_dir, exist_ok=True)
+    fd, tmp_path = tempfile.mkstemp(dir=cache_dir, prefix='index_', suffix='.json')
+    with os.fdopen(fd, 'w', encoding='utf-8') as f:
+        json.dump(index, f, indent=2)
+    os.replace(tmp_path, os.path.join(cache_dir, 'index.json'))
+
+
+def source_file_hash(path, cache_dir=DEFAULT_CACHE_DIR):
+    """CSV 내용의 SHA-256. 크기와 mtime 이 그대로면 index.json 에 기억된 값을 사용합니다."""
+    stat = os.stat(path)
+    abs_path = os.path.abspath(path)
+    index = _load_index(cache_dir)
+    entry = index.get(abs_path)
+    if entry and entry['size'] == stat.st_size and entry['mtime_ns'] == stat.st_mtime_ns:
+        return entry['sha256']
+    sha256 = _file_sha256(path)
+    index[abs_path] = {'size': stat.st_size, 'mtime_ns': stat.st_mtime_ns, 'sha256': sha256}
+    _save_index(cache_dir, index)
+    return sha256
+
+
+def make_cache_key(source_paths, config, cache_dir=DEFAULT_CACHE_DIR):
+    """원본 파일 해시들과 설정(dict)으로 캐시 key 를 만듭니다."""
+    payload = {
+        'sources': [source_file_hash(path, cache_dir) for path in source_paths],
+        'config': config,
+    }
+    return hashlib.sha256(json.dumps(payload, sort_keys=True).encode('utf-8')).hexdigest()[:32]
+
+
+def _write_entry(entry_dir, write_fn):
+    """임시 디렉터리에 쓴 뒤 rename 해서, 다른 프로세스가 쓰다 만 캐시를 읽지 않도록 합니다."""
+    parent = os.path.dirname(entry_dir)
+    os.makedirs(parent, exist_ok=True)
+    tmp_dir = tempfile.mkdtemp(dir=parent, prefix='.tmp_')
+    try:
+        write_fn(tmp_dir)
+        os.rename(tmp_dir, entry_dir)
+    except OSError:
+        # 다른 프로세스가 같은 key 를 먼저 만든 경우: 그쪽 결과를 사용
+        shutil.rmtree(tmp_dir, ignore_errors=True)
+        if not os.path.isdir(entry_dir):
+            raise
+    except BaseException:
+        shutil.rmtree(tmp_dir, ignore_errors=True)
+        raise
+
+
+def load_encoded_data(load_data, train_path, test_path, cache_dir=DEFAULT_CACHE_DIR, encoding_config=None,
+                      use_cache=True, mmap_mode='r'):
+    """
+    load_data(train_path, test_path) 결과를 캐시합니다. 반환값도 같습니다: (X_train, y_train, X_test, y_test, scaler, encoder)
+    X 는 (mmap_mode 가 주어지면) 읽기 전용 memmap, y 는 'target' 이름의 Series 입니다.
+    """
+    encoding_config = encoding_config or DEFAULT_ENCODING_CONFIG
+    if not use_cache:
+        return load_data(train_path, test_path)
+
+    key = make_cache_key([train_path, test_path], encoding_config, cache_dir)
+    entry_dir = os.path.join(cache_dir, key)
+    if not os.path.isdir(entry_dir):
+        print(f"Feature cache miss ({key}); encoding '{train_path}' and '{test_path}'...")
+        X_train, y_train, X_test, y_test, scaler, encoder = load_data(train_path, test_path)
+
+        def write(tmp_dir):
+            arrays = {'X_train': X_train, 'y_train': y_train, 'X_test': X_test, 'y_test': y_test}
+            for name in _ARRAY_NAMES:
+                np.save(os.path.join(tmp_dir, f'{name}.npy'), np.ascontiguousarray(np.asarray(arrays[name])))
+            joblib.dump(scaler, os.path.join(tmp_dir, 'scaler.pkl'))
+            joblib.dump(encoder, os.path.join(tmp_dir, 'encoder.pkl'))
+            with open(os.path.join(tmp_dir, 'meta.json'), 'w', encoding='utf-8') as f:
+                json.dump({'train_path': train_path, 'test_path': test_path, 'config': encoding_config,
+                           'target_name': y_train.name}, f, indent=2)
+
+        _write_entry(entry_dir, write)
+    else:
+        print(f"Feature cache hit ({key}): {entry_dir}")
+
+    with open(os.path.join(entry_dir, 'meta.json'), 'r', encoding='utf-8') as f:
+        meta = json.load(f)
+    arrays = {name: np.load(os.path.join(entry_dir, f'{name}.npy'), mmap_mode=mmap_mode) for name in _ARRAY_NAMES}
+    scaler = joblib.load(os.path.join(entry_dir, 'scaler.pkl'))
+    encoder = joblib.load(os.path.join(entry_dir, 'encoder.pkl'))
+    y_train = pd.Series(arrays['y_train'], name=meta['target_name'])
+    y_test = pd.Series(arrays['y_test'], name=meta['target_name'])
+    return arrays['X_train'], y_train, arrays['X_test'], y_test, scaler, encoder
+
+
+def load_test_matrix(test_path, encoder, scaler, cache_dir=DEFAULT_CACHE_DIR, chunksize=500000, mmap_mode='r'):
+    """
+    test CSV 를 학습 때의 encoder / scaler 로 인코딩해 X_test.npy / y_test.npy 로 캐시하고 memmap 으로 엽니다.
+    key 는 CSV 해시와 encoder / scaler 내용 (joblib.hash) 이므로 같은 전처리를 쓰는 모델들은 같은 파일을 공유합니다.
+    인코딩할 때도 chunk 하나 분량만 메모리에 둡니다. 반환값: (X_test, y_test, entry_dir)
+    """
+    config = {'kind': 'test_matrix', 'encoder': joblib.hash(encoder), 'scaler': joblib.hash(scaler)}
+    key = make_cache_key([test_path], config, cache_dir)
+    entry_dir = os.path.join(cache_dir, key)
+    if not os.path.isdir(entry_dir):
+        print(f"Test matrix cache miss ({key}); encoding '{test_path}'...")
+
+        def write(tmp_dir):
+            # 전체 행 수를 모르므로 chunk 를 raw 파일에 이어 쓴 뒤 .npy 로 옮김
+            raw_path = os.path.join(tmp_dir, 'X_test.raw')
+            n_rows, n_features, y_parts = 0, None, []
+            with open(raw_path, 'wb') as f:
+                for X, y in encoder.iter_transform_csv(test_path, chunksize=chunksize):
+                    if y is None:
+                        raise ValueError(f"'{test_path}' has no '{encoder.target}' column.")
+                    X = np.ascontiguousarray(scaler.transform(X), dtype=np.float64)
+                    X.tofile(f)
+                    n_rows, n_features = n_rows + len(X), X.shape[1]
+                    y_parts.append(y.to_numpy())
+            if not n_rows:
+                raise ValueError(f"'{test_path}' has no rows.")
+            raw = np.memmap(raw_path, dtype=np.float64, mode='r', shape=(n_rows, n_features))
+            out = np.lib.format.open_memmap(os.path.join(tmp_dir, 'X_test.npy'), mode='w+', dtype=np.float64,
+                                            shape=(n_rows, n_features))
+            for start in range(0, n_rows, chunksize):
+                out[start:start + chunksize] = raw[start:start + chunksize]
+            out.flush()
+            del out, raw
+            os.remove(raw_path)
+            np.save(os.path.join(tmp_dir, 'y_test.npy'), np.concatenate(y_parts))
+            with open(os.path.join(tmp_dir, 'meta.json'), 'w', encoding='utf-8') as f:
+                json.dump({'test_path': test_path, 'config': config, 'rows': n_rows, 'features': n_features}, f, indent=2)
+
+        _write_entry(entry_dir, write)
+    else:
+        print(f"Test matrix cache hit ({key}): {entry_dir}")
+    X_test = np.load(os.path.join(entry_dir, 'X_test.npy'), mmap_mode=mmap_mode)
+    y_test = np.load(os.path.join(entry_dir, 'y_test.npy'), mmap_mode=mmap_mode)
+    return X_test, y_test, entry_dir
+
+
+def load_source_columns(csv_path, columns, cache_dir=DEFAULT_CACHE_DIR, use_cache=True):
+    """
+    원본 CSV 에서 columns 만 읽어 DataFrame 으로 반환합니다 (없는 컬럼은 무시).
+    결과는 파일 해시 + 컬럼 목록 key 로 pickle 캐시됩니다.
+    """
+    header = pd.read_csv(csv_path, nrows=0).columns
+    columns = [col for col in columns if col in header]
+    if not use_cache:
+        return pd.read_csv(csv_path, usecols=columns)[columns]
+
+    key = make_cache_key([csv_path], {'columns': columns}, cache_dir)
+    entry_dir = os.path.join(cache_dir, key)
+    if not os.path.isdir(entry_dir):
+        df = pd.read_csv(csv_path, usecols=columns)[columns]
+        _write_entry(entry_dir, lambda tmp_dir: df.to_pickle(os.path.join(tmp_dir, 'columns.pkl')))
+        return df
+    return pd.read_pickle(os.path.join(entry_dir, 'columns.pkl'))
@@ -0,0 +1,128 @@
+# src/feature_encoder.py
+"""
+학습 데이터에서 한 번 fit 한 어휘 (vocabulary) 로 범주형 컬럼을 정수 코드로 바꾸는 인코더.
+
+- 숫자가 아닌 컬럼만 범주형으로 보고, 숫자 컬럼은 그대로 (pd.to_numeric) 통과시킵니다.
+- 컬럼별 어휘는 정렬된 문자열 목록이고 코드는 어휘 안의 위치입니다. 어휘에 없는 값과 결측은 -1.
+- 코드 dtype 은 어휘 크기에 맞는 가장 작은 정수형 (int8 / int16 / int32) 입니다.
+- transform 은 컬럼마다 pd.factorize 로 고유값만 뽑아 pd.Index.get_indexer (해시 조회) 로 한 번에 바꾸므로
+  행 수가 아니라 고유값 수만큼만 파이썬 객체를 다룹니다.
+- partial_fit / iter_transform_csv 로 CSV 를 chunk 단위로 fit / 변환할 수 있고,
+  학습 (load_data), 평가 (evaluate.py), 온라인 점수화 (scoring_service) 가 같은 인코더 (models/encoder.pkl) 를 씁니다.
+"""
+import numpy as np
+import pandas as pd
+
+
+def _code_dtype(n_values):
+    """-1 ~ n_values - 1 을 담을 수 있는 가장 작은 부호 있는 정수형."""
+    for dtype in (np.int8, np.int16, np.int32):
+        if n_values <= np.iinfo(dtype).max:
+            return dtype
+    return np.int64
+
+
+def _normalize_values(values):
+    """
+    고유값 배열을 어휘 비교용 문자열로 바꿉니다.
+    CSV chunk 마다 같은 컬럼이 숫자 / 문자열로 다르게 읽혀도 같은 값이 같은 문자열이 되도록
+    정수인 float (1.0) 는 '1' 로 씁니다.
+    """
+    return pd.Index([
+        str(int(v)) if isinstance(v, (float, np.floating)) and float(v).is_integer() else str(v)
+        for v in values
+    ], dtype=object)
+
+
+def _lookup(series, vocabulary, dtype):
+    """series 의 각 값이 vocabulary (pd.Index) 에서 몇 번째인지 (없거나 결측이면 -1)."""
+    codes, uniques = pd.factorize(series, sort=False)
+    if len(uniques) == 0:
+        return np.full(len(series), -1, dtype=dtype)
+    # 고유값 수만큼의 표 + 결측 (factorize 코드 -1) 용 마지막 칸
+    table = np.append(vocabulary.get_indexer(_normalize_values(uniques)), -1).astype(dtype)
+    return table[codes]
+
+
+class CategoricalEncoder:
+    def __init__(self, target='target', categorical_columns=None):
+        self.target = target
+        self.categorical_columns = list(categorical_columns) if categorical_columns is not None else None
+        self.feature_columns = None
+        self.vocabularies = {}
+        self.target_classes = None
+        self._seen = None
+
+    def partial_fit(self, df):
+        """chunk 하나의 값을 어휘에 더합니다. 범주형 컬럼은 (지정하지 않았다면) 첫 chunk 의 dtype 으로 정합니다."""
+        if self.feature_columns is None:
+            self.feature_columns = [col for col in df.columns if col != self.target]
+            if self.categorical_columns is None:
+                self.categorical_columns = [col for col in self.feature_columns
+                                            if not pd.api.types.is_numeric_dtype(df[col])]
+            self._seen = {col: set() for col in self.categorical_columns}
+            if self.target in df.columns:
+                self._seen[self.target] = set()
+        for col, seen in self._seen.items():
+            if col in df.columns:
+                seen.update(_normalize_values(df[col].dropna().unique()))
+        self._finalize()
+        return self
+
+    def fit(self, df):
+        self.feature_columns = None
+        self.vocabularies = {}
+        self.target_classes = None
+        self._seen = None
+        return self.partial_fit(df)
+
+    def fit_csv(self, path, chunksize=500000):
+        """CSV 전체를 chunk 단위로 읽어 fit 합니다."""
+        self.feature_columns = None
+        self._seen = None
+        for chunk in pd.read_csv(path, chunksize=chunksize):
+            self.partial_fit(chunk)
+        return self
+
+    def _finalize(self):
+        self.vocabularies = {col: pd.Index(sorted(seen), dtype=object)
+                             for col, seen in self._seen.items() if col != self.target}
+        if self.target in self._seen:
+            self.target_classes = pd.Index(sorted(self._seen[self.target]), dtype=object)
+
+    def transform(self, df):
+        """df 의 feature 컬럼을 fit 때의 순서로 인코딩한 DataFrame (target 컬럼 제외). 없는 컬럼은 결측으로 봅니다."""
+        if self.feature_columns is None:
+            raise ValueError("CategoricalEncoder is not fitted yet.")
+        columns = {}
+        for col in self.feature_columns:
+            series = df[col] if col in df.columns else pd.Series(np.nan, index=df.index)
+            vocabulary = self.vocabularies.get(col)
+            if vocabulary is None:
+                columns[col] = pd.to_numeric(series, errors='coerce')
+            else:
+                columns[col] = _lookup(series, vocabulary, _code_dtype(len(vocabulary)))
+        return pd.DataFrame(columns, index=df.index)
+
+    def transform_target(self, y):
+        """target 값을 클래스 코드로 바꿉니다 (모르는 클래스는 -1)."""
+        if self.target_classes is None:
+            raise ValueError("CategoricalEncoder was fitted without a target column.")
+        return pd.Series(_lookup(y, self.target_classes, _code_dtype(len(self.target_classes))),
+                         index=getattr(y, 'index', None), name=self.target)
+
+    def decode_target(self, codes):
+        """클래스 코드를 원래 target 값 (문자열) 으로 되돌립니다. -1 은 None."""
+        codes = np.asarray(codes, dtype=np.int64)
+        labels = np.append(self.target_classes.to_numpy(), None)
+        return labels[np.where(codes < 0, len(labels) - 1, codes)]
+
+    def fit_transform(self, df):
+        self.fit(df)
+        return self.transform(df), self.transform_target(df[self.target])
+
+    def iter_transform_csv(self, path, chunksize=500000):
+        """CSV 를 chunk 단위로 읽어 (X, y) 를 yield 합니다. target 컬럼이 없으면 y 는 None."""
+        for chunk in pd.read_csv(path, chunksize=chunksize):
+            y = self.transform_target(chunk[self.target]) if self.target in chunk.columns else None
+            yield self.transform(chunk), y
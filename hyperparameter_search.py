@@ -0,0 +1,336 @@
+# src/hyperparameter_search.py
+"""
+train_model 의 모델들에 대한 successive halving 하이퍼파라미터 탐색.
+
+- 모델마다 SEARCH_SPACES 에서 후보를 뽑고 (첫 후보는 build_model 의 기본값), 첫 라운드는 작은 층화 표본으로
+  모든 후보를 학습합니다. 라운드마다 validation weighted F1 상위 1/factor 만 남기고 표본을 factor 배로 늘려,
+  마지막 라운드는 max_rows 행으로 학습합니다 (비싼 큰 예산은 유망한 후보만 씀).
+- 층화 표본은 클래스별로 섞은 순서를 한 줄로 엮은 (stratified_order) 앞부분이라 어느 크기에서도 클래스 비율이
+  유지되고, 라운드가 커져도 이전 표본을 포함합니다. validation 은 학습 표본과 겹치지 않는 층화 표본입니다.
+- 모든 모델의 후보를 한 프로세스 풀 (spawn) 에서 동시에 평가합니다. 한 모델의 라운드가 끝나면 다른 모델을
+  기다리지 않고 바로 다음 라운드를 넣습니다. worker 는 학습 행렬 .npy 를 memmap 으로 열고 표본만 복사합니다.
+- 모든 trial 은 tuning summary JSON 에, 모델별 최고 파라미터는 tuned params JSON (train_model.TUNED_PARAMS_PATH)
+  에 저장합니다. train_model / train_orchestrator 가 이 파일을 읽어 build_model 에 넘깁니다.
+
+    python hyperparameter_search.py --models rf dt gb --candidates 9 --factor 3 --cores 8
+"""
+import argparse
+import json
+import math
+import multiprocessing
+import os
+import tempfile
+import time
+import warnings
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+
+import numpy as np
+from sklearn.model_selection import ParameterGrid, ParameterSampler
+
+from evaluation_runner import confusion_counts, metrics_from_confusion
+from train_model import MODEL_SPECS, TUNED_PARAMS_PATH, build_model, load_data_cached
+from train_orchestrator import _as_npy_path
+
+DEFAULT_SUMMARY_PATH = 'models/tuning_summary.json'
+
+# 모델별 탐색 공간 (build_model 의 기본값 위에 덮어쓸 파라미터)
+SEARCH_SPACES = {
+    'rf': {
+        'n_estimators': [50, 100, 200],
+        'max_depth': [None, 20, 40],
+        'min_samples_leaf': [1, 2, 5],
+        'max_features': ['sqrt', 0.5],
+    },
+    'dt': {
+        'criterion': ['gini', 'entropy'],
+        'max_depth': [None, 10, 20, 40],
+        'min_samples_leaf': [1, 2, 5, 10],
+    },
+    'nb': {
+        'var_smoothing': [1e-11, 1e-10, 1e-9, 1e-8, 1e-7, 1e-6, 1e-5],
+    },
+    'gb': {
+        'n_estimators': [50, 100, 200],
+        'learning_rate': [0.05, 0.1, 0.2],
+        'max_depth': [3, 5],
+        'subsample': [0.8, 1.0],
+    },
+    'mlp': {
+        'hidden_layer_sizes': [[100], [64, 32], [128, 64]],
+        'alpha': [1e-5, 1e-4, 1e-3],
+        'learning_rate_init': [1e-3, 3e-3],
+        'max_iter': [60, 130],
+    },
+}
+
+_VALIDATION_CHUNK_ROWS = 100000
+
+
+def stratified_order(y, random_state=42, min_per_class=2):
+    """
+    y 의 인덱스를 앞부분 어디서 잘라도 클래스 비율이 유지되는 순서로 섞습니다.
+    클래스 c 의 k 번째 (섞은 뒤) 원소를 (k + u) / n_c 위치에 두고 위치 순으로 정렬합니다 (u ~ U(0, 1)).
+    드문 클래스도 작은 표본에 들어가도록 클래스마다 처음 min_per_class 개는 맨 앞에 둡니다.
+    """
+    rng = np.random.default_rng(random_state)
+    y = np.asarray(y)
+    positions = np.empty(len(y), dtype=np.float64)
+    for label in np.unique(y):
+        indices = rng.permutation(np.flatnonzero(y == label))
+        rank = np.arange(len(indices), dtype=np.float64)
+        position = (rank + rng.random(len(indices))) / len(indices)
+        position[:min_per_class] -= 1.0
+        positions[indices] = position
+    return np.argsort(positions, kind='stable')
+
+
+def candidate_params(name, n_candidates, random_state=42):
+    """name 의 후보 파라미터 목록. 첫 후보는 기본값 ({}), 나머지는 SEARCH_SPACES 에서 중복 없이 뽑습니다."""
+    space = SEARCH_SPACES[name]
+    n_sampled = min(max(0, n_candidates - 1), len(ParameterGrid(space)))
+    return [{}] + list(ParameterSampler(space, n_iter=n_sampled, random_state=random_state))
+
+
+def halving_schedule(n_candidates, factor, max_rows, min_rows=None):
+    """
+    라운드별 (후보 수, 학습 행 수). 마지막 라운드가 max_rows 가 되도록 factor 배씩 늘립니다.
+    min_rows 를 주면 첫 라운드는 그보다 작아지지 않습니다.
+    """
+    n_rounds = max(1, math.ceil(math.log(n_candidates) / math.log(factor))) if n_candidates > 1 else 1
+    schedule = []
+    for i in range(n_rounds):
+        rows = max_rows // factor ** (n_rounds - 1 - i)
+        if min_rows:
+            rows = min(max(rows, min_rows), max_rows)
+        schedule.append((n_candidates, max(1, rows)))
+        n_candidates = max(1, math.ceil(n_candidates / factor))
+    return schedule
+
+
+def _evaluate_candidate_job(name, params, X_path, y_path, train_order_path, n_rows, validation_path, n_classes, cores):
+    """worker 프로세스: 층화 표본 n_rows 행으로 후보 하나를 학습하고 validation 점수와 시간을 반환합니다."""
+    from sklearn.exceptions import ConvergenceWarning
+    from threadpoolctl import threadpool_limits
+
+    X = np.load(X_path, mmap_mode='r')
+    y = np.load(y_path, mmap_mode='r')
+    # 정렬된 인덱스로 읽어야 memmap 을 앞에서부터 순서대로 읽음
+    train_index = np.sort(np.load(train_order_path, mmap_mode='r')[:n_rows])
+    validation_index = np.load(validation_path)
+    with threadpool_limits(limits=cores), warnings.catch_warnings():
+        warnings.simplefilter('ignore', ConvergenceWarning)
+        model = build_model(name, n_jobs=cores, params=params)
+        if 'verbose' in model.get_params():
+            model.set_params(verbose=0)
+        X_train, y_train = X[train_index], y[train_index]
+        start = time.perf_counter()
+        model.fit(X_train, y_train)
+        fit_seconds = time.perf_counter() - start
+        del X_train, y_train
+
+        matrix = np.zeros((n_classes + 1, n_classes + 1), dtype=np.int64)
+        predict_seconds = 0.0
+        for start in range(0, len(validation_index), _VALIDATION_CHUNK_ROWS):
+            index = validation_index[start:start + _VALIDATION_CHUNK_ROWS]
+            X_chunk = X[index]
+            began = time.perf_counter()
+            y_pred = model.predict(X_chunk)
+            predict_seconds += time.perf_counter() - began
+            matrix += confusion_counts(y[index], y_pred, n_classes)
+    metrics = metrics_from_confusion(matrix)
+    return {
+        'model': name,
+        'params': params,
+        'rows': int(n_rows),
+        'f1_weighted': metrics['f1_weighted'],
+        'accuracy': metrics['accuracy'],
+        'fit_seconds': round(fit_seconds, 3),
+        'predict_us_per_row': predict_seconds * 1e6 / max(1, len(validation_index)),
+        'pid': os.getpid(),
+        'error': None,
+    }
+
+
+def _rank(trials):
+    """점수가 높은 순 (같으면 학습이 빠른 순). 실패한 trial 은 맨 뒤."""
+    return sorted(trials, key=lambda t: (t['error'] is not None, -(t.get('f1_weighted') or 0.0), t.get('fit_seconds') or 0.0))
+
+
+def save_tuned_params(best, path=TUNED_PARAMS_PATH):
+    """모델별 최고 trial 을 path 에 저장합니다 (이번에 탐색하지 않은 모델의 기존 항목은 유지)."""
+    tuned = {}
+    if os.path.exists(path):
+        with open(path, 'r', encoding='utf-8') as f:
+            tuned = json.load(f)
+    for name, trial in best.items():
+        tuned[name] = {'params': trial['params'], 'f1_weighted': trial['f1_weighted'], 'rows': trial['rows'],
+                       'tuned_at': time.strftime('%Y-%m-%dT%H:%M:%S')}
+    directory = os.path.dirname(path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    fd, tmp_path = tempfile.mkstemp(dir=directory or '.', prefix='.tuned_params_', suffix='.json')
+    with os.fdopen(fd, 'w', encoding='utf-8') as f:
+        json.dump(tuned, f, indent=2)
+    os.replace(tmp_path, path)
+    print(f"Tuned parameters for {', '.join(best)} written to {path}")
+
+
+def successive_halving(X_train, y_train, models, n_candidates=9, factor=3, min_rows=None, max_rows=None,
+                       validation_rows=100000, total_cores=None, candidate_cores=1, random_state=42,
+                       summary_path=DEFAULT_SUMMARY_PATH, tuned_params_path=TUNED_PARAMS_PATH):
+    """
+    models 의 후보들을 successive halving 으로 평가하고 summary (dict) 를 반환합니다.
+    summary_path / tuned_params_path 가 있으면 전체 trial 과 모델별 최고 파라미터를 저장합니다.
+    """
+    models = list(dict.fromkeys(models))
+    unknown = [name for name in models if name not in SEARCH_SPACES]
+    if unknown:
+        raise ValueError(f"Unknown model(s) {unknown}. Expected some of {list(SEARCH_SPACES)}.")
+    if factor < 2:
+        raise ValueError("factor must be at least 2.")
+    total_cores = total_cores or os.cpu_count() or 1
+    workers = max(1, total_cores // candidate_cores)
+
+    y = np.asarray(y_train)
+    n_classes = int(y.max()) + 1
+    # validation 과 학습 표본은 겹치지 않는 층화 표본
+    order = stratified_order(y, random_state)
+    validation_rows = min(validation_rows, len(y) // 5)
+    validation_index = np.sort(order[:validation_rows])
+    pool = order[validation_rows:]
+    train_order = pool[stratified_order(y[pool], random_state + 1)]
+    max_rows = min(max_rows or len(train_order), len(train_order))
+
+    schedules = {}
+    for name in models:
+        candidates = candidate_params(name, n_candidates, random_state)
+        schedules[name] = {'candidates': candidates, 'schedule': halving_schedule(len(candidates), factor, max_rows, min_rows)}
+        print(f"[{name}] {len(candidates)} candidates, rounds: "
+              + ' -> '.join(f"{n} x {rows} rows" for n, rows in schedules[name]['schedule']))
+
+    run_start = time.time()
+    trials = []
+    best = {}
+    with tempfile.TemporaryDirectory(prefix='tuning_inputs_') as tmp_dir:
+        X_path = _as_npy_path(X_train, tmp_dir, 'X_train')
+        y_path = _as_npy_path(y, tmp_dir, 'y_train')
+        train_order_path = os.path.join(tmp_dir, 'train_order.npy')
+        validation_path = os.path.join(tmp_dir, 'validation_index.npy')
+        np.save(train_order_path, train_order)
+        np.save(validation_path, validation_index)
+
+        with ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context('spawn')) as executor:
+            running = {}
+            state = {}
+
+            def submit_round(name, round_index, candidates):
+                rows = schedules[name]['schedule'][round_index][1]
+                state[name] = {'round': round_index, 'pending': len(candidates), 'results': [], 'started_at': time.time()}
+                for params in candidates:
+                    future = executor.submit(_evaluate_candidate_job, name, params, X_path, y_path, train_order_path,
+                                             rows, validation_path, n_classes, candidate_cores)
+                    running[future] = (name, round_index, params, rows)
+
+            for name in models:
+                submit_round(name, 0, schedules[name]['candidates'])
+            while running:
+                done, _ = wait(running, return_when=FIRST_COMPLETED)
+                for future in done:
+                    name, round_index, params, rows = running.pop(future)
+                    try:
+                        trial = future.result()
+                    except Exception as e:
+                        trial = {'model': name, 'params': params, 'rows': rows, 'f1_weighted': None,
+                                 'error': f"{type(e).__name__}: {e}"}
+                        print(f"[{name}] Candidate {params} failed: {trial['error']}")
+                    trial['round'] = round_index
+                    trials.append(trial)
+                    state[name]['results'].append(trial)
+                    state[name]['pending'] -= 1
+                    if state[name]['pending']:
+                        continue
+
+                    ranked = _rank(state[name]['results'])
+                    leader = ranked[0]
+                    print(f"[{name}] round {round_index + 1}: {len(ranked)} candidates on {rows} rows in "
+                          f"{time.time() - state[name]['started_at']:.1f}s, best F1 {leader.get('f1_weighted') or 0.0:.4f} "
+                          f"{leader['params']}")
+                    schedule = schedules[name]['schedule']
+                    if round_index + 1 < len(schedule):
+                        survivors = [t['params'] for t in ranked[:schedule[round_index + 1][0]] if t['error'] is None]
+                        if survivors:
+                            submit_round(name, round_index + 1, survivors)
+                            continue
+                    if leader['error'] is None:
+                        best[name] = leader
+
+    summary = {
+        'started_at': time.strftime('%Y-%m-%dT%H:%M:%S', time.localtime(run_start)),
+        'total_seconds': round(time.time() - run_start, 3),
+        'train_rows': int(len(train_order)),
+        'validation_rows': int(validation_rows),
+        'factor': factor,
+        'max_rows': int(max_rows),
+        'workers': workers,
+        'candidate_cores': candidate_cores,
+        'best': best,
+        'trials': trials,
+    }
+    if summary_path:
+        summary_dir = os.path.dirname(summary_path)
+        if summary_dir:
+            os.makedirs(summary_dir, exist_ok=True)
+        with open(summary_path, 'w', encoding='utf-8') as f:
+            json.dump(summary, f, indent=2)
+        print(f"Tuning summary written to {summary_path}")
+    if tuned_params_path and best:
+        save_tuned_params(best, tuned_params_path)
+    return summary
+
+
+def print_summary(summary):
+    print("\n" + "=" * 100)
+    print(f"{'model':<6}{'trials':>7}{'rows':>11}{'F1 (w)':>9}{'default F1':>12}{'fit (s)':>9}  params")
+    for name in dict.fromkeys(t['model'] for t in summary['trials']):
+        trials = [t for t in summary['trials'] if t['model'] == name]
+        best = summary['best'].get(name)
+        if best is None:
+            print(f"{name:<6}{len(trials):>7}{'':>11}{'':>9}{'':>12}{'':>9}  all candidates failed")
+            continue
+        # 같은 행 수에서 기본값 ({}) 과 비교
+        default = next((t for t in trials if t['params'] == {} and t['rows'] == best['rows'] and t['error'] is None), None)
+        default_f1 = f"{default['f1_weighted']:.4f}" if default else '-'
+        print(f"{name:<6}{len(trials):>7}{best['rows']:>11}{best['f1_weighted']:>9.4f}{default_f1:>12}"
+              f"{best['fit_seconds']:>9.1f}  {best['params'] or '(defaults)'}")
+    print(f"Total: {summary['total_seconds']:.1f}s, {summary['workers']} worker(s) x {summary['candidate_cores']} core(s)")
+    print("=" * 100)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Successive-halving hyperparameter search for train_model's models")
+    parser.add_argument('--train', default="data/processed/train70_reduced.csv")
+    parser.add_argument('--test', default="data/processed/test30_reduced.csv")
+    parser.add_argument('--models', nargs='+', default=list(MODEL_SPECS), help=f"탐색할 모델 ({', '.join(MODEL_SPECS)})")
+    parser.add_argument('--candidates', type=int, default=9, help="모델별 후보 수 (기본값 포함)")
+    parser.add_argument('--factor', type=int, default=3, help="라운드마다 남기는 비율의 역수이자 표본 증가 배수")
+    parser.add_argument('--min-rows', type=int, default=None, help="첫 라운드의 최소 학습 행 수")
+    parser.add_argument('--max-rows', type=int, default=None, help="마지막 라운드의 학습 행 수 (기본값: 학습 데이터 전체)")
+    parser.add_argument('--validation-rows', type=int, default=100000, help="validation 층화 표본 행 수")
+    parser.add_argument('--cores', type=int, default=None, help="전체 코어 예산 (기본값: os.cpu_count())")
+    parser.add_argument('--candidate-cores', type=int, default=1, help="후보 하나가 쓰는 코어 수")
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--summary', default=DEFAULT_SUMMARY_PATH, help="tuning summary JSON 경로")
+    parser.add_argument('--output', default=TUNED_PARAMS_PATH, help="모델별 최고 파라미터를 저장할 JSON 경로")
+    args = parser.parse_args(argv)
+
+    X_train, y_train, _, _, _, _ = load_data_cached(args.train, args.test)
+    summary = successive_halving(X_train, y_train, args.models, n_candidates=args.candidates, factor=args.factor,
+                                 min_rows=args.min_rows, max_rows=args.max_rows, validation_rows=args.validation_rows,
+                                 total_cores=args.cores, candidate_cores=args.candidate_cores, random_state=args.seed,
+                                 summary_path=args.summary, tuned_params_path=args.output)
+    print_summary(summary)
+    return 0 if summary['best'] else 1
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
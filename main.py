@@ -1,10 +1,11 @@
-from src.train_model import load_data, train_random_forest
+from src.train_model import load_data_cached, train_random_forest
 from src.evaluate import evaluate_model
 from src.db_utils import init_db, insert_anomalies
+from src.feature_cache import load_source_columns
 import pandas as pd
 
-# 1. 데이터 로딩
-X_train, y_train, X_test, y_test, _ = load_data(
+# 1. 데이터 로딩 (인코딩/스케일링 결과는 data/cache 에 캐시됨)
+X_train, y_train, X_test, y_test, _, encoder = load_data_cached(
     "data/processed/train70_reduced.csv",
     "data/processed/test30_reduced.csv"
 )
@@ -16,16 +17,18 @@ model = train_random_forest(X_train, y_train)
 preds = model.predict(X_test)
 
 # 4. 이상 탐지 결과 추출 (예: 예측과 실제가 다른 경우)
+# 원본 CSV 전체를 다시 파싱하지 않고 DB 에 저장할 컬럼만 (캐시에서) 읽음
 anomaly_indices = y_test.reset_index(drop=True) != preds
-anomaly_df = pd.read_csv("data/processed/test30_reduced.csv").loc[anomaly_indices]
-anomaly_df = anomaly_df.copy()
-anomaly_df["prediction"] = preds[anomaly_indices.values]
-anomaly_df["true_label"] = y_test.reset_index(drop=True)[anomaly_indices.values]
+source_columns = load_source_columns("data/processed/test30_reduced.csv", [
+    "mqtt.msgtype", "mqtt.qos", "mqtt.retain", "mqtt.ver", "mqtt.protoname"
+])
+anomaly_df = source_columns.loc[anomaly_indices].copy()
+# 클래스 코드는 encoder 로 원래 라벨 문자열로 되돌려 저장
+anomaly_df["prediction"] = encoder.decode_target(preds[anomaly_indices.values])
+anomaly_df["true_label"] = encoder.decode_target(y_test.reset_index(drop=True)[anomaly_indices.values])
 
 # 5. DB 저장 (수정 버전)
-cols_to_insert = [col for col in [
-    "mqtt.msgtype", "mqtt.qos", "mqtt.retain", "mqtt.ver", "mqtt.protoname"
-] if col in anomaly_df.columns]
+cols_to_insert = list(source_columns.columns)
 
 cols_to_insert += ["prediction", "true_label"]
 
@@ -0,0 +1,274 @@
+# src/model_registry.py
+"""
+버전별 모델 저장소.
+
+    models/registry/
+        <name>/v0001/model.joblib       joblib 으로 저장한 모델 (기본 무압축: mmap_mode 로 열 수 있음)
+        <name>/v0001/compiled/*.npy     트리 모델이면 tree_compiler 노드 배열 (배열마다 .npy)
+        <name>/v0001/meta.json          feature 목록, encoder/scaler 버전, 학습 metrics, 파라미터, 크기 등
+        _preprocessors/encoder-<sha>.pkl, scaler-<sha>.pkl   내용 해시로 저장 (같은 encoder 는 한 번만)
+
+- 버전은 1 부터 증가하는 번호이고, 임시 디렉터리에 쓴 뒤 rename 하므로 쓰다 만 버전을 읽는 일이 없습니다.
+  (동시에 같은 번호를 만들면 rename 이 실패하고 다음 번호로 다시 시도)
+- load 는 mmap_mode='r' 로 엽니다. 모델 안의 NumPy 배열이 읽기 전용 memmap 이 되어 같은 모델을 여는
+  여러 점수화 프로세스가 페이지 캐시를 공유합니다. sklearn 트리는 unpickle 할 때 노드 배열을 복사하므로
+  트리 모델은 compiled=True (tree_compiler 배열) 로 열어야 공유됩니다. compress > 0 으로 저장한 모델은 mmap 되지 않습니다.
+- 한 번 연 모델은 프로세스 안의 LRU cache (cache_size 개) 에 두고 재사용합니다.
+"""
+import hashlib
+import json
+import os
+import platform
+import shutil
+import tempfile
+import threading
+import time
+from collections import OrderedDict
+
+import joblib
+import sklearn
+
+from tree_compiler import CompiledTreeEnsemble, compile_tree_model
+
+DEFAULT_REGISTRY_DIR = 'models/registry'
+_PREPROCESSOR_DIR = '_preprocessors'
+
+
+def _version_dir_name(version):
+    return f"v{int(version):04d}"
+
+
+def _json_default(value):
+    # numpy 스칼라 / 배열 등 (metrics, params 에 섞여 들어오는 값)
+    if hasattr(value, 'tolist'):
+        return value.tolist()
+    return str(value)
+
+
+class ModelRegistry:
+    def __init__(self, root=DEFAULT_REGISTRY_DIR, cache_size=4, mmap_mode='r'):
+        self.root = root
+        self.cache_size = max(1, cache_size)
+        self.mmap_mode = mmap_mode
+        self._lock = threading.Lock()
+        self._cache = OrderedDict() # (name, version, compiled, mmap_mode) -> 모델 (가장 최근에 쓴 것이 끝)
+        self._hits = 0
+        self._misses = 0
+
+    # ----- 버전 / 메타데이터 -----
+
+    def versions(self, name):
+        """name 의 버전 번호 목록 (오름차순)."""
+        model_dir = os.path.join(self.root, name)
+        if not os.path.isdir(model_dir):
+            return []
+        return sorted(int(entry[1:]) for entry in os.listdir(model_dir)
+                      if entry.startswith('v') and entry[1:].isdigit())
+
+    def latest_version(self, name):
+        versions = self.versions(name)
+        if not versions:
+            raise KeyError(f"No registered versions of model '{name}' in {self.root}.")
+        return versions[-1]
+
+    def version_dir(self, name, version=None):
+        version = self.latest_version(name) if version is None else int(version)
+        path = os.path.join(self.root, name, _version_dir_name(version))
+        if not os.path.isdir(path):
+            raise KeyError(f"Model '{name}' has no version {version} in {self.root}.")
+        return path
+
+    def metadata(self, name, version=None):
+        with open(os.path.join(self.version_dir(name, version), 'meta.json'), 'r', encoding='utf-8') as f:
+            return json.load(f)
+
+    # ----- 저장 -----
+
+    def register_preprocessors(self, encoder=None, scaler=None):
+        """
+        encoder / scaler 를 내용 해시 이름으로 저장하고 {'encoder': id, 'scaler': id} 를 반환합니다.
+        같은 내용이면 다시 쓰지 않습니다. 반환값은 register(preprocessors=...) 에 넘깁니다.
+        """
+        ids = {}
+        directory = os.path.join(self.root, _PREPROCESSOR_DIR)
+        os.makedirs(directory, exist_ok=True)
+        for kind, obj in (('encoder', encoder), ('scaler', scaler)):
+            if obj is None:
+                continue
+            fd, tmp_path = tempfile.mkstemp(dir=directory, prefix=f'.tmp_{kind}_', suffix='.pkl')
+            os.close(fd)
+            try:
+                joblib.dump(obj, tmp_path)
+                digest = hashlib.sha256()
+                with open(tmp_path, 'rb') as f:
+                    for block in iter(lambda: f.read(8 * 1024 * 1024), b''):
+                        digest.update(block)
+                preprocessor_id = f"{kind}-{digest.hexdigest()[:16]}"
+                path = os.path.join(directory, f'{preprocessor_id}.pkl')
+                if os.path.exists(path):
+                    os.remove(tmp_path)
+                else:
+                    os.replace(tmp_path, path)
+            except BaseException:
+                if os.path.exists(tmp_path):
+                    os.remove(tmp_path)
+                raise
+            ids[kind] = preprocessor_id
+        return ids
+
+    def register(self, name, model, feature_columns=None, preprocessors=None, encoder=None, scaler=None,
+                 metrics=None, params=None, compress=0, compiled=True, notes=None):
+        """
+        모델을 새 버전으로 저장하고 메타데이터 dict 를 반환합니다.
+        preprocessors 는 register_preprocessors 의 반환값이고, 대신 encoder / scaler 객체를 넘겨도 됩니다.
+        feature_columns 가 없으면 encoder.feature_columns 또는 model.feature_names_in_ 을 씁니다.
+        compiled=True 면 트리 모델은 tree_compiler 배열도 함께 저장합니다.
+        """
+        preprocessors = dict(preprocessors or {})
+        if encoder is not None or scaler is not None:
+            preprocessors.update(self.register_preprocessors(encoder, scaler))
+        if feature_columns is None:
+            feature_columns = getattr(encoder, 'feature_columns', None) or getattr(model, 'feature_names_in_', None)
+        model_dir = os.path.join(self.root, name)
+        os.makedirs(model_dir, exist_ok=True)
+
+        tmp_dir = tempfile.mkdtemp(dir=model_dir, prefix='.tmp_')
+        try:
+            model_path = os.path.join(tmp_dir, 'model.joblib')
+            start = time.perf_counter()
+            joblib.dump(model, model_path, compress=compress)
+            dump_seconds = time.perf_counter() - start
+            compiled_bytes = None
+            if compiled:
+                try:
+                    ensemble = compile_tree_model(model)
+                except TypeError:
+                    ensemble = None # 트리 모델이 아님
+                if ensemble is not None:
+                    compiled_dir = os.path.join(tmp_dir, 'compiled')
+                    ensemble.save_arrays(compiled_dir)
+                    compiled_bytes = sum(os.path.getsize(os.path.join(compiled_dir, f)) for f in os.listdir(compiled_dir))
+            meta = {
+                'name': name,
+                'model_class': f"{type(model).__module__}.{type(model).__name__}",
+                'created_at': time.strftime('%Y-%m-%dT%H:%M:%S'),
+                'feature_columns': list(feature_columns) if feature_columns is not None else None,
+                'n_features': getattr(model, 'n_features_in_', None),
+                'classes': list(getattr(model, 'classes_', [])) or None,
+                'preprocessors': preprocessors,
+                'metrics': metrics or {},
+                'params': params if params is not None else (model.get_params() if hasattr(model, 'get_params') else {}),
+                'compress': compress,
+                'model_bytes': os.path.getsize(model_path),
+                'compiled_bytes': compiled_bytes,
+                'dump_seconds': round(dump_seconds, 3),
+                'notes': notes,
+                'environment': {'python': platform.python_version(), 'sklearn': sklearn.__version__,
+                                'joblib': joblib.__version__},
+            }
+            # 같은 번호를 다른 프로세스가 먼저 만들었으면 다음 번호로
+            version = (self.versions(name) or [0])[-1] + 1
+            while True:
+                meta['version'] = version
+                with open(os.path.join(tmp_dir, 'meta.json'), 'w', encoding='utf-8') as f:
+                    json.dump(meta, f, indent=2, default=_json_default)
+                try:
+                    os.rename(tmp_dir, os.path.join(model_dir, _version_dir_name(version)))
+                    break
+                except OSError:
+                    if not os.path.isdir(os.path.join(model_dir, _version_dir_name(version))):
+                        raise
+                    version += 1
+        except BaseException:
+            shutil.rmtree(tmp_dir, ignore_errors=True)
+            raise
+        print(f"Registered model '{name}' version {version} ({meta['model_bytes'] / (1024 * 1024):.1f} MB"
+              + (f", compiled {compiled_bytes / (1024 * 1024):.1f} MB" if compiled_bytes else "") + f") in {self.root}")
+        return meta
+
+    # ----- 로드 -----
+
+    def _cached(self, key, load):
+        with self._lock:
+            if key in self._cache:
+                self._cache.move_to_end(key)
+                self._hits += 1
+                return self._cache[key]
+        value = load()
+        with self._lock:
+            self._misses += 1
+            self._cache[key] = value
+            self._cache.move_to_end(key)
+            while len(self._cache) > self.cache_size:
+                self._cache.popitem(last=False)
+        return value
+
+    def load(self, name, version=None, compiled=False, mmap_mode=None):
+        """
+        모델을 엽니다 (version=None 이면 최신). compiled=True 면 CompiledTreeEnsemble (트리 모델만).
+        mmap_mode 를 주지 않으면 registry 기본값 ('r') 을 씁니다. 결과는 LRU cache 에 둡니다.
+        """
+        version = self.latest_version(name) if version is None else int(version)
+        mmap_mode = self.mmap_mode if mmap_mode is None else mmap_mode
+        directory = self.version_dir(name, version)
+
+        def load():
+            if compiled:
+                compiled_dir = os.path.join(directory, 'compiled')
+                if not os.path.isdir(compiled_dir):
+                    raise KeyError(f"Model '{name}' version {version} has no compiled arrays.")
+                return CompiledTreeEnsemble.load_arrays(compiled_dir, mmap_mode=mmap_mode)
+            meta = self.metadata(name, version)
+            # 압축된 파일은 mmap 할 수 없음
+            return joblib.load(os.path.join(directory, 'model.joblib'), mmap_mode=mmap_mode if not meta['compress'] else None)
+
+        return self._cached((name, version, compiled, mmap_mode), load)
+
+    def load_preprocessors(self, name, version=None):
+        """모델 버전에 기록된 (encoder, scaler) 를 엽니다 (없으면 None)."""
+        preprocessors = self.metadata(name, version).get('preprocessors') or {}
+        loaded = []
+        for kind in ('encoder', 'scaler'):
+            preprocessor_id = preprocessors.get(kind)
+            if preprocessor_id is None:
+                loaded.append(None)
+                continue
+            path = os.path.join(self.root, _PREPROCESSOR_DIR, f'{preprocessor_id}.pkl')
+            loaded.append(self._cached((_PREPROCESSOR_DIR, preprocessor_id), lambda path=path: joblib.load(path)))
+        return tuple(loaded)
+
+    def cache_info(self):
+        with self._lock:
+            return {'hits': self._hits, 'misses': self._misses, 'size': len(self._cache), 'capacity': self.cache_size,
+                    'keys': list(self._cache)}
+
+    def clear_cache(self):
+        with self._lock:
+            self._cache.clear()
+
+
+_registries_lock = threading.Lock()
+_registries = {}
+
+
+def get_registry(root=DEFAULT_REGISTRY_DIR):
+    """root 별로 공유하는 ModelRegistry (LRU cache 도 공유)."""
+    key = os.path.abspath(root)
+    with _registries_lock:
+        registry = _registries.get(key)
+        if registry is None:
+            registry = _registries[key] = ModelRegistry(root)
+    return registry
+
+
+def load_model(name, version=None, compiled=False, root=DEFAULT_REGISTRY_DIR):
+    """get_registry(root).load 의 단축."""
+    return get_registry(root).load(name, version=version, compiled=compiled)
+
+
+def parse_model_ref(ref):
+    """'registry:rf' / 'registry:rf@3' 형식이면 (name, version) 을, 아니면 None 을 반환합니다."""
+    if not ref.startswith('registry:'):
+        return None
+    name, _, version = ref[len('registry:'):].partition('@')
+    return name, int(version) if version else None
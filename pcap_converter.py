@@ -1,46 +1,33 @@
-import pyshark
 import pandas as pd
 import os
 
-def convert_pcap_to_csv(pcap_path, csv_path, packet_limit=None):
+from src.data_processing.pcap_reader import iter_pcap_batches, PCAP_COLUMNS
+
+def convert_pcap_to_csv(pcap_path, csv_path, packet_limit=None, batch_size=100000, mqtt_only=True):
     """
-    PCAP 파일을 CSV로 변환
-    - MQTT 패킷에서 주요 필드만 추출
-    - packet_limit: 분석할 최대 패킷 수
+    PCAP/PCAPNG 파일을 CSV로 변환
+    - tshark 없이 파일을 직접 스트리밍 파싱 (batch_size 행씩 CSV 에 append 하므로 메모리 사용량 일정)
+    - 컬럼은 tshark 필드 이름 (config.yaml 의 columns.keep) 과 같아 run_pipeline.py 로 바로 적재 가능
+    - packet_limit: 분석할 최대 패킷 수 (None 이면 전체)
+    - mqtt_only: MQTT 패킷만 저장 (False 면 모든 패킷)
     """
     print(f"📦 Converting: {pcap_path}")
-    cap = pyshark.FileCapture(pcap_path, display_filter="mqtt")
-
-    records = []
-    count = 0
-
-    for packet in cap:
-        try:
-            mqtt_layer = packet.mqtt
-            frame_info = packet.frame_info
-
-            record = {
-                "timestamp": packet.sniff_time.strftime("%Y-%m-%d %H:%M:%S"),
-                "client_id": getattr(mqtt_layer, "clientid", ""),
-                "topic": getattr(mqtt_layer, "topic", ""),
-                "qos": int(getattr(mqtt_layer, "qos", 0)),
-                "msg_type": getattr(mqtt_layer, "msgtype", ""),
-                "length": int(getattr(frame_info, "cap_len", 0)),
-            }
-            records.append(record)
+    csv_dir = os.path.dirname(csv_path)
+    if csv_dir:
+        os.makedirs(csv_dir, exist_ok=True)
 
-            count += 1
-            if packet_limit and count >= packet_limit:
-                break
-        except Exception as e:
-            print(f"⚠️ Skipped a packet due to error: {e}")
-            continue
+    total_rows = 0
+    header_written = False
+    for df in iter_pcap_batches(pcap_path, batch_size=batch_size, mqtt_only=mqtt_only, packet_limit=packet_limit):
+        df.to_csv(csv_path, mode='a' if header_written else 'w', header=not header_written, index=False)
+        header_written = True
+        total_rows += len(df)
+        print(f"  ... {total_rows} rows written")
 
-    df = pd.DataFrame(records)
-    os.makedirs(os.path.dirname(csv_path), exist_ok=True)
-    df.to_csv(csv_path, index=False)
-    print(f"✅ Saved to {csv_path} ({len(df)} rows)")
+    if not header_written: # 패킷이 하나도 없어도 헤더만 있는 CSV 생성
+        pd.DataFrame(columns=PCAP_COLUMNS).to_csv(csv_path, index=False)
+    print(f"✅ Saved to {csv_path} ({total_rows} rows)")
 
 
 if __name__ == "__main__":
-    convert_pcap_to_csv("data/pcap/bruteforce.pcapng", "data/raw/bruteforce.csv", packet_limit=1000)
+    convert_pcap_to_csv("data/pcap/bruteforce.pcapng", "data/raw/bruteforce.csv")
@@ -1,3 +1,7 @@
+import os
+import pickle
+import tempfile
+
 import pandas as pd
 import numpy as np
 from sklearn.utils import shuffle
@@ -24,10 +28,9 @@ def load_and_clean(filepath, label):
 
 
 def augment_dataset(df, repeat, head_rows):
-    augmented = pd.DataFrame()
-    for _ in range(repeat):
-        augmented = augmented.append(df.head(head_rows), ignore_index=True)
-    return augmented
+    """df 의 앞 head_rows 행을 repeat 번 이어 붙입니다 (행 번호를 tiling 해서 한 번에 복사)."""
+    head_index = np.arange(min(head_rows, len(df)))
+    return df.iloc[np.tile(head_index, repeat)].reset_index(drop=True)
 
 
 def create_full_dataset():
@@ -44,43 +47,162 @@ def create_full_dataset():
     print("✅ mqttdataset.csv saved.")
 
 
-def create_augmented_dataset():
-    seed = 7
-
-    legit = load_and_clean('data/raw/legitimate_1w.csv', 'legitimate')
-    trainleg = legit.head(7000000)
-    testleg = legit.tail(3000000)
-
-    slowite = augment_dataset(load_and_clean('data/raw/slowite.csv', 'slowite'), 250, 8000)
-    trainslow = slowite.head(1400000)
-    testslow = slowite.tail(600000)
-
-    malaria = augment_dataset(load_and_clean('data/raw/malaria.csv', 'dos'), 15, 130000)
-    malaria = malaria.append(load_and_clean('data/raw/malaria.csv', 'dos').head(50000), ignore_index=True)
-    trainmalaria = malaria.head(1400000)
-    testmalaria = malaria.tail(600000)
+# 클래스별 증강 / train-test 분할 계획.
+# segments: 원본 앞 head 행 (None 이면 전체) 을 repeat 번 반복한 구간들을 이어 붙인 것이 해당 클래스의 행 순서이고,
+# train 은 그 앞 train 행, test 는 뒤 test 행입니다 (기존 head()/tail() 분할과 동일).
+AUGMENTED_DATASET_PLAN = [
+    {'path': 'data/raw/legitimate_1w.csv', 'label': 'legitimate',
+     'segments': [{'head': None, 'repeat': 1}], 'train': 7000000, 'test': 3000000},
+    {'path': 'data/raw/slowite.csv', 'label': 'slowite',
+     'segments': [{'head': 8000, 'repeat': 250}], 'train': 1400000, 'test': 600000},
+    {'path': 'data/raw/malaria.csv', 'label': 'dos',
+     'segments': [{'head': 130000, 'repeat': 15}, {'head': 50000, 'repeat': 1}], 'train': 1400000, 'test': 600000},
+    {'path': 'data/raw/malformed.csv', 'label': 'malformed',
+     'segments': [{'head': 10000, 'repeat': 200}], 'train': 1400000, 'test': 600000},
+    {'path': 'data/raw/flood.csv', 'label': 'flood',
+     'segments': [{'head': 500, 'repeat': 4000}], 'train': 1400000, 'test': 600000},
+    {'path': 'data/raw/bruteforce.csv', 'label': 'bruteforce',
+     'segments': [{'head': 14000, 'repeat': 142}, {'head': 12000, 'repeat': 1}], 'train': 1400000, 'test': 600000},
+]
+
+
+def _count_csv_rows(path, limit=None, chunksize=1000000):
+    """CSV 데이터 행 수 (limit 이 있으면 최대 limit 행까지만 셉니다)."""
+    return sum(len(chunk) for chunk in pd.read_csv(path, usecols=[0], chunksize=chunksize, nrows=limit))
+
+
+def plan_split_indices(entry, n_source_rows):
+    """
+    계획 항목 하나에 대해 train / test 에 들어갈 원본 행 번호 배열을 (정렬해서) 반환합니다.
+    반복은 행 번호 tiling 으로만 표현하므로 데이터 복사는 일어나지 않습니다.
+    """
+    sequence = np.concatenate([
+        np.tile(np.arange(n_source_rows if seg['head'] is None else min(seg['head'], n_source_rows)), seg['repeat'])
+        for seg in entry['segments']
+    ])
+    train_index = sequence[:entry['train']]
+    test_index = sequence[max(0, len(sequence) - entry['test']):]
+    return np.sort(train_index, kind='stable'), np.sort(test_index, kind='stable')
+
+
+def _iter_planned_rows(entry, split_indices, chunksize):
+    """
+    원본 CSV 를 chunk 단위로 한 번만 읽으면서 (split 이름, DataFrame) 을 chunksize 행 이하씩 yield 합니다.
+    split_indices: {'train': 정렬된 행 번호, 'test': ...}
+    """
+    n_rows_needed = max((int(idx[-1]) + 1 for idx in split_indices.values() if len(idx)), default=0)
+    if n_rows_needed == 0:
+        return
+    row_offset = 0
+    for chunk in pd.read_csv(entry['path'], chunksize=chunksize, nrows=n_rows_needed):
+        chunk = chunk.fillna(0)
+        chunk['target'] = entry['label']
+        chunk = cleandata(chunk)
+        chunk_end = row_offset + len(chunk)
+        for split, index in split_indices.items():
+            lo, hi = np.searchsorted(index, [row_offset, chunk_end])
+            # 같은 원본 행이 여러 번 반복되면 chunk 하나가 많은 출력 행이 되므로 chunksize 단위로 나눠 gather
+            for start in range(lo, hi, chunksize):
+                positions = index[start:min(hi, start + chunksize)] - row_offset
+                yield split, chunk.iloc[positions]
+        row_offset = chunk_end
+
+
+class ExternalShuffler:
+    """
+    메모리 제한 셔플: 행마다 무작위 bucket 을 정해 임시 파일에 흩어 쓰고 (1단계),
+    bucket 하나씩 읽어 bucket 안에서 섞은 뒤 출력 CSV 에 이어 씁니다 (2단계).
+    bucket 선택과 bucket 내부 순열이 모두 균등하므로 전체 순서도 균등한 무작위 순열이고,
+    한 번에 메모리에 올라가는 것은 bucket 하나 (전체 행 수 / n_buckets) 입니다.
+    """
+
+    def __init__(self, tmp_dir, n_buckets, seed):
+        self.n_buckets = max(1, n_buckets)
+        self.rng = np.random.default_rng(seed)
+        self.paths = [os.path.join(tmp_dir, f'bucket_{i:04d}.pkl') for i in range(self.n_buckets)]
+        self.files = [open(path, 'wb') for path in self.paths]
+        self.rows = 0
+
+    def add(self, df):
+        buckets = self.rng.integers(self.n_buckets, size=len(df))
+        order = np.argsort(buckets, kind='stable')
+        bounds = np.searchsorted(buckets[order], np.arange(self.n_buckets + 1))
+        for bucket in range(self.n_buckets):
+            if bounds[bucket] < bounds[bucket + 1]:
+                pickle.dump(df.iloc[order[bounds[bucket]:bounds[bucket + 1]]], self.files[bucket],
+                            protocol=pickle.HIGHEST_PROTOCOL)
+        self.rows += len(df)
+
+    def write_csv(self, output_path, columns, chunksize):
+        for f in self.files:
+            f.close()
+        header = True
+        for path in self.paths:
+            pieces = []
+            with open(path, 'rb') as f:
+                while True:
+                    try:
+                        pieces.append(pickle.load(f))
+                    except EOFError:
+                        break
+            os.remove(path)
+            if not pieces:
+                continue
+            bucket_df = pd.concat(pieces, ignore_index=True).reindex(columns=columns)
+            bucket_df = bucket_df.iloc[self.rng.permutation(len(bucket_df))]
+            for start in range(0, len(bucket_df), chunksize):
+                bucket_df.iloc[start:start + chunksize].to_csv(output_path, mode='w' if header else 'a',
+                                                              header=header, index=False)
+                header = False
+        if header: # 행이 하나도 없으면 헤더만
+            pd.DataFrame(columns=columns).to_csv(output_path, index=False)
+
+
+def build_augmented_dataset(plan=AUGMENTED_DATASET_PLAN, train_path='data/processed/train70_augmented_new.csv',
+                            test_path='data/processed/test30_augmented_new.csv', seed=7, chunksize=500000,
+                            max_rows_in_memory=2000000, tmp_dir=None):
+    """
+    plan 에 따라 train / test CSV 를 만듭니다. 원본 파일은 각각 한 번만 chunk 단위로 읽고,
+    셔플은 ExternalShuffler 로 하므로 메모리 사용량은 chunksize / max_rows_in_memory 로 제한됩니다.
+    """
+    # 모든 원본의 (정리 후) 컬럼 합집합을 계획 순서대로 (기존 pd.concat 결과와 같은 컬럼 구성)
+    columns = []
+    split_indices = {}
+    for entry in plan:
+        header = pd.read_csv(entry['path'], nrows=0)
+        header['target'] = pd.Series(dtype=object)
+        columns += [col for col in cleandata(header).columns if col not in columns]
+        # head 가 모두 정해져 있으면 가장 큰 head 까지만 있으면 됨
+        heads = [seg['head'] for seg in entry['segments']]
+        n_rows = _count_csv_rows(entry['path'], limit=None if None in heads else max(heads))
+        train_index, test_index = plan_split_indices(entry, n_rows)
+        split_indices[entry['path']] = {'train': train_index, 'test': test_index}
+        print(f"Plan: {entry['label']:<12} {n_rows:>10} source rows -> train {len(train_index):>9}, test {len(test_index):>9}")
+
+    totals = {split: sum(len(idx[split]) for idx in split_indices.values()) for split in ('train', 'test')}
+    with tempfile.TemporaryDirectory(dir=tmp_dir, prefix='augment_') as work_dir:
+        shufflers = {}
+        for i, split in enumerate(('train', 'test')):
+            split_dir = os.path.join(work_dir, split)
+            os.makedirs(split_dir)
+            n_buckets = int(np.ceil(totals[split] / max_rows_in_memory))
+            shufflers[split] = ExternalShuffler(split_dir, n_buckets, seed + i)
+
+        for entry in plan:
+            for split, df in _iter_planned_rows(entry, split_indices[entry['path']], chunksize):
+                shufflers[split].add(df)
+            print(f"Scattered '{entry['path']}' ({entry['label']}).")
+
+        for split, output_path in (('train', train_path), ('test', test_path)):
+            output_dir = os.path.dirname(output_path)
+            if output_dir:
+                os.makedirs(output_dir, exist_ok=True)
+            shufflers[split].write_csv(output_path, columns, chunksize)
+            print(f"✅ {output_path} saved ({shufflers[split].rows} rows).")
 
-    malformed = augment_dataset(load_and_clean('data/raw/malformed.csv', 'malformed'), 200, 10000)
-    trainmalformed = malformed.head(1400000)
-    testmalformed = malformed.tail(600000)
-
-    flood = augment_dataset(load_and_clean('data/raw/flood.csv', 'flood'), 4000, 500)
-    trainflood = flood.head(1400000)
-    testflood = flood.tail(600000)
-
-    brute = augment_dataset(load_and_clean('data/raw/bruteforce.csv', 'bruteforce'), 142, 14000)
-    brute = brute.append(load_and_clean('data/raw/bruteforce.csv', 'bruteforce').head(12000), ignore_index=True)
-    trainbrute = brute.head(1400000)
-    testbrute = brute.tail(600000)
-
-    df_train = pd.concat([trainleg, trainmalaria, trainmalformed, trainslow, trainflood, trainbrute])
-    df_train = shuffle(df_train, random_state=seed)
-    df_train.to_csv('data/processed/train70_augmented_new.csv', index=False)
-
-    df_test = pd.concat([testleg, testbrute, testflood, testmalaria, testmalformed, testslow])
-    df_test = shuffle(df_test, random_state=seed)
-    df_test.to_csv('data/processed/test30_augmented_new.csv', index=False)
 
+def create_augmented_dataset():
+    build_augmented_dataset()
     print("✅ train70_augmented_new.csv and test30_augmented_new.csv saved.")
 
 
@@ -1,4 +1,6 @@
 # run_pipeline.py
+import argparse
+import multiprocessing
 import time
 import sys
 import os
@@ -9,11 +11,94 @@ if project_root not in sys.path:
 
 from src.utils.config_loader import load_config
 from src.database.db_utils import get_db_engine, create_target_table_if_not_exists
-from src.data_processing.loader import load_raw_data
-from src.data_processing.preprocessor import preprocess_for_new_schema
-from src.data_processing.db_loader import load_data_to_db
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from src.data_processing.ingest import run_ingest_job, init_ingest_worker, run_ingest_job_in_worker
+from src.data_processing.pipelined import PipelinedIngest
+from src.data_processing.db_loader import WRITE_METHODS
+from src.database.manifest import IngestManifest
+from src.database.unified_logs import UNIFIED_TABLE, ensure_unified_schema
+from src.database.payload_store import PAYLOAD_STORES, PAYLOAD_TABLE, ensure_payload_table
+from src.utils import metrics
 
-def main():
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="MQTT CSV -> MySQL ingest pipeline")
+    parser.add_argument('--mode', choices=['batch', 'stream', 'pipelined'], default=None,
+                        help="batch: 파일 전체를 한 번에 로드 (row limit 적용), "
+                             "stream: chunk 단위로 읽고 적재 (row limit 없음), "
+                             "pipelined: stream + 파싱/전처리와 DB 쓰기를 별도 스레드에서 겹쳐 실행. "
+                             "기본값은 config 의 pipeline.mode")
+    parser.add_argument('--chunksize', type=int, default=None,
+                        help="stream/pipelined 모드에서 한 번에 읽을 행 수. 기본값은 config 의 pipeline.chunksize")
+    parser.add_argument('--parsers', type=int, default=None,
+                        help="pipelined 모드의 파싱/전처리 스레드 수 (기본값: pipeline.parsers 또는 1)")
+    parser.add_argument('--writers', type=int, default=None,
+                        help="pipelined 모드의 DB writer 스레드 수 (기본값: pipeline.writers 또는 1)")
+    parser.add_argument('--queue-size', type=int, default=None,
+                        help="pipelined 모드에서 writer 당 대기 가능한 chunk 수 (기본값: pipeline.queue_size 또는 4)")
+    parser.add_argument('--write-method', choices=list(WRITE_METHODS), default=None,
+                        help="DB 적재 방식: to_sql (기존), executemany (다중 행 INSERT 배치), "
+                             "load_data (TSV + LOAD DATA LOCAL INFILE, MySQL 전용). 기본값은 pipeline.write_method")
+    parser.add_argument('--parse-workers', type=int, default=None,
+                        help="stream 모드에서 파일 하나를 바이트 범위로 나눠 병렬 파싱/전처리할 프로세스 수 "
+                             "(--workers 와 함께 쓰면 무시됨. 기본값: pipeline.parse_workers 또는 1)")
+    parser.add_argument('--workers', type=int, default=None,
+                        help="파일 단위 병렬 처리 프로세스 수. 1 이면 순차 처리 (기본값: pipeline.workers 또는 1)")
+    parser.add_argument('--no-manifest', action='store_true',
+                        help="적재 이력(manifest)을 사용하지 않음: 모든 파일을 처음부터 다시 적재")
+    parser.add_argument('--force', action='store_true',
+                        help="manifest 에 완료로 기록된 파일도 처음부터 다시 적재. 같은 트랜잭션에서 이전에 적재한 그 파일의 "
+                             "행을 먼저 지움 (per_file: 대상 테이블의 모든 행, unified: 그 파일의 assumed_attack_type 행). "
+                             "다른 파일과 같은 테이블 / assumed_attack_type 을 쓰는 파일은 지울 행을 골라낼 수 없으므로 "
+                             "다시 적재하지 않고 오류로 남김 (먼저 직접 정리)")
+    parser.add_argument('--metrics', default=None, metavar='PATH',
+                        help="단계별 metrics (JSON lines) 파일 경로 (기본값: pipeline.metrics_path)")
+    parser.add_argument('--no-metrics', action='store_true', help="단계별 metrics 를 기록하지 않음")
+    parser.add_argument('--profile', nargs='?', const='all', default=None, metavar='STAGES',
+                        help="지정한 stage 를 cProfile + tracemalloc 으로 프로파일링 (예: read,preprocess,db_write. "
+                             "값 없이 쓰면 all). 결과는 --profile-dir 에 저장")
+    parser.add_argument('--profile-dir', default=metrics.DEFAULT_PROFILE_DIR,
+                        help=f"프로파일 결과 디렉터리 (기본값: {metrics.DEFAULT_PROFILE_DIR})")
+    return parser.parse_args(argv)
+
+def file_row_scopes(jobs, schema_mode):
+    """
+    job 마다 대상 테이블에서 그 파일의 행을 고르는 (WHERE 절, 파라미터) 를 job['file_rows'] 에 채웁니다
+    (다시 적재할 때 manifest 가 이전 행을 지우는 데 사용). per_file 은 테이블 전체, unified 는 assumed_attack_type 으로
+    고르고, 다른 파일과 같은 테이블 / assumed_attack_type 을 쓰면 골라낼 수 없으므로 None.
+    """
+    def owner_key(job):
+        return job['source_file_info']['assumed_attack_type'] if schema_mode == 'unified' else job['target_table']
+
+    counts = {}
+    for job in jobs:
+        counts[owner_key(job)] = counts.get(owner_key(job), 0) + 1
+    for job in jobs:
+        if counts[owner_key(job)] > 1:
+            job['file_rows'] = None
+        elif schema_mode == 'unified':
+            job['file_rows'] = ('assumed_attack_type = :assumed_attack_type',
+                                {'assumed_attack_type': job['source_file_info']['assumed_attack_type']})
+        else:
+            job['file_rows'] = (None, {})
+    return jobs
+
+
+def print_file_summary(file_results):
+    """파일별 처리 시간/행 수 요약 표를 출력합니다."""
+    print(f"{'file':<24}{'table':<20}{'rows':>12}{'seconds':>10}{'rows/sec':>12}  status")
+    for result in file_results:
+        rows_per_sec = result['rows'] / result['seconds'] if result['seconds'] > 0 else 0.0
+        if result['error']:
+            status = f"FAILED ({result['error']})"
+        elif result.get('skipped'):
+            status = 'SKIPPED (unchanged)'
+        else:
+            status = 'OK'
+        print(f"{result['filename']:<24}{result['target_table']:<20}{result['rows']:>12}"
+              f"{result['seconds']:>10.2f}{rows_per_sec:>12.0f}  {status}")
+
+def main(argv=None):
+    args = parse_args(argv)
     overall_start_time = time.time()
     print("===============================================")
     print(" Starting MQTT Data Pipeline (ClientID 4096, Time Trimmed, Multi-Table, Row Limit) ") # 제목 업데이트
@@ -25,9 +110,33 @@ def main():
         db_config = config['database']
         data_config = config['data']
         columns_config = config['columns']
+        labeling_config = config.get('anomaly_labeling') or {}
+        pipeline_config = config.get('pipeline') or {}
+        mode = args.mode or pipeline_config.get('mode', 'batch')
+        chunksize = args.chunksize or pipeline_config.get('chunksize', 100000)
+        write_method = args.write_method or pipeline_config.get('write_method', 'to_sql')
+        print(f"Pipeline mode: {mode}" + (f" (chunksize: {chunksize})" if mode != 'batch' else "")
+              + f", write method: {write_method}")
+        metrics_path = None if args.no_metrics else (args.metrics or pipeline_config.get('metrics_path'))
+        # worker 프로세스를 만들기 전에 설정 (환경 변수로 전달됨)
+        run_id = metrics.configure(metrics_path, profile=args.profile, profile_dir=args.profile_dir)
+        if metrics_path:
+            print(f"Stage metrics: {metrics_path} (run id: {run_id})")
+        if args.profile:
+            print(f"Profiling stages '{args.profile}' -> {args.profile_dir}")
 
         print("\n--- Step 2: Initializing Database Connection ---")
-        engine = get_db_engine(db_config)
+        pool_size = None
+        if mode == 'pipelined':
+            # writer 스레드마다 커넥션 하나 + parser 의 manifest 조회 + 메인 스레드
+            pool_size = (args.writers or pipeline_config.get('writers', 1)) + (args.parsers or pipeline_config.get('parsers', 1)) + 1
+        engine = get_db_engine(db_config, pool_size=pool_size)
+        use_manifest = pipeline_config.get('manifest', True) and not args.no_manifest
+        manifest = None
+        if use_manifest:
+            manifest = IngestManifest(engine)
+            manifest.ensure_table()
+            print(f"Ingest manifest enabled (table: {manifest.table_name})" + (", --force: reloading all files" if args.force else ""))
 
         if 'file_list' not in data_config or not data_config['file_list']:
             print("Error: 'data.file_list' is missing or empty in config.yaml.")
@@ -41,9 +150,28 @@ def main():
         total_rows_processed_all_files = 0
         failed_files = []
 
+        # unified: 모든 파일을 mqtt_logs 하나에 적재하고 기존 테이블 이름은 호환 view 로 제공
+        schema_mode = db_config.get('schema_mode', 'per_file')
+        # dedup: payload 는 mqtt_payloads 에 한 번만 저장하고 로그 테이블에는 payload_id 만 (새로 만드는 테이블에만 적용)
+        payload_store = db_config.get('payload_store', 'inline')
+        if payload_store not in PAYLOAD_STORES:
+            print(f"Error: Unknown database.payload_store '{payload_store}'. Expected one of {PAYLOAD_STORES}.")
+            return
+        payload_ids = payload_store == 'dedup'
+        if payload_ids:
+            ensure_payload_table(engine)
+            print(f"Payload store: dedup (dictionary table '{PAYLOAD_TABLE}')")
+        if schema_mode == 'unified':
+            print(f"\n--- Schema mode: unified (table '{UNIFIED_TABLE}') ---")
+            ensure_unified_schema(engine, {
+                info['target_table']: info.get('assumed_attack_type', 'Unknown')
+                for info in data_config['file_list'] if isinstance(info, dict) and 'target_table' in info
+            }, payload_ids=payload_ids)
+
         row_limits_per_file = {
             'legitimate_1w.csv': 100000
         }
+        jobs = []
 
         for file_info in data_config['file_list']:
             if not isinstance(file_info, dict) or 'filename' not in file_info or 'target_table' not in file_info:
@@ -56,57 +184,113 @@ def main():
             assumed_attack_type = file_info.get('assumed_attack_type', 'Unknown')
             full_csv_path = os.path.join(base_dir, filename)
 
-            file_process_start_time = time.time()
-            print(f"\n>>> Processing file: {filename} (Target Table: {target_table_name}, Assumed Type: {assumed_attack_type})")
+            print(f"\n>>> Preparing file: {filename} (Target Table: {target_table_name}, Assumed Type: {assumed_attack_type})")
 
-            try:
-                print(f"--- Ensuring table '{target_table_name}' exists ---")
-                create_target_table_if_not_exists(engine, db_config['db_name'], target_table_name) # 각 테이블 생성
-            except Exception as e:
-                print(f"Error creating/checking table '{target_table_name}': {e}. Skipping file {filename}.")
-                failed_files.append(filename)
-                continue
+            if schema_mode == 'unified':
+                target_table_name = UNIFIED_TABLE
+            else:
+                try:
+                    print(f"--- Ensuring table '{target_table_name}' exists ---")
+                    create_target_table_if_not_exists(engine, db_config['db_name'], target_table_name, # 각 테이블 생성
+                                                      payload_ids=payload_ids)
+                except Exception as e:
+                    print(f"Error creating/checking table '{target_table_name}': {e}. Skipping file {filename}.")
+                    failed_files.append(filename)
+                    continue
 
-            current_file_source_info = {
+            jobs.append({
                 'filename': filename,
-                'assumed_attack_type': assumed_attack_type
-            }
-            current_row_limit = row_limits_per_file.get(filename)
-
-            try:
-                df_raw = load_raw_data(full_csv_path, max_rows=current_row_limit)
-
-                print(f"--- Preprocessing Data for New Schema ('{filename}') ---")
-                df_processed = preprocess_for_new_schema(
-                    df_raw,
-                    columns_config['keep'],
-                    columns_config['rename'],
-                    source_file_info=current_file_source_info
-                )
-
-                print(f"--- Loading Processed Data from '{filename}' into Table '{target_table_name}' ---")
-                if not df_processed.empty:
-                    load_data_to_db(df_processed, target_table_name, engine)
-                    total_rows_processed_all_files += len(df_processed)
-                    print(f"Successfully processed and loaded {len(df_processed)} rows from '{filename}' into '{target_table_name}'.")
-                else:
-                    print(f"No data to load from '{filename}' into '{target_table_name}' (empty dataframe).")
-
-            except FileNotFoundError:
-                print(f"Error: Data file not found at '{full_csv_path}'. Skipping this file.")
-                failed_files.append(filename)
-            except ValueError as e:
-                 print(f"ValueError during processing of file '{filename}': {e}. Skipping this file.")
-                 failed_files.append(filename)
-            except Exception as e:
-                print(f"An unexpected error occurred while processing file '{filename}': {e}. Skipping this file.")
-                failed_files.append(filename)
-            finally:
-                file_process_end_time = time.time()
-                print(f"<<< Finished processing file: {filename} in {file_process_end_time - file_process_start_time:.2f} seconds.")
+                'csv_path': full_csv_path,
+                'target_table': target_table_name,
+                'source_file_info': {
+                    'filename': filename,
+                    'assumed_attack_type': assumed_attack_type
+                },
+                # row limit 은 batch 모드에만 적용 (stream/pipelined 는 chunk 단위로 파일 전체 적재)
+                'max_rows': row_limits_per_file.get(filename) if mode == 'batch' else None
+            })
+
+        # 다시 적재할 때 지울 이전 행의 범위 (--force / 내용이 바뀐 파일)
+        file_row_scopes(jobs, schema_mode)
+
+        pipeline_options = {
+            'num_parsers': args.parsers or pipeline_config.get('parsers', 1),
+            'num_writers': args.writers or pipeline_config.get('writers', 1),
+            'queue_size': args.queue_size or pipeline_config.get('queue_size', 4)
+        }
+        workers = min(args.workers or pipeline_config.get('workers', 1), len(jobs))
+        parse_workers = args.parse_workers or pipeline_config.get('parse_workers', 1)
+        shard_bytes = int(pipeline_config.get('shard_mb', 64)) * 1024 * 1024
+        if parse_workers > 1 and mode != 'stream':
+            print(f"Warning: --parse-workers only applies to stream mode; ignoring it for mode '{mode}'.")
+            parse_workers = 1
+        if parse_workers > 1 and workers > 1:
+            print("Warning: --parse-workers is ignored when files are processed by a worker pool (--workers > 1).")
+            parse_workers = 1
+        file_results = []
+
+        if workers > 1:
+            # 파일마다 테이블이 달라 공유 상태가 없으므로 프로세스 풀로 분산.
+            # 큰 파일부터 제출해 가장 큰 파일의 처리 시간에 가깝게 끝나도록 함
+            jobs_by_size = sorted(jobs, key=lambda job: os.path.getsize(job['csv_path']) if os.path.exists(job['csv_path']) else 0,
+                                  reverse=True)
+            print(f"\n--- Processing {len(jobs)} files with {workers} worker processes ---")
+            results_by_file = {}
+            with ProcessPoolExecutor(max_workers=workers,
+                                     mp_context=multiprocessing.get_context('spawn'),
+                                     initializer=init_ingest_worker,
+                                     initargs=(db_config, use_manifest)) as executor:
+                futures = {
+                    executor.submit(run_ingest_job_in_worker, job, columns_config, labeling_config,
+                                    mode, chunksize, dict(pipeline_options, num_parsers=1), write_method,
+                                    args.force): job
+                    for job in jobs_by_size
+                }
+                for future in as_completed(futures):
+                    job = futures[future]
+                    try:
+                        result = future.result()
+                    except Exception as e: # worker 프로세스 자체가 죽은 경우 등
+                        result = {'filename': job['filename'], 'target_table': job['target_table'],
+                                  'rows': 0, 'skipped': False, 'seconds': 0.0, 'error': f"{type(e).__name__}: {e}", 'pid': None}
+                    print(f"<<< [{result['filename']}] done in worker pid {result['pid']}: {result['rows']} rows, "
+                          f"{result['seconds']:.2f} seconds" + (f", error: {result['error']}" if result['error'] else ""))
+                    results_by_file[job['filename']] = result
+            file_results = [results_by_file[job['filename']] for job in jobs]
+        elif mode == 'pipelined':
+            pipeline = PipelinedIngest(engine, columns_config, labeling_config=labeling_config,
+                                       chunksize=chunksize, write_method=write_method, manifest=manifest,
+                                       force=args.force, **pipeline_options)
+            pipeline_results = pipeline.run(jobs)
+            for job in jobs:
+                result = pipeline_results[job['filename']]
+                file_results.append({'filename': job['filename'], 'target_table': job['target_table'],
+                                     'rows': result['rows'], 'skipped': result['skipped'], 'seconds': result['seconds'],
+                                     'error': result['error'], 'pid': os.getpid()})
+                metrics.emit({'stage': 'file', 'file': job['filename'], 'table': job['target_table'], 'mode': mode,
+                              'rows': result['rows'], 'skipped': result['skipped'], 'error': result['error'],
+                              'seconds': round(result['seconds'], 6)})
+        else:
+            for job in jobs:
+                print(f"\n>>> Processing file: {job['filename']} (Target Table: {job['target_table']}, "
+                      f"Assumed Type: {job['source_file_info']['assumed_attack_type']})")
+                file_results.append(run_ingest_job(job, engine, columns_config, labeling_config=labeling_config,
+                                                   mode=mode, chunksize=chunksize,
+                                                   parse_workers=parse_workers, shard_bytes=shard_bytes,
+                                                   write_method=write_method, manifest=manifest, force=args.force))
+
+        for result in file_results:
+            total_rows_processed_all_files += result['rows']
+            if result['error']:
+                failed_files.append(result['filename'])
 
         overall_end_time = time.time()
+        metrics.emit({'stage': 'pipeline', 'mode': mode, 'write_method': write_method, 'workers': workers,
+                      'files': len(file_results), 'failed': len(failed_files), 'rows': total_rows_processed_all_files,
+                      'seconds': round(overall_end_time - overall_start_time, 6)})
         print("\n===============================================")
+        if file_results:
+            print_file_summary(file_results)
         print(f"All files processed. Total rows loaded to DB (across all tables): {total_rows_processed_all_files}")
         if failed_files:
             print(f"Warning: The following files failed to process or were skipped: {', '.join(failed_files)}")
@@ -1,15 +1,173 @@
 # src/data_processing/db_loader.py
+import os
+import tempfile
+from itertools import islice
+
 import pandas as pd
+from sqlalchemy.engine import Engine
+from sqlalchemy.exc import DBAPIError
+
+from src.data_processing.schema import format_time_of_day
+from src.database.db_utils import transaction
+from src.database.payload_store import replace_payloads, uses_payload_ids
+from src.utils import metrics
+
+# to_sql: 기존 DataFrame.to_sql 경로 (호환용)
+# executemany: 다중 행 INSERT ... VALUES 배치 (mysqlconnector 는 executemany 를 multi-row INSERT 로 재작성)
+# load_data: chunk 를 임시 TSV 로 쓰고 LOAD DATA LOCAL INFILE (MySQL 전용, 실패 시 executemany 로 대체)
+WRITE_METHODS = ('to_sql', 'executemany', 'load_data')
+DEFAULT_WRITE_METHOD = 'to_sql'
+
+_warned_fallbacks = set()
+
+
+def _placeholder(dialect):
+    paramstyle = dialect.paramstyle
+    if paramstyle == 'qmark':
+        return lambda i: '?'
+    if paramstyle == 'numeric':
+        return lambda i: f':{i + 1}'
+    if paramstyle == 'named':
+        return lambda i: f':p{i}'
+    return lambda i: '%s' # format / pyformat
+
+
+def _to_db_values(df):
+    """DB-API 로 넘길 수 있도록 결측은 None, datetime / time(timedelta) 은 문자열, numpy 스칼라는 파이썬 객체로 바꿉니다."""
+    converted = {}
+    for col in df.columns:
+        series = df[col]
+        if pd.api.types.is_datetime64_any_dtype(series):
+            series = series.dt.strftime('%Y-%m-%d %H:%M:%S.%f')
+        elif pd.api.types.is_timedelta64_dtype(series):
+            series = format_time_of_day(series)
+        series = series.astype(object)
+        converted[col] = series.where(series.notna(), None)
+    return pd.DataFrame(converted, index=df.index)
+
+
+def _insert_executemany(df, table_name, connection, batch_size):
+    placeholder = _placeholder(connection.dialect)
+    columns = ', '.join(df.columns)
+    values = ', '.join(placeholder(i) for i in range(len(df.columns)))
+    insert_sql = f"INSERT INTO {table_name} ({columns}) VALUES ({values})"
+    rows = _to_db_values(df).itertuples(index=False, name=None)
+    if connection.dialect.paramstyle == 'named':
+        rows = ({f'p{i}': v for i, v in enumerate(row)} for row in rows)
+    while True:
+        batch = list(islice(rows, batch_size))
+        if not batch:
+            break
+        connection.exec_driver_sql(insert_sql, batch)
+
 
-def load_data_to_db(df, table_name, engine):
+def _escape_tsv_text(series):
+    # LOAD DATA 의 기본 ESCAPED BY '\\' 규칙에 맞춰 특수문자 이스케이프
+    return (series.str.replace('\\', '\\\\', regex=False)
+                  .str.replace('\t', '\\t', regex=False)
+                  .str.replace('\n', '\\n', regex=False)
+                  .str.replace('\r', '\\r', regex=False)
+                  .str.replace('\0', '\\0', regex=False))
+
+
+def _write_tsv(df, path):
+    """LOAD DATA 용 TSV 를 씁니다. NULL 은 \\N 으로 표기합니다."""
+    text_columns = []
+    for col in df.columns:
+        series = df[col]
+        if pd.api.types.is_datetime64_any_dtype(series):
+            text = series.dt.strftime('%Y-%m-%d %H:%M:%S.%f')
+        elif pd.api.types.is_timedelta64_dtype(series):
+            text = format_time_of_day(series)
+        elif pd.api.types.is_float_dtype(series) and series.dropna().mod(1).eq(0).all():
+            # INT 컬럼에 '1883.0' 이 들어가지 않도록 정수값 float 은 정수로 표기
+            text = series.astype('Int64').astype(str)
+        elif pd.api.types.is_numeric_dtype(series) or pd.api.types.is_bool_dtype(series):
+            text = series.astype(str)
+        else:
+            text = _escape_tsv_text(series.astype(str))
+        text_columns.append(text.where(series.notna(), '\\N'))
+    lines = text_columns[0].str.cat(text_columns[1:], sep='\t') if len(text_columns) > 1 else text_columns[0]
+    with open(path, 'w', encoding='utf-8', newline='') as f:
+        for start in range(0, len(lines), 100000):
+            f.write('\n'.join(lines.iloc[start:start + 100000]))
+            f.write('\n')
+
+
+def _load_data_local_infile(df, table_name, connection):
+    fd, tsv_path = tempfile.mkstemp(prefix=f'{table_name}_', suffix='.tsv')
+    os.close(fd)
+    try:
+        _write_tsv(df, tsv_path)
+        escaped_path = tsv_path.replace('\\', '\\\\').replace("'", "\\'")
+        load_sql = (
+            f"LOAD DATA LOCAL INFILE '{escaped_path}' INTO TABLE {table_name} "
+            f"CHARACTER SET utf8mb4 "
+            f"FIELDS TERMINATED BY '\\t' ESCAPED BY '\\\\' "
+            f"LINES TERMINATED BY '\\n' "
+            f"({', '.join(df.columns)})"
+        )
+        connection.exec_driver_sql(load_sql)
+    finally:
+        os.remove(tsv_path)
+
+
+def _warn_once(key, message):
+    if key not in _warned_fallbacks:
+        _warned_fallbacks.add(key)
+        print(message)
+
+
+def load_data_to_db(df, table_name, engine, method=None, batch_size=10000):
+    """
+    DataFrame 을 table_name 에 append 합니다.
+    engine 에는 Engine 또는 Connection 을 넘길 수 있고, method 는 WRITE_METHODS 중 하나입니다.
+    table_name 이 payload_id 컬럼을 가진 테이블이면 payload 를 payload 사전에 저장하고 id 로 바꿔서 씁니다
+    (사전과 로그 행은 한 트랜잭션).
+    """
+    method = method or DEFAULT_WRITE_METHOD
+    if method not in WRITE_METHODS:
+        raise ValueError(f"Unknown write method '{method}'. Expected one of {WRITE_METHODS}.")
     if df.empty:
         print(f"No data to load into the database for the current batch.")
         return
-    print(f"Loading {len(df)} rows into table: '{table_name}'...")
-    try:
-        chunk_size = 10000
-        df.to_sql(name=table_name, con=engine, if_exists='append', index=False, chunksize=chunk_size)
-        print(f"Successfully loaded data into '{table_name}'.")
-    except Exception as e:
-        print(f"Error loading data into database table '{table_name}': {e}")
-        raise
+    if 'payload' in df.columns and uses_payload_ids(engine, table_name):
+        with transaction(engine) as connection:
+            with metrics.stage('payload_dedup', table=table_name, rows=len(df)):
+                df = replace_payloads(df, connection)
+            return load_data_to_db(df, table_name, connection, method=method, batch_size=batch_size)
+    print(f"Loading {len(df)} rows into table: '{table_name}' (method: {method})...")
+    if metrics.enabled():
+        metrics.instrument_engine(engine if isinstance(engine, Engine) else engine.engine)
+    with metrics.stage('db_write', table=table_name, rows=len(df), method=method) as record:
+        try:
+            if method == 'to_sql':
+                chunk_size = batch_size
+                time_columns = [col for col in df.columns if pd.api.types.is_timedelta64_dtype(df[col])]
+                if time_columns:
+                    # to_sql 은 timedelta 를 정수로 쓰므로 time 컬럼 (자정 기준 timedelta) 만 문자열로 바꿔서 넘김
+                    df = df.assign(**{col: format_time_of_day(df[col]) for col in time_columns})
+                df.to_sql(name=table_name, con=engine, if_exists='append', index=False, chunksize=chunk_size)
+            else:
+                with transaction(engine) as connection:
+                    if method == 'load_data' and connection.dialect.name != 'mysql':
+                        _warn_once(('dialect', connection.dialect.name),
+                                   f"Warning: LOAD DATA is MySQL-only; using executemany for dialect '{connection.dialect.name}'.")
+                        method = 'executemany'
+                        record['method'] = method
+                    if method == 'load_data':
+                        try:
+                            _load_data_local_infile(df, table_name, connection)
+                        except DBAPIError as e:
+                            # local_infile 이 비활성화된 서버/클라이언트 등. 실패한 LOAD DATA 문은 문장 단위로 롤백됨
+                            _warn_once(('load_data', table_name),
+                                       f"Warning: LOAD DATA LOCAL INFILE failed for '{table_name}' ({e.orig}); "
+                                       f"falling back to executemany.")
+                            record['method'] = 'executemany'
+                            _insert_executemany(df, table_name, connection, batch_size)
+                    else:
+                        _insert_executemany(df, table_name, connection, batch_size)
+            print(f"Successfully loaded data into '{table_name}'.")
+        except Exception as e:
+            print(f"Error loading data into database table '{table_name}': {e}")
+            raise
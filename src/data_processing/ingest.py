@@ -0,0 +1,272 @@
+# src/data_processing/ingest.py
+import functools
+import os
+import time
+
+from src.database.db_utils import get_db_engine, transaction
+from src.database.manifest import READER_SERIAL, READER_SHARDED, READER_WHOLE_FILE, IngestManifest
+from src.database.unified_logs import prepare_frame_for_table
+from src.data_processing.loader import load_raw_data, iter_raw_data_chunks, iter_raw_data_parallel
+from src.data_processing.preprocessor import preprocess_for_new_schema
+from src.data_processing.schema import raw_read_dtypes
+from src.data_processing.db_loader import load_data_to_db
+from src.data_processing.pipelined import PipelinedIngest
+from src.utils import metrics
+
+
+def _write_chunk(df_processed, target_table_name, engine, write_method, manifest, filename, progress,
+                 assumed_attack_type=None):
+    """chunk 하나를 적재합니다. manifest 가 있으면 INSERT 와 진행 상황 기록을 한 트랜잭션으로 커밋합니다."""
+    # 통합 테이블이면 컬럼 변환 + 일 파티션 생성 (DDL 이므로 트랜잭션 밖에서)
+    df_processed = prepare_frame_for_table(df_processed, target_table_name, engine, assumed_attack_type)
+    if manifest is None:
+        if not df_processed.empty:
+            load_data_to_db(df_processed, target_table_name, engine, method=write_method)
+        return
+    with transaction(engine) as connection:
+        if not df_processed.empty:
+            load_data_to_db(df_processed, target_table_name, connection, method=write_method)
+        manifest.record_chunk(connection, filename, target_table_name, len(df_processed), **progress)
+
+
+def stream_file_to_db(csv_path, target_table_name, engine, columns_config, source_file_info,
+                      labeling_config=None, chunksize=100000, parse_workers=1, shard_bytes=64 * 1024 * 1024,
+                      write_method=None, manifest=None, resume=None, max_rows=None, load_mode='stream'):
+    """
+    CSV 파일을 chunk 단위로 읽고 -> 전처리 -> 테이블에 append 합니다.
+    한 번에 메모리에 올라가는 데이터는 chunk 하나뿐이므로 peak 메모리는 파일 크기가 아닌 chunksize 로 결정됩니다.
+    parse_workers > 1 이면 파일을 바이트 범위로 나눠 여러 프로세스에서 파싱/전처리하고 순서대로 적재합니다.
+    resume (IngestManifest.plan 결과) 이 주어지면 마지막으로 커밋된 chunk 다음부터 읽습니다
+    (행 수로 기록된 위치는 직렬 리더로, 바이트 오프셋으로 기록된 위치는 shard 리더로).
+    max_rows 를 주면 원본 앞쪽 max_rows 행까지만 적재합니다 (직렬 리더만 지원).
+    반환값: (이번 실행에서 적재한 행 수, 파일 끝까지 읽었는지 여부)
+    """
+    filename = source_file_info.get('filename', csv_path)
+    preprocess = functools.partial(
+        preprocess_for_new_schema,
+        columns_to_keep=columns_config['keep'],
+        column_rename_map=columns_config['rename'],
+        source_file_info=source_file_info,
+        labeling_config=labeling_config,
+        report_memory=columns_config.get('memory_report', False)
+    )
+    read_dtypes = raw_read_dtypes(columns_config['keep'])
+    resume_byte_offset = resume.get('source_byte_offset') if resume else None
+    resume_rows = (resume.get('source_rows_consumed') or 0) if resume else 0
+    if max_rows is not None and resume_byte_offset is not None:
+        raise ValueError(f"Cannot apply max_rows to '{filename}': its progress was recorded as a byte offset "
+                         f"by the sharded reader. Resume it in stream mode without a row limit.")
+    truncated = False
+
+    def serial_chunks():
+        nonlocal truncated
+        rows_consumed = resume_rows
+        for df_chunk in iter_raw_data_chunks(csv_path, chunksize, usecols=columns_config['keep'], skip_rows=resume_rows,
+                                             dtype=read_dtypes):
+            if max_rows is not None and rows_consumed + len(df_chunk) > max_rows:
+                # 제한 뒤에 행이 남아 있으므로 파일 끝까지 적재한 것이 아님
+                truncated = True
+                df_chunk = df_chunk.iloc[:max(0, max_rows - rows_consumed)]
+                if df_chunk.empty:
+                    return
+            rows_consumed += len(df_chunk)
+            yield {'source_rows_consumed': rows_consumed, 'load_mode': load_mode, 'reader': READER_SERIAL}, \
+                preprocess(df_chunk)
+            if truncated:
+                return
+
+    def sharded_chunks():
+        shards = iter_raw_data_parallel(csv_path, parse_workers, shard_bytes=shard_bytes,
+                                        usecols=columns_config['keep'], transform=preprocess,
+                                        fallback_chunksize=chunksize, start_offset=resume_byte_offset,
+                                        yield_offsets=True, dtype=read_dtypes)
+        rows_consumed = 0
+        for shard_end, df_processed in shards:
+            if shard_end is None:
+                # 직렬 경로로 대체된 경우: 전처리는 행을 버리지 않으므로 결과 행 수 = 원본 행 수
+                rows_consumed += len(df_processed)
+                yield {'source_rows_consumed': rows_consumed, 'load_mode': load_mode, 'reader': READER_SERIAL}, \
+                    df_processed
+            else:
+                yield {'source_byte_offset': shard_end, 'load_mode': load_mode, 'reader': READER_SHARDED}, df_processed
+
+    if resume_byte_offset is not None or (parse_workers > 1 and not resume_rows and max_rows is None):
+        processed_chunks = sharded_chunks()
+    else:
+        if parse_workers > 1 and resume_rows:
+            print(f"Note: '{filename}' was partially loaded by the serial reader; resuming it serially.")
+        elif parse_workers > 1:
+            print(f"Note: max_rows is set for '{filename}'; reading it with the serial reader.")
+        processed_chunks = serial_chunks()
+
+    rows_loaded = 0
+    chunk_start_time = time.time()
+    for chunk_index, (progress, df_processed) in enumerate(processed_chunks):
+        _write_chunk(df_processed, target_table_name, engine, write_method, manifest, filename, progress,
+                     source_file_info.get('assumed_attack_type'))
+        rows_loaded += len(df_processed)
+        print(f"[{filename}] chunk {chunk_index}: {len(df_processed)} rows in "
+              f"{time.time() - chunk_start_time:.2f} seconds (total {rows_loaded}).")
+        chunk_start_time = time.time()
+    return rows_loaded, not truncated
+
+
+def load_file_to_db(csv_path, target_table_name, engine, columns_config, source_file_info,
+                    labeling_config=None, max_rows=None, write_method=None, manifest=None):
+    """
+    파일 전체(또는 max_rows 행)를 한 번에 읽어 전처리 후 적재합니다.
+    반환값: (적재한 행 수, 파일 끝까지 읽었는지 여부)
+    """
+    filename = source_file_info.get('filename', csv_path)
+    # 한 행 더 읽어서 max_rows 뒤에 남은 행이 있는지 (잘린 적재인지) 확인
+    df_raw = load_raw_data(csv_path, max_rows=max_rows + 1 if max_rows is not None else None,
+                           usecols=columns_config['keep'], dtype=raw_read_dtypes(columns_config['keep']))
+    truncated = max_rows is not None and len(df_raw) > max_rows
+    if truncated:
+        df_raw = df_raw.iloc[:max_rows]
+
+    print(f"--- Preprocessing Data for New Schema ('{filename}') ---")
+    df_processed = preprocess_for_new_schema(
+        df_raw,
+        columns_config['keep'],
+        columns_config['rename'],
+        source_file_info=source_file_info,
+        labeling_config=labeling_config,
+        report_memory=columns_config.get('memory_report', False)
+    )
+
+    print(f"--- Loading Processed Data from '{filename}' into Table '{target_table_name}' ---")
+    # 전체를 읽은 결과도 행 수로 기록하므로, 잘린 적재는 다음 실행이 직렬 chunk 리더로 이어서 읽을 수 있음
+    _write_chunk(df_processed, target_table_name, engine, write_method, manifest, filename,
+                 {'source_rows_consumed': len(df_raw), 'load_mode': 'batch', 'reader': READER_WHOLE_FILE},
+                 source_file_info.get('assumed_attack_type'))
+    if df_processed.empty:
+        print(f"No data to load from '{filename}' into '{target_table_name}' (empty dataframe).")
+        return 0, not truncated
+    print(f"Successfully processed and loaded {len(df_processed)} rows from '{filename}' into '{target_table_name}'.")
+    return len(df_processed), not truncated
+
+
+def ingest_file(job, engine, columns_config, labeling_config=None, mode='batch', chunksize=100000,
+                pipeline_options=None, parse_workers=1, shard_bytes=64 * 1024 * 1024, write_method=None,
+                manifest=None, force=False):
+    """
+    job ({'filename', 'csv_path', 'target_table', 'source_file_info', 'max_rows', 'file_rows'}) 하나를 지정한 모드로
+    적재합니다. manifest 가 주어지면 변경되지 않은 파일은 건너뛰고, 중단된 파일은 이어서 적재하고,
+    다시 적재하는 파일은 이전 행을 지운 뒤 적재합니다 (file_rows: IngestManifest.plan 참고).
+    반환값: {'rows': 이번 실행에서 적재한 행 수, 'skipped': manifest 로 건너뛰었는지 여부}
+    실패 시 예외를 그대로 올립니다.
+    """
+    if mode == 'pipelined':
+        pipeline = PipelinedIngest(engine, columns_config, labeling_config=labeling_config,
+                                   chunksize=chunksize, write_method=write_method, manifest=manifest,
+                                   force=force, **(pipeline_options or {}))
+        result = pipeline.run([job])[job['filename']]
+        if result['error']:
+            raise RuntimeError(result['error'])
+        return {'rows': result['rows'], 'skipped': result['skipped']}
+
+    resume = None
+    if manifest is not None:
+        if not os.path.exists(job['csv_path']):
+            raise FileNotFoundError(job['csv_path'])
+        resume = manifest.plan(job['filename'], job['target_table'], job['csv_path'], force=force,
+                               max_rows=job.get('max_rows'), file_rows=job.get('file_rows'))
+        if resume['action'] == 'skip':
+            return {'rows': 0, 'skipped': True}
+        if resume['action'] != 'resume':
+            resume = None
+
+    if mode == 'stream':
+        rows_loaded, reached_end = stream_file_to_db(
+            job['csv_path'], job['target_table'], engine, columns_config, job['source_file_info'],
+            labeling_config=labeling_config, chunksize=chunksize, parse_workers=parse_workers, shard_bytes=shard_bytes,
+            write_method=write_method, manifest=manifest, resume=resume, max_rows=job.get('max_rows'))
+    elif resume is not None:
+        # 중단된 적재 (stream / pipelined 의 chunk, 또는 max_rows 로 잘린 batch) 를 이어서:
+        # 기록된 위치가 행 수면 직렬 chunk 리더로, 바이트 오프셋이면 shard 리더로 나머지를 읽음
+        print(f"Manifest: '{job['filename']}' was partially loaded ({resume['load_mode'] or 'unknown'} mode); "
+              f"loading the rest with the {READER_SHARDED if resume['source_byte_offset'] is not None else READER_SERIAL} "
+              f"chunk reader.")
+        rows_loaded, reached_end = stream_file_to_db(
+            job['csv_path'], job['target_table'], engine, columns_config, job['source_file_info'],
+            labeling_config=labeling_config, chunksize=chunksize, parse_workers=1, shard_bytes=shard_bytes,
+            write_method=write_method, manifest=manifest, resume=resume, max_rows=job.get('max_rows'),
+            load_mode='batch')
+    else:
+        rows_loaded, reached_end = load_file_to_db(
+            job['csv_path'], job['target_table'], engine, columns_config, job['source_file_info'],
+            labeling_config=labeling_config, max_rows=job.get('max_rows'), write_method=write_method,
+            manifest=manifest)
+    if manifest is not None:
+        if reached_end:
+            manifest.mark_complete(job['filename'], job['target_table'])
+        else:
+            print(f"Manifest: '{job['filename']}' was loaded up to max_rows={job['max_rows']}; it stays in progress "
+                  f"so a later run without the limit loads the remaining rows.")
+    return {'rows': rows_loaded, 'skipped': False}
+
+
+def run_ingest_job(job, engine, columns_config, labeling_config=None, mode='batch', chunksize=100000,
+                   pipeline_options=None, parse_workers=1, shard_bytes=64 * 1024 * 1024, write_method=None,
+                   manifest=None, force=False):
+    """
+    ingest_file 을 실행하고 예외를 잡아 파일별 결과 dict 로 돌려줍니다.
+    반환값: {'filename', 'target_table', 'rows', 'skipped', 'seconds', 'error', 'pid'}
+    """
+    filename = job['filename']
+    start_time = time.time()
+    rows_loaded = 0
+    skipped = False
+    error = None
+    # 하위 단계 (read / preprocess / db_write) 의 metrics 레코드에 파일/테이블 이름을 붙이고,
+    # 파일 전체는 'file' stage 로 기록 (manifest 조회/갱신 포함 DB round-trip 수)
+    with metrics.context(file=filename, table=job['target_table']), metrics.stage('file', mode=mode) as record:
+        try:
+            result = ingest_file(job, engine, columns_config, labeling_config=labeling_config, mode=mode,
+                                 chunksize=chunksize, pipeline_options=pipeline_options,
+                                 parse_workers=parse_workers, shard_bytes=shard_bytes, write_method=write_method,
+                                 manifest=manifest, force=force)
+            rows_loaded, skipped = result['rows'], result['skipped']
+        except FileNotFoundError:
+            error = f"Data file not found at '{job['csv_path']}'"
+            print(f"Error: Data file not found at '{job['csv_path']}'. Skipping this file.")
+        except ValueError as e:
+            error = f"ValueError: {e}"
+            print(f"ValueError during processing of file '{filename}': {e}. Skipping this file.")
+        except Exception as e:
+            error = f"{type(e).__name__}: {e}"
+            print(f"An unexpected error occurred while processing file '{filename}': {e}. Skipping this file.")
+        record.update(rows=rows_loaded, skipped=skipped, error=error)
+    elapsed = time.time() - start_time
+    print(f"<<< Finished processing file: {filename} in {elapsed:.2f} seconds.")
+    return {
+        'filename': filename,
+        'target_table': job['target_table'],
+        'rows': rows_loaded,
+        'skipped': skipped,
+        'seconds': elapsed,
+        'error': error,
+        'pid': os.getpid(),
+    }
+
+
+# --- process pool 용 (worker 프로세스마다 자체 SQLAlchemy 엔진을 가짐) ---
+_worker_engine = None
+
+
+_worker_manifest = None
+
+
+def init_ingest_worker(db_config, use_manifest=False):
+    """ProcessPoolExecutor initializer: worker 프로세스 전용 DB 엔진 (과 manifest) 을 만듭니다."""
+    global _worker_engine, _worker_manifest
+    _worker_engine = get_db_engine(db_config)
+    _worker_manifest = IngestManifest(_worker_engine) if use_manifest else None
+
+
+def run_ingest_job_in_worker(job, columns_config, labeling_config=None, mode='batch', chunksize=100000,
+                             pipeline_options=None, write_method=None, force=False):
+    return run_ingest_job(job, _worker_engine, columns_config, labeling_config=labeling_config, mode=mode,
+                          chunksize=chunksize, pipeline_options=pipeline_options, write_method=write_method,
+                          manifest=_worker_manifest, force=force)
@@ -0,0 +1,192 @@
+# src/data_processing/labeling.py
+"""
+attack_type / is_anomaly 라벨링 엔진.
+
+config.yaml 의 anomaly_labeling.rules 에 선언된 규칙을 컬럼 단위 boolean 마스크로
+컴파일한 뒤 np.select 로 한 번에 평가합니다. 규칙은 위에서 아래 순서로 적용되며,
+나중에 매칭된 규칙이 앞선 규칙의 결과를 덮어씁니다 (기존 row-wise if 체인과 동일).
+
+규칙 형식:
+    - name: publish_flood              # 로그/디버깅용 이름
+      base_in: ['MQTT_Flood']          # (선택) assumed_attack_type 이 이 목록에 있을 때만 적용
+      base_not_in: ['Legitimate']      # (선택) assumed_attack_type 이 이 목록에 없을 때만 적용
+      when:                            # 컬럼 조건 (AND)
+        msg_type: 3                    #   스칼라 -> 같음
+        client_id: null                #   null -> 결측
+        mqtt_len: {gt: 1000}           #   연산자: eq, ne, gt, ge, lt, le, in, outside, null
+      attack_type: '{base}_LargePayload'   # '{base}' 는 assumed_attack_type 으로 치환
+      is_anomaly: 1                    # (선택) 지정한 규칙만 is_anomaly 를 설정
+
+when 에서는 실제 컬럼 외에 파생 컬럼 is_mqtt 와, is_anomaly (is_anomaly 를 설정하는
+규칙들로 먼저 계산된 값) 를 사용할 수 있습니다.
+"""
+import numpy as np
+import pandas as pd
+
+DEFAULT_BASE_ATTACK_TYPE = 'Unclassified'
+
+# config.yaml 에 규칙이 없을 때 사용하는 기본 규칙 (기존 determine_attack_and_anomaly 와 동일)
+DEFAULT_LABELING_RULES = [
+    {'name': 'publish_flood', 'base_in': ['MQTT_Flood'],
+     'when': {'msg_type': 3},
+     'attack_type': 'MQTT_Flood_Detected', 'is_anomaly': 1},
+    {'name': 'publish_large_payload', 'base_not_in': ['MQTT_Flood'],
+     'when': {'msg_type': 3, 'mqtt_len': {'gt': 1000}},
+     'attack_type': '{base}_LargePayload', 'is_anomaly': 1},
+    {'name': 'connect_bruteforce', 'base_in': ['BruteForce_Attempt'],
+     'when': {'msg_type': 1},
+     'attack_type': 'BruteForce_Connect_Attempt', 'is_anomaly': 1},
+    {'name': 'malformed_no_msg_type', 'base_in': ['Malformed_Packet'],
+     'when': {'msg_type': None, 'tcp_dstport': 1883},
+     'attack_type': 'Malformed_Suspected_NoMsgType', 'is_anomaly': 1},
+    {'name': 'malformed_invalid_msg_type', 'base_in': ['Malformed_Packet'],
+     'when': {'msg_type': {'outside': [0, 16]}},
+     'attack_type': 'Malformed_InvalidMsgType', 'is_anomaly': 1},
+    {'name': 'non_mqtt_tcp', 'base_not_in': ['Legitimate', 'Unclassified'],
+     'when': {'is_mqtt': False, 'ip_proto': 6},
+     'attack_type': 'NonMQTT_{base}'},
+    {'name': 'non_mqtt_general_tcp', 'base_in': ['Legitimate', 'Unclassified'],
+     'when': {'is_mqtt': False, 'ip_proto': 6},
+     'attack_type': 'NonMQTT_General_TCP'},
+    {'name': 'legitimate_mqtt', 'base_in': ['Legitimate'],
+     'when': {'is_anomaly': 0, 'is_mqtt': True},
+     'attack_type': 'Legitimate_MQTT'},
+    {'name': 'legitimate_non_mqtt_tcp', 'base_in': ['Legitimate'],
+     'when': {'is_anomaly': 0, 'is_mqtt': False, 'ip_proto': 6},
+     'attack_type': 'Legitimate_NonMQTT_TCP'},
+    {'name': 'legitimate_non_mqtt_other', 'base_in': ['Legitimate'],
+     'when': {'is_anomaly': 0, 'is_mqtt': False, 'ip_proto': {'ne': 6}},
+     'attack_type': 'Legitimate_NonMQTT_OtherProto'},
+]
+
+_OPERATORS = ('eq', 'ne', 'gt', 'ge', 'lt', 'le', 'in', 'outside', 'null')
+
+
+def _get_labeling_rules(labeling_config):
+    """anomaly_labeling 설정에서 규칙 목록을 꺼냅니다. 비어 있으면 기본 규칙을 사용합니다."""
+    rules = (labeling_config or {}).get('rules')
+    return rules if rules else DEFAULT_LABELING_RULES
+
+
+def compile_labeling_rules(labeling_config, base_attack_type):
+    """
+    파일 하나(= assumed_attack_type 하나)에 적용될 규칙만 골라 검증합니다.
+    base_in / base_not_in 조건은 파일 단위 상수이므로 여기서 미리 걸러냅니다.
+    """
+    compiled = []
+    for rule in _get_labeling_rules(labeling_config):
+        name = rule.get('name', '<unnamed>')
+        if 'base_in' in rule and base_attack_type not in rule['base_in']:
+            continue
+        if 'base_not_in' in rule and base_attack_type in rule['base_not_in']:
+            continue
+        if 'attack_type' not in rule and 'is_anomaly' not in rule:
+            raise ValueError(f"Labeling rule '{name}' sets neither 'attack_type' nor 'is_anomaly'.")
+        when = rule.get('when') or {}
+        if 'is_anomaly' in rule and 'is_anomaly' in when:
+            raise ValueError(f"Labeling rule '{name}' cannot both set and depend on 'is_anomaly'.")
+        for column, condition in when.items():
+            if isinstance(condition, dict):
+                unknown = set(condition) - set(_OPERATORS)
+                if unknown:
+                    raise ValueError(f"Labeling rule '{name}': unknown operator(s) {unknown} for column '{column}'.")
+        compiled.append({
+            'name': name,
+            'when': when,
+            'attack_type': rule['attack_type'].format(base=base_attack_type) if 'attack_type' in rule else None,
+            'is_anomaly': int(rule['is_anomaly']) if 'is_anomaly' in rule else None,
+        })
+    return compiled
+
+
+def _column_mask(values, condition):
+    """단일 컬럼 조건을 boolean ndarray 로 평가합니다. 결측값은 비교 결과 False 로 취급합니다."""
+    if condition is None:
+        return values.isna().to_numpy()
+    if not isinstance(condition, dict):
+        condition = {'eq': condition}
+
+    mask = np.ones(len(values), dtype=bool)
+    for op, operand in condition.items():
+        if op == 'null':
+            op_mask = values.isna() if operand else values.notna()
+        elif op == 'eq':
+            op_mask = values == operand
+        elif op == 'ne':
+            # NaN != x 는 True (기존 row-wise 비교와 동일)
+            op_mask = ~(values == operand).fillna(False).astype(bool)
+        elif op == 'gt':
+            op_mask = values > operand
+        elif op == 'ge':
+            op_mask = values >= operand
+        elif op == 'lt':
+            op_mask = values < operand
+        elif op == 'le':
+            op_mask = values <= operand
+        elif op == 'in':
+            op_mask = values.isin(operand)
+        elif op == 'outside':
+            low, high = operand
+            op_mask = values.notna() & ~((values > low) & (values < high)).fillna(False).astype(bool)
+        mask &= op_mask.fillna(False).to_numpy(dtype=bool)
+    return mask
+
+
+def _is_mqtt_mask(df):
+    """msg_type 이 있거나, 비어 있지 않은 client_id 가 있으면 MQTT 트래픽으로 봅니다."""
+    n_rows = len(df)
+    msg_type_present = df['msg_type'].notna().to_numpy() if 'msg_type' in df.columns else np.zeros(n_rows, dtype=bool)
+    if 'client_id' in df.columns:
+        client_id = df['client_id']
+        client_id_present = (client_id.notna() & ~client_id.isin(['', 'nan'])).to_numpy(dtype=bool)
+    else:
+        client_id_present = np.zeros(n_rows, dtype=bool)
+    return msg_type_present | client_id_present
+
+
+def _rule_mask(df, when, derived):
+    mask = np.ones(len(df), dtype=bool)
+    for column, condition in when.items():
+        if column in derived:
+            values = pd.Series(derived[column], index=df.index)
+        elif column in df.columns:
+            values = df[column]
+        else:
+            values = pd.Series(np.nan, index=df.index)
+        mask &= _column_mask(values, condition)
+    return mask
+
+
+def _select_last_match(masks, choices, default, n_rows):
+    """np.select 는 첫 매칭을 고르므로 역순으로 넘겨 "마지막 매칭 우선"을 구현합니다."""
+    if not masks:
+        return np.full(n_rows, default)
+    return np.select(masks[::-1], choices[::-1], default=default)
+
+
+def label_attack_and_anomaly(df, base_attack_type=None, labeling_config=None):
+    """
+    규칙을 벡터 연산으로 평가해 (attack_type, is_anomaly) ndarray 쌍을 반환합니다.
+    """
+    base_attack_type = base_attack_type or (labeling_config or {}).get(
+        'default_attack_type', DEFAULT_BASE_ATTACK_TYPE)
+    rules = compile_labeling_rules(labeling_config, base_attack_type)
+    derived = {'is_mqtt': _is_mqtt_mask(df)}
+
+    # 1단계: is_anomaly 를 설정하는 규칙
+    anomaly_rules = [r for r in rules if r['is_anomaly'] is not None]
+    is_anomaly = _select_last_match(
+        [_rule_mask(df, r['when'], derived) for r in anomaly_rules],
+        [r['is_anomaly'] for r in anomaly_rules],
+        0, len(df),
+    ).astype(np.int8)
+    derived['is_anomaly'] = is_anomaly
+
+    # 2단계: attack_type. 1단계 결과를 조건(is_anomaly)으로 참조할 수 있음
+    type_rules = [r for r in rules if r['attack_type'] is not None]
+    attack_type = _select_last_match(
+        [_rule_mask(df, r['when'], derived) for r in type_rules],
+        [r['attack_type'] for r in type_rules],
+        base_attack_type, len(df),
+    ).astype(object)
+    return attack_type, is_anomaly
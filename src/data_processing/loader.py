@@ -1,13 +1,27 @@
 # src/data_processing/loader.py
+import io
+import multiprocessing
+import os
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+
 import pandas as pd
 
-def load_raw_data(csv_path, max_rows=None):
+from src.utils import metrics
+
+def load_raw_data(csv_path, max_rows=None, usecols=None, dtype=None):
     load_message = f"Loading raw data from: {csv_path}"
     if max_rows is not None:
         load_message += f" (max_rows: {max_rows})"
     print(load_message)
     try:
-        df_raw = pd.read_csv(csv_path, low_memory=False, nrows=max_rows)
+        usecols_filter = None
+        if usecols is not None:
+            wanted = set(usecols)
+            usecols_filter = lambda col: col in wanted
+        with metrics.stage('read', file=os.path.basename(csv_path)) as record, open(csv_path, 'rb') as f:
+            df_raw = pd.read_csv(f, low_memory=False, nrows=max_rows, usecols=usecols_filter, dtype=dtype)
+            record.update(rows=len(df_raw), bytes_read=f.tell())
         if max_rows is not None:
             actual_rows_loaded = len(df_raw)
             print(f"Successfully loaded {actual_rows_loaded} rows from '{csv_path}' (requested max: {max_rows}).")
@@ -20,3 +34,169 @@ def load_raw_data(csv_path, max_rows=None):
     except Exception as e:
         print(f"Error loading raw data from '{csv_path}': {e}")
         raise
+
+def iter_raw_data_chunks(csv_path, chunksize, usecols=None, skip_rows=0, dtype=None):
+    """
+    CSV 를 chunksize 행 단위로 읽어 DataFrame 을 하나씩 돌려줍니다.
+    usecols 를 지정하면 해당 컬럼만 파싱합니다 (파일에 없는 컬럼은 무시).
+    skip_rows 를 지정하면 헤더 다음의 앞쪽 skip_rows 행을 건너뜁니다 (중단된 적재 재개용).
+    dtype 은 read_csv 에 그대로 넘깁니다 (예: schema.raw_read_dtypes()).
+    """
+    print(f"Streaming raw data from: {csv_path} (chunksize: {chunksize}"
+          + (f", skipping first {skip_rows} rows" if skip_rows else "") + ")")
+    usecols_filter = None
+    if usecols is not None:
+        wanted = set(usecols)
+        usecols_filter = lambda col: col in wanted
+    try:
+        skiprows = range(1, skip_rows + 1) if skip_rows else None
+        with open(csv_path, 'rb') as f:
+            reader = pd.read_csv(f, chunksize=chunksize, usecols=usecols_filter, low_memory=False,
+                                 skiprows=skiprows, dtype=dtype)
+            with reader:
+                while True:
+                    # chunk 하나를 읽는 시간과 그동안 파일에서 읽은 바이트 수를 'read' stage 로 기록
+                    offset = f.tell()
+                    with metrics.stage('read', file=os.path.basename(csv_path)) as record:
+                        chunk = next(reader, None)
+                        record.update(rows=len(chunk) if chunk is not None else 0, bytes_read=f.tell() - offset)
+                    if chunk is None:
+                        break
+                    yield chunk
+    except FileNotFoundError:
+        print(f"Error: Raw data file not found at {csv_path}")
+        raise
+    except Exception as e:
+        print(f"Error streaming raw data from '{csv_path}': {e}")
+        raise
+
+
+_SCAN_BLOCK_BYTES = 16 * 1024 * 1024
+
+
+def plan_csv_shards(csv_path, shard_bytes, quotechar=b'"', start_offset=None):
+    """
+    CSV 파일을 레코드 경계(따옴표 밖의 줄바꿈)에 맞춘 바이트 범위로 나눕니다.
+
+    mqtt.msg 처럼 따옴표로 감싼 필드 안에 줄바꿈이 있을 수 있으므로, 파일을 한 번 훑으며
+    따옴표 개수의 홀짝으로 "따옴표 안" 여부를 추적하고, 따옴표 밖의 줄바꿈에서만 자릅니다.
+    ("" 로 이스케이프된 따옴표는 홀짝에 영향을 주지 않음)
+
+    start_offset 을 지정하면 (이전에 커밋된 레코드 경계) 그 지점부터 나눕니다.
+
+    반환값: (header_end, [(start, end), ...]) - header_end 는 헤더 다음 레코드의 시작 오프셋.
+    따옴표 짝이 맞지 않는 등 안전하게 자를 수 없으면 None 을 반환합니다.
+    """
+    file_size = os.path.getsize(csv_path)
+    header_end = start_offset
+    boundaries = []
+    next_target = None
+    in_quotes = False
+    offset = start_offset or 0
+    with open(csv_path, 'rb') as f:
+        f.seek(offset)
+        while True:
+            block = f.read(_SCAN_BLOCK_BYTES)
+            if not block:
+                break
+            position = 0
+            while True:
+                # 헤더 끝 또는 다음 목표 지점 이후의 첫 "따옴표 밖 줄바꿈"을 찾음
+                if header_end is not None:
+                    if next_target is None:
+                        next_target = (boundaries[-1] if boundaries else header_end) + shard_bytes
+                    if next_target >= offset + len(block):
+                        break
+                    search_from = max(position, next_target - offset)
+                    in_quotes ^= block.count(quotechar, position, search_from) % 2 == 1
+                    position = search_from
+                newline = block.find(b'\n', position)
+                if newline < 0:
+                    break
+                in_quotes ^= block.count(quotechar, position, newline) % 2 == 1
+                position = newline + 1
+                if in_quotes:
+                    continue
+                if header_end is None:
+                    header_end = offset + position
+                else:
+                    boundaries.append(offset + position)
+                    next_target = None
+            in_quotes ^= block.count(quotechar, position) % 2 == 1
+            offset += len(block)
+
+    if in_quotes or header_end is None:
+        return None
+    starts = [header_end] + [b for b in boundaries if b < file_size]
+    ends = starts[1:] + [file_size]
+    return header_end, [(start, end) for start, end in zip(starts, ends) if end > start]
+
+
+def _read_csv_shard(csv_path, start, end, column_names, usecols=None, transform=None, dtype=None):
+    """process pool worker: [start, end) 바이트 범위를 파싱하고 (선택적으로) transform 을 적용합니다."""
+    with metrics.stage('read', file=os.path.basename(csv_path), bytes_read=end - start) as record:
+        with open(csv_path, 'rb') as f:
+            f.seek(start)
+            data = f.read(end - start)
+        df = pd.read_csv(io.BytesIO(data), header=None, names=column_names, usecols=usecols, low_memory=False,
+                         dtype=dtype)
+        record['rows'] = len(df)
+    del data
+    return transform(df) if transform is not None else df
+
+
+def iter_raw_data_parallel(csv_path, workers, shard_bytes=64 * 1024 * 1024, usecols=None, transform=None,
+                           fallback_chunksize=100000, start_offset=None, yield_offsets=False, dtype=None):
+    """
+    큰 CSV 하나를 레코드 경계에 맞춘 바이트 범위(shard)로 나눠 여러 프로세스에서 파싱/전처리하고,
+    결과 DataFrame 을 파일 순서대로 하나씩 돌려줍니다.
+
+    - transform: shard 마다 worker 에서 실행할 picklable 함수 (예: functools.partial(preprocess_for_new_schema, ...))
+    - 동시에 처리 중인 shard 는 workers * 2 개로 제한되어 메모리는 shard_bytes 에 비례합니다.
+    - 파일이 작거나, workers <= 1 이거나, 따옴표 짝이 맞지 않아 안전하게 자를 수 없으면
+      iter_raw_data_chunks 기반의 직렬 경로로 대체합니다.
+    - start_offset: 이전에 처리한 shard 의 끝 오프셋부터 이어서 읽습니다 (이 경우 항상 shard 경로 사용).
+    - yield_offsets=True 이면 (shard 끝 오프셋, DataFrame) 튜플을 돌려줍니다. 직렬 경로에서는 오프셋이 None 입니다.
+    """
+    shard_plan = None
+    if start_offset is not None:
+        shard_plan = plan_csv_shards(csv_path, shard_bytes, start_offset=start_offset)
+        if shard_plan is None:
+            raise ValueError(f"Cannot resume '{csv_path}' from byte offset {start_offset}: unbalanced quotes.")
+        workers = max(1, workers)
+    elif workers > 1 and os.path.getsize(csv_path) > shard_bytes:
+        shard_plan = plan_csv_shards(csv_path, shard_bytes)
+        if shard_plan is None:
+            print(f"Warning: Unbalanced quotes in '{csv_path}'; byte-range sharding is unsafe. Falling back to serial reader.")
+
+    if start_offset is None and (shard_plan is None or len(shard_plan[1]) < 2):
+        for chunk in iter_raw_data_chunks(csv_path, fallback_chunksize, usecols=usecols, dtype=dtype):
+            df = transform(chunk) if transform is not None else chunk
+            yield (None, df) if yield_offsets else df
+        return
+
+    _, shards = shard_plan
+    column_names = list(pd.read_csv(csv_path, nrows=0).columns)
+    usecols_filter = None
+    if usecols is not None:
+        usecols_filter = [col for col in column_names if col in set(usecols)]
+    print(f"Parallel reading {csv_path}: {len(shards)} shards (~{shard_bytes // (1024 * 1024)} MB each), {workers} workers")
+
+    max_pending = workers * 2
+    with ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context('spawn')) as executor:
+        pending = deque()
+        shard_iter = iter(shards)
+        for start, end in shard_iter:
+            pending.append(executor.submit(_read_csv_shard, csv_path, start, end, column_names, usecols_filter, transform,
+                                           dtype))
+            if len(pending) >= max_pending:
+                break
+        shard_ends = deque(end for _, end in shards)
+        while pending:
+            df = pending.popleft().result()
+            shard_end = shard_ends.popleft()
+            next_shard = next(shard_iter, None)
+            if next_shard is not None:
+                pending.append(executor.submit(_read_csv_shard, csv_path, next_shard[0], next_shard[1],
+                                               column_names, usecols_filter, transform, dtype))
+            yield (shard_end, df) if yield_offsets else df
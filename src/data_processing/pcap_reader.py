@@ -0,0 +1,382 @@
+# src/data_processing/pcap_reader.py
+"""
+tshark/pyshark 없이 pcap / pcapng 파일을 직접 읽는 스트리밍 리더.
+
+- 파일을 앞에서부터 블록 단위로 읽으므로 캡처 크기와 관계없이 메모리 사용량은 batch_size 로 결정됩니다.
+- 링크 계층: Ethernet (802.1Q/802.1ad VLAN 포함), Linux cooked (SLL, SLL2), raw IP, BSD loopback
+- 네트워크/전송 계층: IPv4, IPv6 (확장 헤더 없는 경우), TCP
+- MQTT: TCP 세그먼트 첫 메시지의 fixed header (msgtype, qos, remaining length) 와
+  CONNECT 의 client id, PUBLISH 의 topic / payload, SUBSCRIBE/UNSUBSCRIBE 의 첫 topic filter.
+  qos 는 tshark 처럼 PUBLISH 에만 채웁니다. TCP 재조립은 하지 않으므로
+  여러 세그먼트에 걸친 메시지는 첫 세그먼트에 들어 있는 만큼만 payload 로 기록됩니다.
+
+결과 컬럼은 tshark 필드 이름 (config.yaml 의 columns.keep) 을 그대로 사용하므로
+생성된 DataFrame/CSV 를 run_pipeline.py 에서 바로 적재할 수 있습니다.
+"""
+import socket
+import struct
+
+import numpy as np
+import pandas as pd
+
+PCAP_COLUMNS = [
+    'frame.time_epoch', 'ip.src', 'ip.dst', 'tcp.srcport', 'tcp.dstport', 'frame.len',
+    'mqtt.clientid', 'mqtt.topic', 'mqtt.len', 'mqtt.msg', 'mqtt.msgtype', 'mqtt.qos', 'ip.proto'
+]
+
+DEFAULT_MQTT_PORTS = (1883,)
+
+LINKTYPE_NULL = 0
+LINKTYPE_ETHERNET = 1
+LINKTYPE_RAW = 101
+LINKTYPE_LINUX_SLL = 113
+LINKTYPE_IPV4 = 228
+LINKTYPE_IPV6 = 229
+LINKTYPE_LINUX_SLL2 = 276
+
+_ETHERTYPE_IPV4 = 0x0800
+_ETHERTYPE_IPV6 = 0x86DD
+_ETHERTYPE_VLAN = (0x8100, 0x88A8, 0x9100)
+
+_PCAP_MAGIC_US = 0xA1B2C3D4
+_PCAP_MAGIC_NS = 0xA1B23C4D
+_PCAPNG_SHB = 0x0A0D0D0A
+_PCAPNG_BYTE_ORDER_MAGIC = 0x1A2B3C4D
+
+_MQTT_CONNECT = 1
+_MQTT_PUBLISH = 3
+_MQTT_SUBSCRIBE = 8
+_MQTT_UNSUBSCRIBE = 10
+
+_READ_BLOCK_BYTES = 1024 * 1024
+
+
+def _iter_pcap(f, header):
+    """classic pcap: (timestamp, linktype, data, orig_len) 를 순서대로 yield 합니다."""
+    magic_le = struct.unpack('<I', header[:4])[0]
+    if magic_le in (_PCAP_MAGIC_US, _PCAP_MAGIC_NS):
+        endian = '<'
+    else:
+        endian = '>'
+    magic = struct.unpack(endian + 'I', header[:4])[0]
+    ts_scale = 1e-9 if magic == _PCAP_MAGIC_NS else 1e-6
+    rest = f.read(20)
+    if len(rest) < 20:
+        raise ValueError("Truncated pcap global header.")
+    linktype = struct.unpack(endian + 'I', rest[16:20])[0] & 0x0FFFFFFF
+    record_header = struct.Struct(endian + 'IIII')
+    while True:
+        raw = f.read(16)
+        if len(raw) < 16:
+            return
+        ts_sec, ts_frac, incl_len, orig_len = record_header.unpack(raw)
+        data = f.read(incl_len)
+        if len(data) < incl_len:
+            return # 캡처 도중 잘린 파일: 마지막 불완전 레코드는 버림
+        yield ts_sec + ts_frac * ts_scale, linktype, data, orig_len
+
+
+def _parse_idb_options(options, endian):
+    """IDB 옵션에서 (timestamp 단위, timestamp offset) 을 꺼냅니다."""
+    ts_resolution, ts_offset = 1e-6, 0
+    pos = 0
+    while pos + 4 <= len(options):
+        code, length = struct.unpack_from(endian + 'HH', options, pos)
+        pos += 4
+        if code == 0: # opt_endofopt
+            break
+        value = options[pos:pos + length]
+        if code == 9 and length >= 1: # if_tsresol
+            exponent = value[0] & 0x7F
+            ts_resolution = 2.0 ** -exponent if value[0] & 0x80 else 10.0 ** -exponent
+        elif code == 14 and length >= 8: # if_tsoffset
+            ts_offset = struct.unpack(endian + 'q', value[:8])[0]
+        pos += (length + 3) & ~3
+    return ts_resolution, ts_offset
+
+
+def _iter_pcapng(f, header):
+    """pcapng: SHB 마다 바이트 순서와 인터페이스 목록을 새로 읽으며 패킷 블록을 yield 합니다."""
+    endian = '<'
+    interfaces = []
+    pending = header
+    while True:
+        block_head = pending + f.read(8 - len(pending))
+        pending = b''
+        if len(block_head) < 8:
+            return
+        if struct.unpack('<I', block_head[:4])[0] == _PCAPNG_SHB:
+            # SHB 의 byte-order magic 으로 이번 section 의 바이트 순서 결정
+            bom = f.read(4)
+            if len(bom) < 4:
+                return
+            endian = '<' if struct.unpack('<I', bom)[0] == _PCAPNG_BYTE_ORDER_MAGIC else '>'
+            block_len = struct.unpack(endian + 'I', block_head[4:8])[0]
+            body = bom + f.read(block_len - 12)
+            interfaces = []
+            continue
+        block_type, block_len = struct.unpack(endian + 'II', block_head)
+        if block_len < 12:
+            raise ValueError(f"Invalid pcapng block length {block_len}.")
+        body = f.read(block_len - 8)
+        if len(body) < block_len - 8:
+            return
+        body = body[:-4] # trailing block length
+
+        if block_type == 1: # Interface Description Block
+            linktype = struct.unpack_from(endian + 'H', body, 0)[0]
+            interfaces.append((linktype,) + _parse_idb_options(body[8:], endian))
+        elif block_type == 6: # Enhanced Packet Block
+            interface_id, ts_high, ts_low, cap_len, orig_len = struct.unpack_from(endian + 'IIIII', body, 0)
+            linktype, ts_resolution, ts_offset = interfaces[interface_id]
+            timestamp = ((ts_high << 32) | ts_low) * ts_resolution + ts_offset
+            yield timestamp, linktype, body[20:20 + cap_len], orig_len
+        elif block_type == 3: # Simple Packet Block (timestamp 없음)
+            orig_len = struct.unpack_from(endian + 'I', body, 0)[0]
+            linktype = interfaces[0][0]
+            yield np.nan, linktype, body[4:4 + orig_len], orig_len
+        elif block_type == 2: # Packet Block (obsolete)
+            interface_id, _, ts_high, ts_low, cap_len, orig_len = struct.unpack_from(endian + 'HHIIII', body, 0)
+            linktype, ts_resolution, ts_offset = interfaces[interface_id]
+            timestamp = ((ts_high << 32) | ts_low) * ts_resolution + ts_offset
+            yield timestamp, linktype, body[20:20 + cap_len], orig_len
+        # 그 외 블록 (NRB, ISB, DSB 등) 은 무시
+
+
+def iter_pcap_packets(pcap_path):
+    """
+    pcap / pcapng 파일에서 (timestamp_epoch, linktype, frame bytes, 원래 frame 길이) 를 순서대로 yield 합니다.
+    파일 형식은 매직 넘버로 판별합니다.
+    """
+    with open(pcap_path, 'rb', buffering=_READ_BLOCK_BYTES) as f:
+        header = f.read(4)
+        if len(header) < 4:
+            return
+        magic_le = struct.unpack('<I', header)[0]
+        magic_be = struct.unpack('>I', header)[0]
+        if magic_le == _PCAPNG_SHB:
+            yield from _iter_pcapng(f, header)
+        elif _PCAP_MAGIC_US in (magic_le, magic_be) or _PCAP_MAGIC_NS in (magic_le, magic_be):
+            yield from _iter_pcap(f, header)
+        else:
+            raise ValueError(f"'{pcap_path}' is not a pcap or pcapng file (magic 0x{magic_be:08x}).")
+
+
+def _network_layer(linktype, data):
+    """링크 계층 헤더를 벗겨 (ethertype, offset) 을 반환합니다. 지원하지 않으면 (None, None)."""
+    if linktype == LINKTYPE_ETHERNET:
+        if len(data) < 14:
+            return None, None
+        ethertype = (data[12] << 8) | data[13]
+        offset = 14
+        while ethertype in _ETHERTYPE_VLAN and len(data) >= offset + 4:
+            ethertype = (data[offset + 2] << 8) | data[offset + 3]
+            offset += 4
+        return ethertype, offset
+    if linktype == LINKTYPE_LINUX_SLL:
+        if len(data) < 16:
+            return None, None
+        return (data[14] << 8) | data[15], 16
+    if linktype == LINKTYPE_LINUX_SLL2:
+        if len(data) < 20:
+            return None, None
+        return (data[0] << 8) | data[1], 20
+    if linktype in (LINKTYPE_RAW, LINKTYPE_IPV4, LINKTYPE_IPV6):
+        if not data:
+            return None, None
+        version = data[0] >> 4
+        return (_ETHERTYPE_IPV4 if version == 4 else _ETHERTYPE_IPV6 if version == 6 else None), 0
+    if linktype == LINKTYPE_NULL:
+        if len(data) < 5:
+            return None, None
+        version = data[4] >> 4
+        return (_ETHERTYPE_IPV4 if version == 4 else _ETHERTYPE_IPV6 if version == 6 else None), 4
+    return None, None
+
+
+def _read_varint(data, pos):
+    """MQTT remaining length (가변 길이 정수, 최대 4바이트). 반환값: (value, 다음 위치) 또는 (None, pos)."""
+    value, multiplier = 0, 1
+    for i in range(4):
+        if pos + i >= len(data):
+            return None, pos
+        byte = data[pos + i]
+        value += (byte & 0x7F) * multiplier
+        if not byte & 0x80:
+            return value, pos + i + 1
+        multiplier *= 128
+    return None, pos
+
+
+def _read_utf8(data, pos):
+    """MQTT UTF-8 문자열 (2바이트 길이 + 내용). 반환값: (str, 다음 위치) 또는 (None, pos)."""
+    if pos + 2 > len(data):
+        return None, pos
+    length = (data[pos] << 8) | data[pos + 1]
+    end = pos + 2 + length
+    if end > len(data):
+        return None, pos
+    return data[pos + 2:end].decode('utf-8', errors='replace'), end
+
+
+def _topic_filters_fill(data, pos, end, options_byte):
+    """pos 부터 end 까지가 topic filter 목록 (SUBSCRIBE 는 filter 마다 options 1바이트) 으로 정확히 채워지는지."""
+    while pos < end:
+        topic, pos = _read_utf8(data, pos)
+        if topic is None:
+            return False
+        pos += options_byte
+    return pos == end
+
+
+def decode_mqtt(segment):
+    """
+    TCP payload 의 첫 MQTT 메시지를 해석합니다.
+    반환값: (msgtype, qos, remaining_length, client_id, topic, payload_hex) 또는 MQTT 가 아니면 None
+    """
+    if len(segment) < 2:
+        return None
+    first = segment[0]
+    msg_type = first >> 4
+    if msg_type == 0:
+        return None
+    remaining_length, pos = _read_varint(segment, 1)
+    if remaining_length is None:
+        return None
+    # tshark 처럼 qos 는 PUBLISH 에만 채움 (다른 메시지의 fixed header flag 는 qos 가 아님)
+    qos = (first >> 1) & 0x03 if msg_type == _MQTT_PUBLISH else None
+    client_id = topic = payload = None
+    message_end = min(len(segment), pos + remaining_length)
+
+    if msg_type == _MQTT_CONNECT:
+        protocol_name, var_pos = _read_utf8(segment, pos)
+        if protocol_name is not None and var_pos + 4 <= message_end:
+            protocol_level = segment[var_pos]
+            var_pos += 4 # protocol level, connect flags, keep alive
+            if protocol_level == 5:
+                properties_length, var_pos = _read_varint(segment, var_pos)
+                var_pos += properties_length or 0
+            client_id, _ = _read_utf8(segment, var_pos)
+    elif msg_type == _MQTT_PUBLISH:
+        topic, var_pos = _read_utf8(segment, pos)
+        if topic is not None:
+            if qos > 0:
+                var_pos += 2 # packet identifier
+            # MQTT 버전은 CONNECT 에만 있으므로 v3.1.1 형식 (properties 없음) 으로 가정
+            payload = segment[var_pos:message_end].hex()
+    elif msg_type in (_MQTT_SUBSCRIBE, _MQTT_UNSUBSCRIBE):
+        # packet identifier 뒤 첫 topic filter. 버전을 모르므로 v3.1.1 형식으로 목록이 메시지를 정확히
+        # 채우지 않으면 v5 (packet identifier 뒤 properties) 로 보고 properties 를 건너뜀
+        var_pos = pos + 2
+        options_byte = 1 if msg_type == _MQTT_SUBSCRIBE else 0
+        if message_end == pos + remaining_length and \
+                not _topic_filters_fill(segment, var_pos, message_end, options_byte):
+            properties_length, properties_pos = _read_varint(segment, var_pos)
+            if properties_length is not None:
+                var_pos = properties_pos + properties_length
+        if var_pos < message_end:
+            topic, _ = _read_utf8(segment, var_pos)
+    return msg_type, qos, remaining_length, client_id, topic, payload
+
+
+def decode_packet(linktype, data, mqtt_ports=DEFAULT_MQTT_PORTS):
+    """
+    frame 하나를 해석해 PCAP_COLUMNS 순서의 값 중 frame 관련 필드를 제외한 튜플을 반환합니다:
+    (ip_src, ip_dst, ip_proto, tcp_srcport, tcp_dstport, mqtt 결과 또는 None)
+    IP 패킷이 아니면 None.
+    """
+    ethertype, offset = _network_layer(linktype, data)
+    if ethertype == _ETHERTYPE_IPV4:
+        if len(data) < offset + 20:
+            return None
+        header_len = (data[offset] & 0x0F) * 4
+        total_len = (data[offset + 2] << 8) | data[offset + 3]
+        ip_proto = data[offset + 9]
+        ip_src = socket.inet_ntoa(data[offset + 12:offset + 16])
+        ip_dst = socket.inet_ntoa(data[offset + 16:offset + 20])
+        fragment_offset = ((data[offset + 6] & 0x1F) << 8) | data[offset + 7]
+        transport = offset + header_len
+        # Ethernet padding 을 제외하기 위해 IP total length 기준으로 자름 (TSO 등으로 0 이면 frame 끝까지)
+        ip_end = offset + total_len if total_len else len(data)
+        if fragment_offset:
+            return ip_src, ip_dst, ip_proto, None, None, None
+    elif ethertype == _ETHERTYPE_IPV6:
+        if len(data) < offset + 40:
+            return None
+        payload_len = (data[offset + 4] << 8) | data[offset + 5]
+        ip_proto = data[offset + 6]
+        ip_src = socket.inet_ntop(socket.AF_INET6, data[offset + 8:offset + 24])
+        ip_dst = socket.inet_ntop(socket.AF_INET6, data[offset + 24:offset + 40])
+        transport = offset + 40
+        ip_end = transport + payload_len if payload_len else len(data)
+    else:
+        return None
+
+    if ip_proto != 6 or len(data) < transport + 20:
+        return ip_src, ip_dst, ip_proto, None, None, None
+    src_port = (data[transport] << 8) | data[transport + 1]
+    dst_port = (data[transport + 2] << 8) | data[transport + 3]
+    data_offset = (data[transport + 12] >> 4) * 4
+    mqtt = None
+    if src_port in mqtt_ports or dst_port in mqtt_ports:
+        segment = data[transport + data_offset:min(ip_end, len(data))]
+        if segment:
+            mqtt = decode_mqtt(segment)
+    return ip_src, ip_dst, ip_proto, src_port, dst_port, mqtt
+
+
+def _columns_to_frame(columns):
+    df = pd.DataFrame(dict(zip(PCAP_COLUMNS, columns)), columns=PCAP_COLUMNS)
+    for col in ('tcp.srcport', 'tcp.dstport', 'mqtt.len', 'mqtt.msgtype', 'mqtt.qos', 'ip.proto'):
+        df[col] = df[col].astype('Int64')
+    return df
+
+
+def iter_pcap_batches(pcap_path, batch_size=100000, mqtt_only=False, mqtt_ports=DEFAULT_MQTT_PORTS,
+                      packet_limit=None):
+    """
+    pcap / pcapng 를 읽어 PCAP_COLUMNS 컬럼의 DataFrame 을 batch_size 행씩 yield 합니다.
+    mqtt_only=True 면 MQTT 메시지로 해석된 패킷만 남깁니다 (tshark display filter 'mqtt' 와 유사).
+    IP 가 아닌 frame 은 mqtt_only=False 일 때 frame 필드만 채워서 포함됩니다.
+    """
+    mqtt_ports = frozenset(mqtt_ports)
+    columns = [[] for _ in PCAP_COLUMNS]
+    (c_time, c_src, c_dst, c_sport, c_dport, c_len,
+     c_client, c_topic, c_mqtt_len, c_msg, c_type, c_qos, c_proto) = columns
+    n_rows = 0
+    for timestamp, linktype, data, orig_len in iter_pcap_packets(pcap_path):
+        decoded = decode_packet(linktype, data, mqtt_ports)
+        if decoded is None:
+            if mqtt_only:
+                continue
+            decoded = (None, None, None, None, None, None)
+        ip_src, ip_dst, ip_proto, src_port, dst_port, mqtt = decoded
+        if mqtt is None:
+            if mqtt_only:
+                continue
+            mqtt = (None, None, None, None, None, None)
+        msg_type, qos, mqtt_len, client_id, topic, payload = mqtt
+
+        c_time.append(timestamp)
+        c_src.append(ip_src)
+        c_dst.append(ip_dst)
+        c_sport.append(src_port)
+        c_dport.append(dst_port)
+        c_len.append(orig_len)
+        c_client.append(client_id)
+        c_topic.append(topic)
+        c_mqtt_len.append(mqtt_len)
+        c_msg.append(payload)
+        c_type.append(msg_type)
+        c_qos.append(qos)
+        c_proto.append(ip_proto)
+        n_rows += 1
+
+        if len(c_time) >= batch_size:
+            yield _columns_to_frame(columns)
+            for col in columns:
+                col.clear()
+        if packet_limit and n_rows >= packet_limit:
+            break
+    if c_time:
+        yield _columns_to_frame(columns)
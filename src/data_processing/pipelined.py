@@ -0,0 +1,204 @@
+# src/data_processing/pipelined.py
+"""
+파싱/전처리와 DB 쓰기를 겹쳐서 실행하는 producer/consumer 파이프라인.
+
+    parser 스레드 (N개)  --[테이블별 writer 의 bounded queue]-->  writer 스레드 (M개)
+
+- parser 는 파일 단위로 작업을 가져가 chunk 를 읽고 전처리한 뒤 writer 큐에 넣습니다.
+- 큐는 크기가 제한되어 있어 writer 가 밀리면 parser 가 put 에서 대기합니다 (backpressure).
+- 한 테이블은 항상 같은 writer 가 담당하므로, 같은 파일의 chunk 는 읽은 순서대로 기록됩니다.
+- writer 는 스레드마다 커넥션 풀에서 커넥션 하나를 잡고 재사용합니다.
+- 어느 단계에서든 파일 처리에 실패하면 그 파일의 나머지 chunk 는 버리고, 오류는 결과에 기록됩니다.
+- manifest 가 주어지면 chunk INSERT 와 진행 상황 기록을 한 트랜잭션으로 커밋하고,
+  parser 가 파일 끝에 보내는 표시를 writer 가 받으면 파일을 complete 로 표시합니다.
+  재개는 행 수로 기록된 위치에서만 합니다 (shard 리더가 바이트 오프셋으로 기록한 파일은 거부).
+"""
+import queue
+import threading
+import time
+
+from src.data_processing.loader import iter_raw_data_chunks
+from src.data_processing.preprocessor import preprocess_for_new_schema
+from src.data_processing.schema import raw_read_dtypes
+from src.data_processing.db_loader import load_data_to_db
+from src.database.db_utils import transaction
+from src.database.manifest import READER_SERIAL
+from src.database.unified_logs import prepare_frame_for_table
+from src.utils import metrics
+
+_STOP = object()
+
+
+class PipelinedIngest:
+    def __init__(self, engine, columns_config, labeling_config=None, chunksize=100000,
+                 num_parsers=1, num_writers=1, queue_size=4, write_method=None, manifest=None, force=False):
+        self.engine = engine
+        self.columns_config = columns_config
+        self.labeling_config = labeling_config
+        self.chunksize = chunksize
+        self.num_parsers = max(1, num_parsers)
+        self.num_writers = max(1, num_writers)
+        self.queue_size = max(1, queue_size)
+        self.write_method = write_method
+        self.manifest = manifest
+        self.force = force
+        self._lock = threading.Lock()
+        self._results = {}
+        self._assumed_attack_types = {}
+
+    def _record_error(self, filename, stage, error):
+        with self._lock:
+            result = self._results[filename]
+            if result['error'] is None:
+                result['error'] = f"{stage}: {error}"
+                print(f"Error during {stage} of file '{filename}': {error}. Remaining chunks will be dropped.")
+
+    def _has_failed(self, filename):
+        with self._lock:
+            return self._results[filename]['error'] is not None
+
+    def _parser_loop(self, job_queue, writer_queues, table_to_writer):
+        while True:
+            try:
+                job = job_queue.get_nowait()
+            except queue.Empty:
+                return
+            filename = job['filename']
+            writer_queue = writer_queues[table_to_writer[job['target_table']]]
+            try:
+                rows_consumed = 0
+                if self.manifest is not None:
+                    plan = self.manifest.plan(filename, job['target_table'], job['csv_path'], force=self.force,
+                                              file_rows=job.get('file_rows'))
+                    if plan['action'] == 'skip':
+                        with self._lock:
+                            self._results[filename]['skipped'] = True
+                        continue
+                    if plan['action'] == 'resume':
+                        if plan['source_byte_offset'] is not None:
+                            # 행 단위 리더로는 바이트 오프셋에서 이어 읽을 수 없음 (처음부터 읽으면 커밋된 행이 중복됨)
+                            raise ValueError(
+                                f"its progress was recorded as byte offset {plan['source_byte_offset']} by the sharded "
+                                f"stream reader; resume it with --mode stream")
+                        rows_consumed = plan['source_rows_consumed'] or 0
+                chunks = iter_raw_data_chunks(job['csv_path'], self.chunksize, usecols=self.columns_config['keep'],
+                                              skip_rows=rows_consumed,
+                                              dtype=raw_read_dtypes(self.columns_config['keep']))
+                for chunk_index, df_chunk in enumerate(chunks):
+                    if self._has_failed(filename):
+                        break
+                    rows_consumed += len(df_chunk)
+                    df_processed = preprocess_for_new_schema(
+                        df_chunk,
+                        self.columns_config['keep'],
+                        self.columns_config['rename'],
+                        source_file_info=job['source_file_info'],
+                        labeling_config=self.labeling_config,
+                        report_memory=self.columns_config.get('memory_report', False)
+                    )
+                    if not df_processed.empty or self.manifest is not None:
+                        # 큐가 가득 차 있으면 writer 가 따라올 때까지 대기 (backpressure)
+                        writer_queue.put((filename, job['target_table'], chunk_index, df_processed, rows_consumed))
+                if self.manifest is not None:
+                    # 파일 끝 표시: writer 가 앞선 chunk 를 모두 커밋한 뒤 complete 로 표시
+                    writer_queue.put((filename, job['target_table'], None, None, rows_consumed))
+            except Exception as e:
+                self._record_error(filename, 'parsing/preprocessing', e)
+            finally:
+                with self._lock:
+                    self._results[filename]['parsed_at'] = time.time()
+
+    def _writer_loop(self, writer_queue):
+        try:
+            connection = self.engine.connect()
+        except Exception as e:
+            connection = None
+            connect_error = e
+        try:
+            while True:
+                item = writer_queue.get()
+                if item is _STOP:
+                    return
+                filename, target_table, chunk_index, df_processed, rows_consumed = item
+                if self._has_failed(filename):
+                    continue
+                if connection is None:
+                    # 커넥션을 얻지 못해도 큐는 계속 비워야 parser 가 멈추지 않음
+                    self._record_error(filename, 'connecting to database', connect_error)
+                    continue
+                if df_processed is None:
+                    try:
+                        self.manifest.mark_complete(filename, target_table)
+                    except Exception as e:
+                        self._record_error(filename, 'updating manifest', e)
+                    continue
+                try:
+                    # 통합 테이블이면 컬럼 변환 + 일 파티션 생성 (DDL 이므로 chunk 트랜잭션 밖에서)
+                    df_processed = prepare_frame_for_table(df_processed, target_table, connection,
+                                                           self._assumed_attack_types.get(filename))
+                    if self.manifest is None:
+                        with metrics.context(file=filename):
+                            load_data_to_db(df_processed, target_table, connection, method=self.write_method)
+                    else:
+                        with metrics.context(file=filename), transaction(connection):
+                            if not df_processed.empty:
+                                load_data_to_db(df_processed, target_table, connection, method=self.write_method)
+                            self.manifest.record_chunk(connection, filename, target_table, len(df_processed),
+                                                       source_rows_consumed=rows_consumed, load_mode='pipelined',
+                                                       reader=READER_SERIAL)
+                except Exception as e:
+                    self._record_error(filename, f"writing chunk {chunk_index} to '{target_table}'", e)
+                    continue
+                with self._lock:
+                    result = self._results[filename]
+                    result['rows'] += len(df_processed)
+                    result['written_at'] = time.time()
+        finally:
+            if connection is not None:
+                connection.close()
+
+    def run(self, jobs):
+        """
+        jobs: [{'filename', 'csv_path', 'target_table', 'source_file_info'}, ...]
+        반환값: {filename: {'rows', 'skipped', 'error', 'seconds'}} (jobs 순서 유지)
+        """
+        start_time = time.time()
+        tables = sorted({job['target_table'] for job in jobs})
+        num_writers = min(self.num_writers, len(tables)) or 1
+        table_to_writer = {table: i % num_writers for i, table in enumerate(tables)}
+        writer_queues = [queue.Queue(maxsize=self.queue_size) for _ in range(num_writers)]
+
+        job_queue = queue.Queue()
+        for job in jobs:
+            self._results[job['filename']] = {'rows': 0, 'skipped': False, 'error': None,
+                                              'parsed_at': None, 'written_at': None}
+            self._assumed_attack_types[job['filename']] = job['source_file_info'].get('assumed_attack_type')
+            job_queue.put(job)
+
+        print(f"Pipelined ingest: {len(jobs)} files, {self.num_parsers} parser(s), {num_writers} writer(s), "
+              f"queue size {self.queue_size} chunks/writer, chunksize {self.chunksize}.")
+        writers = [threading.Thread(target=self._writer_loop, args=(q,), name=f"db-writer-{i}", daemon=True)
+                   for i, q in enumerate(writer_queues)]
+        parsers = [threading.Thread(target=self._parser_loop, args=(job_queue, writer_queues, table_to_writer),
+                                    name=f"parser-{i}", daemon=True)
+                   for i in range(min(self.num_parsers, len(jobs)))]
+        for thread in writers + parsers:
+            thread.start()
+        for thread in parsers:
+            thread.join()
+        for q in writer_queues:
+            q.put(_STOP)
+        for thread in writers:
+            thread.join()
+
+        results = {}
+        for job in jobs:
+            result = self._results[job['filename']]
+            finished_at = max(t for t in (result['parsed_at'], result['written_at'], start_time) if t is not None)
+            results[job['filename']] = {
+                'rows': result['rows'],
+                'skipped': result['skipped'],
+                'error': result['error'],
+                'seconds': finished_at - start_time,
+            }
+        return results
@@ -2,7 +2,20 @@
 import pandas as pd
 import numpy as np
 
-def preprocess_for_new_schema(df_raw, columns_to_keep, column_rename_map, source_file_info=None):
+from src.data_processing.labeling import label_attack_and_anomaly
+from src.data_processing.schema import (PROCESSED_SCHEMA, as_string_category, as_string_object, date_and_time_columns,
+                                        memory_report, narrow_integer)
+from src.utils import metrics
+
+def preprocess_for_new_schema(df_raw, columns_to_keep, column_rename_map, source_file_info=None, labeling_config=None,
+                              report_memory=False):
+    filename = source_file_info.get('filename') if source_file_info else None
+    with metrics.stage('preprocess', file=filename, rows=len(df_raw)):
+        return _preprocess_for_new_schema(df_raw, columns_to_keep, column_rename_map, source_file_info=source_file_info,
+                                          labeling_config=labeling_config, report_memory=report_memory)
+
+def _preprocess_for_new_schema(df_raw, columns_to_keep, column_rename_map, source_file_info=None, labeling_config=None,
+                               report_memory=False):
     current_filename = source_file_info.get('filename', 'N/A') if source_file_info else 'N/A'
     print(f"Starting data preprocessing for new schema (file: {current_filename})...")
 
@@ -20,85 +33,42 @@ def preprocess_for_new_schema(df_raw, columns_to_keep, column_rename_map, source
 
     # 타임스탬프, 날짜, 시간 컬럼 생성
     if 'timestamp_epoch' in df.columns:
-        df['datetime_temp'] = pd.to_datetime(df['timestamp_epoch'], unit='s', errors='coerce')
+        df['timestamp'] = pd.to_datetime(df['timestamp_epoch'], unit='s', errors='coerce')
         df.drop(columns=['timestamp_epoch'], inplace=True)
-
-        df['date'] = df['datetime_temp'].dt.date.astype(str)
-        # 마이크로초 포함하여 HH:MM:SS.ffffff 형식으로 저장
-        df['time'] = df['datetime_temp'].dt.time.astype(str) # <--- 수정됨
-        df['timestamp'] = df['datetime_temp']
-        df.drop(columns=['datetime_temp'], inplace=True)
+        # date 는 category ('YYYY-MM-DD'), time 은 자정 기준 timedelta (DB 에 쓸 때 HH:MM:SS.ffffff 문자열로 변환)
+        df['date'], df['time'] = date_and_time_columns(df['timestamp'])
         print(f"Created 'timestamp', 'date', and full 'time' (HH:MM:SS.ffffff) columns for {current_filename}.")
     else:
         df['timestamp'] = pd.NaT
-        df['date'] = np.nan
-        df['time'] = np.nan # 마이크로초 포함 형식으로도 NaN 또는 빈 문자열 처리
+        df['date'] = pd.Series(pd.Categorical([None] * len(df)), index=df.index)
+        df['time'] = pd.Series(pd.NaT, index=df.index, dtype='timedelta64[ns]')
         print(f"Warning: 'timestamp_epoch' not found. 'timestamp', 'date', 'time' will be NaT/NaN for {current_filename}.")
 
+    # 문자열 컬럼: 고유값이 적은 컬럼은 category, payload 는 (대부분 고유값이라) 문자열 그대로
     string_cols = ['ip_src', 'ip_dst', 'client_id', 'topic', 'payload']
     for col in string_cols:
         if col in df.columns:
-            if df[col].dtype != 'object':
-                df[col] = df[col].astype(object)
-            df[col] = df[col].fillna(np.nan)
-            df[col] = df[col].apply(lambda x: str(x) if pd.notna(x) else np.nan)
-
-            if col == 'client_id':
-                max_len_client_id = 4096
-                df.loc[df[col].notna(), col] = df.loc[df[col].notna(), col].str.slice(0, max_len_client_id)
+            if col == 'payload':
+                df[col] = as_string_object(df[col])
+            else:
+                max_len = 4096 if col == 'client_id' else None
+                df[col] = as_string_category(df[col], max_len=max_len)
         else:
             df[col] = np.nan
 
     numeric_cols = ['tcp_srcport', 'tcp_dstport', 'frame_len', 'mqtt_len', 'msg_type', 'ip_proto']
     for col in numeric_cols:
         if col in df.columns:
-            df[col] = pd.to_numeric(df[col], errors='coerce')
+            df[col] = narrow_integer(df[col], PROCESSED_SCHEMA[col])
         else:
-            df[col] = np.nan
+            df[col] = pd.Series(pd.NA, index=df.index, dtype=PROCESSED_SCHEMA[col])
     # print(f"Processed data types and missing values for {current_filename}.")
 
-    def determine_attack_and_anomaly(row):
-        base_attack_type = "Unclassified"
-        if source_file_info and 'assumed_attack_type' in source_file_info:
-            base_attack_type = source_file_info['assumed_attack_type']
-        is_anomaly_flag = 0
-        final_attack_type = base_attack_type
-        is_mqtt_traffic = pd.notna(row.get('msg_type')) or \
-                          (pd.notna(row.get('client_id')) and row.get('client_id') not in ['', 'nan', np.nan])
-
-        if pd.notna(row.get('msg_type')) and row.get('msg_type') == 3: # PUBLISH
-            if base_attack_type == 'MQTT_Flood':
-                is_anomaly_flag = 1
-                final_attack_type = 'MQTT_Flood_Detected'
-            elif pd.notna(row.get('mqtt_len')) and row.get('mqtt_len', 0) > 1000:
-                 is_anomaly_flag = 1
-                 final_attack_type = f"{base_attack_type}_LargePayload"
-        if pd.notna(row.get('msg_type')) and row.get('msg_type') == 1: # CONNECT
-            if base_attack_type == 'BruteForce_Attempt':
-                is_anomaly_flag = 1
-                final_attack_type = 'BruteForce_Connect_Attempt'
-        if base_attack_type == 'Malformed_Packet':
-            if pd.isna(row.get('msg_type')) and pd.notna(row.get('tcp_dstport')) and row.get('tcp_dstport') == 1883:
-                is_anomaly_flag = 1
-                final_attack_type = 'Malformed_Suspected_NoMsgType'
-            elif pd.notna(row.get('msg_type')) and not (0 < row.get('msg_type',0) < 16) :
-                is_anomaly_flag = 1
-                final_attack_type = 'Malformed_InvalidMsgType'
-        if not is_mqtt_traffic and pd.notna(row.get('ip_proto')) and row.get('ip_proto') == 6 : # TCP
-            if base_attack_type not in ['Legitimate', 'Unclassified']:
-                final_attack_type = f"NonMQTT_{base_attack_type}"
-            else:
-                final_attack_type = "NonMQTT_General_TCP"
-        if base_attack_type == 'Legitimate' and is_anomaly_flag == 0:
-            if is_mqtt_traffic:
-                 final_attack_type = 'Legitimate_MQTT'
-            elif pd.notna(row.get('ip_proto')) and row.get('ip_proto') == 6:
-                 final_attack_type = 'Legitimate_NonMQTT_TCP'
-            else:
-                 final_attack_type = 'Legitimate_NonMQTT_OtherProto'
-        return pd.Series([final_attack_type, is_anomaly_flag])
-
-    df[['attack_type', 'is_anomaly']] = df.apply(determine_attack_and_anomaly, axis=1)
+    base_attack_type = None
+    if source_file_info and 'assumed_attack_type' in source_file_info:
+        base_attack_type = source_file_info['assumed_attack_type']
+    attack_type, df['is_anomaly'] = label_attack_and_anomaly(df, base_attack_type, labeling_config)
+    df['attack_type'] = pd.Categorical(attack_type)
     # print(f"Created 'attack_type' and 'is_anomaly' columns for {current_filename}.")
 
     final_cols_ordered = [
@@ -108,5 +78,8 @@ def preprocess_for_new_schema(df_raw, columns_to_keep, column_rename_map, source
     ]
     existing_final_cols = [col for col in final_cols_ordered if col in df.columns]
     df_final = df[existing_final_cols].copy()
+    if report_memory:
+        memory_report(df_raw, 'read', current_filename)
+        memory_report(df_final, 'preprocessing', current_filename)
     # print(f"Preprocessing for new schema (file: {current_filename}) finished. Shape: {df_final.shape}")
     return df_final
@@ -0,0 +1,138 @@
+# src/data_processing/schema.py
+"""
+전처리된 로그 DataFrame 의 메모리 절약형 dtype 스키마.
+
+- 포트 / 길이 / msg_type / ip_proto: nullable 부호 없는 정수 (UInt16 / UInt32 / UInt8).
+  값이 범위를 벗어나거나 소수가 있으면 더 넓은 타입으로 올려 값이 바뀌지 않게 합니다 (safe downcast).
+- ip_src / ip_dst / client_id / topic / date / attack_type: category (고유값만 한 번 저장하고 행마다 정수 코드).
+- time: 자정 기준 timedelta64 (8 bytes). DB 에 쓸 때 db_loader 가 'HH:MM:SS.ffffff' 문자열로 바꿉니다.
+
+문자열 컬럼은 read_csv 단계에서 바로 category 로 읽도록 raw_read_dtypes() 를 loader 에 넘깁니다.
+숫자 컬럼은 tshark 가 '1883,1883' 같은 다중 값을 쓰는 경우가 있어 읽을 때 dtype 을 강제하지 않고
+(잘못된 값 하나로 파일 전체가 실패하므로) 파싱 직후 narrow_integer 로 좁힙니다.
+"""
+import numpy as np
+import pandas as pd
+
+# 원본 (tshark) 컬럼 -> read_csv dtype
+RAW_READ_DTYPES = {
+    'ip.src': 'category',
+    'ip.dst': 'category',
+    'mqtt.clientid': 'category',
+    'mqtt.topic': 'category',
+}
+
+# 전처리 후 컬럼 -> 목표 dtype
+PROCESSED_SCHEMA = {
+    'timestamp': 'datetime64[ns]',
+    'ip_src': 'category',
+    'ip_dst': 'category',
+    'tcp_srcport': 'UInt16',
+    'tcp_dstport': 'UInt16',
+    'frame_len': 'UInt16',
+    'client_id': 'category',
+    'topic': 'category',
+    'mqtt_len': 'UInt32',
+    'payload': 'object',
+    'msg_type': 'UInt8',
+    'ip_proto': 'UInt8',
+    'attack_type': 'category',
+    'is_anomaly': 'int8',
+    'date': 'category',
+    'time': 'timedelta64[ns]',
+}
+
+# 목표 정수형에 값이 맞지 않을 때 차례로 시도할 타입
+_WIDER_INTEGER_TYPES = ('UInt8', 'UInt16', 'UInt32', 'Int64')
+
+
+def raw_read_dtypes(columns=None):
+    """read_csv 의 dtype 인자. columns 를 주면 그 컬럼들만 남깁니다."""
+    if columns is None:
+        return dict(RAW_READ_DTYPES)
+    return {col: dtype for col, dtype in RAW_READ_DTYPES.items() if col in columns}
+
+
+def narrow_integer(series, dtype):
+    """
+    숫자로 바꿀 수 없는 값은 결측으로 두고 nullable 정수형 dtype 으로 좁힙니다.
+    소수 값이 있으면 float64 를, 범위를 벗어나면 값이 들어가는 더 넓은 정수형을 씁니다.
+    """
+    values = pd.to_numeric(series, errors='coerce')
+    if isinstance(values.dtype, pd.api.extensions.ExtensionDtype):
+        values = values.astype('float64')
+    finite = values.to_numpy(dtype=np.float64, na_value=np.nan)
+    finite = finite[~np.isnan(finite)]
+    if len(finite) and not np.array_equal(finite, np.floor(finite)):
+        return values.astype('float64')
+    low, high = (finite.min(), finite.max()) if len(finite) else (0, 0)
+    for candidate in _WIDER_INTEGER_TYPES[_WIDER_INTEGER_TYPES.index(dtype):]:
+        info = np.iinfo(candidate.lower())
+        if info.min <= low and high <= info.max:
+            return values.astype(candidate)
+    return values.astype('float64')
+
+
+def as_string_category(series, max_len=None):
+    """
+    문자열 컬럼을 category 로 바꿉니다. 값 변환 (str, 길이 자르기) 은 고유값에만 적용합니다.
+    이미 category 면 (read_csv dtype) 다시 factorize 하지 않습니다.
+    """
+    if not isinstance(series.dtype, pd.CategoricalDtype):
+        series = series.astype('category')
+    categories = series.cat.categories
+    if len(categories) == 0:
+        return series
+    if categories.dtype != object or max_len is not None:
+        new_categories = categories.astype(str)
+        if max_len is not None:
+            new_categories = new_categories.str.slice(0, max_len)
+        if new_categories.has_duplicates:
+            # 변환 결과가 겹치면 (예: 길이 자르기) 같은 값끼리 코드를 합침
+            unique_values = new_categories.unique()
+            mapping = unique_values.get_indexer(new_categories)
+            codes = series.cat.codes.to_numpy()
+            remapped = np.where(codes < 0, -1, mapping[codes])
+            return pd.Series(pd.Categorical.from_codes(remapped, unique_values), index=series.index, name=series.name)
+        series = series.cat.rename_categories(new_categories)
+    return series
+
+
+def as_string_object(series):
+    """
+    문자열 컬럼을 object dtype 문자열 (결측은 NaN 그대로) 로 바꿉니다.
+    read_csv 가 이미 문자열로 읽은 경우 (대부분) 는 C 레벨 검사 한 번으로 끝나고 행마다 str() 을 부르지 않습니다.
+    """
+    if series.dtype == object and pd.api.types.infer_dtype(series, skipna=True) in ('string', 'empty'):
+        return series
+    series = series.astype(object)
+    return series.where(series.isna(), series.astype(str))
+
+
+def date_and_time_columns(timestamps):
+    """
+    timestamp (datetime64) 에서 date (category, 'YYYY-MM-DD') 와 time (자정 기준 timedelta64) 을 만듭니다.
+    날짜 문자열은 서로 다른 날짜 수만큼만 만듭니다.
+    """
+    days = timestamps.dt.normalize()
+    day_categories = days.astype('category')
+    dates = day_categories.cat.rename_categories(day_categories.cat.categories.strftime('%Y-%m-%d'))
+    return dates, timestamps - days
+
+
+def format_time_of_day(deltas):
+    """자정 기준 timedelta 를 'HH:MM:SS.ffffff' 문자열로 (마이크로초가 0 이면 'HH:MM:SS', 결측은 NaN)."""
+    clock = pd.Timestamp(0) + deltas
+    with_fraction = clock.dt.strftime('%H:%M:%S.%f')
+    whole_second = (deltas.dt.microseconds == 0) & (deltas.dt.nanoseconds == 0)
+    text = with_fraction.where(~whole_second.fillna(False).astype(bool), clock.dt.strftime('%H:%M:%S'))
+    return text.where(deltas.notna(), np.nan)
+
+
+def memory_report(df, stage, label=''):
+    """stage 별 DataFrame 메모리 (deep) 와 행당 바이트를 출력하고 총 바이트를 반환합니다."""
+    total = int(df.memory_usage(deep=True, index=False).sum())
+    per_row = total / len(df) if len(df) else 0.0
+    prefix = f"[{label}] " if label else ""
+    print(f"{prefix}Memory after {stage}: {total / (1024 * 1024):.1f} MB for {len(df)} rows ({per_row:.0f} bytes/row)")
+    return total
@@ -1,8 +1,73 @@
 # src/database/db_utils.py
+"""
+프로젝트 공용 DB 접근 계층.
+
+- get_engine / get_db_engine: URL 과 풀 설정이 같으면 프로세스 안에서 같은 Engine 을 재사용합니다.
+  (QueuePool 크기는 동시에 쓰는 writer 수에 맞추고, pre-ping / recycle 로 끊어진 커넥션을 걸러냄)
+- ensure_table: CREATE TABLE IF NOT EXISTS 를 (엔진, 테이블) 마다 프로세스에서 한 번만 실행합니다 (schema cache).
+- transaction: 모든 writer 가 쓰는 트랜잭션 컨텍스트. Engine 이면 풀에서 커넥션을 빌려 새 트랜잭션을 열고,
+  Connection 이면 진행 중인 트랜잭션에 참여합니다 (commit/rollback 은 바깥 트랜잭션이 결정).
+"""
+import threading
+from contextlib import contextmanager
+
 from sqlalchemy import create_engine, text
+from sqlalchemy.engine import Engine
+
+from src.utils import metrics
+
+DEFAULT_POOL_OPTIONS = {
+    'pool_size': 5,         # 풀에 유지하는 커넥션 수 (pipelined writer + parser 수 이상)
+    'max_overflow': 10,     # 순간적으로 더 빌릴 수 있는 커넥션 수
+    'pool_timeout': 30,     # 풀이 비었을 때 기다리는 시간 (초)
+    'pool_recycle': 3600,   # MySQL wait_timeout 보다 짧게: 1시간 넘은 커넥션은 새로 연결
+    'pool_pre_ping': True,  # 빌려줄 때 살아 있는지 확인 (서버가 끊은 커넥션으로 쓰기 실패 방지)
+}
+
+_lock = threading.Lock()
+_engines = {}
+_verified_tables = set()
+
+
+def _pool_options(url, pool_options):
+    options = dict(DEFAULT_POOL_OPTIONS)
+    options.update({k: v for k, v in (pool_options or {}).items() if k in DEFAULT_POOL_OPTIONS and v is not None})
+    if str(url).startswith('sqlite'):
+        # 로컬 파일이라 recycle / pre-ping 이 필요 없음 (:memory: 는 SingletonThreadPool 이라 풀 크기 옵션도 없음)
+        options = {k: v for k, v in options.items() if k in ('pool_size', 'max_overflow', 'pool_timeout')}
+        if ':memory:' in str(url) or str(url) == 'sqlite://':
+            options = {}
+    return options
+
+
+def get_engine(url, connect_args=None, **pool_options):
+    """url 에 대한 Engine 을 (풀 설정과 함께) 만들거나, 이미 만든 것이 있으면 재사용합니다."""
+    options = _pool_options(url, pool_options)
+    key = (str(url), tuple(sorted((connect_args or {}).items())), tuple(sorted(options.items())))
+    with _lock:
+        engine = _engines.get(key)
+        if engine is None:
+            engine = create_engine(url, connect_args=connect_args or {}, **options)
+            metrics.instrument_engine(engine) # stage 별 DB round-trip 수 집계
+            _engines[key] = engine
+    return engine
+
+
+def dispose_engines():
+    """캐시된 Engine 들의 풀을 닫고 캐시 (schema cache 포함) 를 비웁니다."""
+    with _lock:
+        for engine in _engines.values():
+            engine.dispose()
+        _engines.clear()
+        _verified_tables.clear()
+
 
-def get_db_engine(db_config):
-    """SQLAlchemy DB 엔진을 생성합니다."""
+def get_db_engine(db_config, pool_size=None):
+    """
+    SQLAlchemy DB 엔진을 생성합니다 (같은 설정이면 재사용).
+    풀 설정은 db_config 의 pool_size / max_overflow / pool_timeout / pool_recycle / pool_pre_ping,
+    pool_size 인자를 주면 그 값과 설정값 중 큰 값을 씁니다 (동시 writer 수에 맞추기).
+    """
     print("Creating database engine...")
     try:
         engine_url = (
@@ -10,7 +75,15 @@ def get_db_engine(db_config):
             f"{db_config['user']}:{db_config['password']}@"
             f"{db_config['host']}:{db_config['port']}/{db_config['db_name']}"
         )
-        engine = create_engine(engine_url)
+        connect_args = {}
+        if db_config.get('allow_local_infile'):
+            # LOAD DATA LOCAL INFILE 벌크 적재용 (db_loader 의 'load_data' 방식)
+            connect_args['allow_local_infile'] = True
+        pool_options = {k: db_config.get(k) for k in DEFAULT_POOL_OPTIONS}
+        if pool_size is not None:
+            pool_options['pool_size'] = max(pool_size, pool_options['pool_size'] or DEFAULT_POOL_OPTIONS['pool_size'])
+        engine = get_engine(engine_url, connect_args=connect_args, **pool_options)
+        # 연결 확인 (이 커넥션은 닫지 않고 풀로 돌아가 이후 작업에서 재사용됨)
         with engine.connect() as connection:
             print("Database connection successful.")
         return engine
@@ -21,29 +94,66 @@ def get_db_engine(db_config):
         print(f"Error creating database engine: {e}")
         raise
 
-def create_target_table_if_not_exists(engine, db_name, table_name_to_create):
-    """지정된 이름으로 테이블이 없으면 생성합니다."""
-    create_sql = get_common_table_schema_sql(table_name_to_create)
+
+@contextmanager
+def transaction(connectable):
+    """Engine 이면 새 트랜잭션을, Connection 이면 (이미 진행 중인 트랜잭션이 없을 때만) 트랜잭션을 엽니다."""
+    if isinstance(connectable, Engine):
+        with connectable.begin() as connection:
+            yield connection
+    elif connectable.in_transaction():
+        # 호출자가 트랜잭션을 관리하는 경우 (commit/rollback 은 호출자 책임)
+        yield connectable
+    else:
+        with connectable.begin():
+            yield connectable
+
+
+def _engine_of(connectable):
+    return connectable if isinstance(connectable, Engine) else connectable.engine
+
+
+def ensure_table(connectable, table_name, create_sql):
+    """
+    create_sql (CREATE TABLE IF NOT EXISTS ...) 을 실행합니다. 같은 엔진/테이블은 프로세스에서 한 번만 실행하고
+    이후 호출은 DB 에 가지 않습니다. 실행했으면 True 를 반환합니다.
+    """
+    key = (str(_engine_of(connectable).url), table_name)
+    if key in _verified_tables:
+        return False
+    with metrics.stage('create_table', table=table_name), transaction(connectable) as connection:
+        connection.execute(text(create_sql))
+    _verified_tables.add(key)
+    return True
+
+
+def create_target_table_if_not_exists(engine, db_name, table_name_to_create, payload_ids=False):
+    """
+    지정된 이름으로 테이블이 없으면 생성합니다 (이미 확인한 테이블이면 DB 에 다시 묻지 않음).
+    payload_ids=True 면 payload 대신 payload_id 컬럼으로 만듭니다 (src/database/payload_store.py).
+    """
+    create_sql = get_common_table_schema_sql(table_name_to_create, dialect=_engine_of(engine).dialect.name,
+                                             payload_ids=payload_ids)
     print(f"Checking/Creating table '{table_name_to_create}' in database '{db_name}'...")
-    with engine.connect() as connection:
-        try:
-            pass
-        except Exception as e:
-            print(f"Error selecting database '{db_name}': {e}")
-            raise
-        try:
-            connection.execute(text(create_sql))
-            connection.commit()
+    try:
+        if ensure_table(engine, table_name_to_create, create_sql):
             print(f"Table '{table_name_to_create}' checked/created successfully.")
-        except Exception as e:
-            print(f"Error creating table '{table_name_to_create}': {e}")
-            raise
+        else:
+            print(f"Table '{table_name_to_create}' already verified in this process.")
+    except Exception as e:
+        print(f"Error creating table '{table_name_to_create}': {e}")
+        raise
 
-def get_common_table_schema_sql(table_name):
-     """모든 로그 테이블에 적용될 공통 스키마 SQL을 반환합니다."""
+def get_common_table_schema_sql(table_name, dialect='mysql', payload_ids=False):
+     """
+     모든 로그 테이블에 적용될 공통 스키마 SQL을 반환합니다 (dialect='sqlite' 이면 SQLite 용 id 컬럼,
+     payload_ids=True 면 payload 문자열 대신 payload 사전의 id).
+     """
+     id_column = 'id INTEGER PRIMARY KEY AUTOINCREMENT' if dialect == 'sqlite' else 'id INT AUTO_INCREMENT PRIMARY KEY'
+     payload_column = 'payload_id BIGINT NULL' if payload_ids else 'payload TEXT NULL'
      return f"""
      CREATE TABLE IF NOT EXISTS {table_name} (
-         id INT AUTO_INCREMENT PRIMARY KEY,
+         {id_column},
          timestamp DATETIME NULL,
          ip_src VARCHAR(45) NULL,
          ip_dst VARCHAR(45) NULL,
@@ -53,7 +163,7 @@ def get_common_table_schema_sql(table_name):
          client_id VARCHAR(4096) NULL,
          topic VARCHAR(1024) NULL,
          mqtt_len INT NULL,
-         payload TEXT NULL,
+         {payload_column},
          msg_type INT NULL,
          ip_proto INT NULL,
          attack_type VARCHAR(100) NULL,
@@ -0,0 +1,218 @@
+# src/database/manifest.py
+"""
+적재 이력(manifest) 테이블.
+
+파일별로 체크섬/크기와 커밋된 chunk 진행 상황을 기록해서
+- 이미 끝까지 적재된 (내용이 바뀌지 않은) 파일은 건너뛰고
+- 중간에 중단된 파일은 마지막으로 커밋된 chunk 다음부터 이어서 적재합니다.
+  진행 위치는 chunk 를 쓴 모드 (load_mode) 와 리더 (reader) 와 함께 기록되므로, 재개하는 쪽은 그 위치를 읽을 수
+  있는 리더를 고르거나 (행 수: 직렬 chunk 리더, 바이트 오프셋: shard 리더) 거부합니다.
+- max_rows 로 앞부분만 적재한 파일은 complete 로 표시하지 않습니다 (나중 실행이 나머지를 이어서 적재).
+- 내용이 바뀐 파일이나 --force 로 처음부터 다시 적재하는 파일은, manifest 를 초기화하는 같은 트랜잭션에서
+  이전에 커밋한 그 파일의 행을 대상 테이블에서 지웁니다 (file_rows). 그 파일의 행만 골라낼 수 없으면
+  (다른 파일과 같은 테이블 / 같은 assumed_attack_type 을 쓰는 경우) 중복 적재하지 않고 ValueError 로 거부합니다.
+
+chunk 데이터 INSERT 와 manifest 갱신은 같은 트랜잭션에서 커밋되므로,
+중단 시점과 관계없이 테이블 내용과 manifest 가 어긋나지 않습니다.
+"""
+import datetime
+import hashlib
+import os
+
+from sqlalchemy import inspect, text
+
+from src.database.db_utils import ensure_table, transaction
+
+MANIFEST_TABLE = 'ingest_manifest'
+
+STATUS_IN_PROGRESS = 'in_progress'
+STATUS_COMPLETE = 'complete'
+
+# 진행 위치를 기록한 리더: whole_file / serial 은 source_rows_consumed (행 수), sharded 는 source_byte_offset
+READER_WHOLE_FILE = 'whole_file'
+READER_SERIAL = 'serial'
+READER_SHARDED = 'sharded'
+
+# 이전 버전의 manifest 테이블에 없는 컬럼 (ensure_table 에서 추가)
+_ADDED_COLUMNS = (
+    ('load_mode', 'VARCHAR(16) NULL'),
+    ('reader', 'VARCHAR(16) NULL'),
+    ('max_rows', 'BIGINT NULL'),
+)
+
+
+def get_manifest_table_schema_sql(table_name=MANIFEST_TABLE):
+    """manifest 테이블 스키마 SQL 을 반환합니다."""
+    return f"""
+    CREATE TABLE IF NOT EXISTS {table_name} (
+        filename VARCHAR(255) NOT NULL,
+        target_table VARCHAR(64) NOT NULL,
+        file_size BIGINT NOT NULL,
+        checksum CHAR(64) NOT NULL,
+        status VARCHAR(16) NOT NULL,
+        chunks_committed INT NOT NULL DEFAULT 0,
+        rows_committed BIGINT NOT NULL DEFAULT 0,
+        source_rows_consumed BIGINT NULL,   -- 직렬 chunk 리더: 처리 완료한 원본 행 수 (헤더 제외)
+        source_byte_offset BIGINT NULL,     -- 바이트 범위 병렬 리더: 처리 완료한 마지막 shard 의 끝 오프셋
+        load_mode VARCHAR(16) NULL,         -- 마지막 chunk 를 쓴 모드 (batch / stream / pipelined)
+        reader VARCHAR(16) NULL,            -- 마지막 chunk 를 읽은 리더 (whole_file / serial / sharded)
+        max_rows BIGINT NULL,               -- 마지막 실행의 행 수 제한 (없으면 NULL)
+        started_at DATETIME NULL,
+        updated_at DATETIME NULL,
+        PRIMARY KEY (filename, target_table)
+    );
+    """
+
+
+def compute_file_checksum(path, block_size=8 * 1024 * 1024):
+    """파일 내용의 SHA-256 hex digest 를 계산합니다."""
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        while True:
+            block = f.read(block_size)
+            if not block:
+                break
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def _now():
+    return datetime.datetime.now().replace(microsecond=0)
+
+
+class IngestManifest:
+    def __init__(self, engine, table_name=MANIFEST_TABLE):
+        self.engine = engine
+        self.table_name = table_name
+
+    def ensure_table(self):
+        if not ensure_table(self.engine, self.table_name, get_manifest_table_schema_sql(self.table_name)):
+            return
+        # 이전 버전에서 만든 테이블이면 새 컬럼 추가
+        existing = {column['name'] for column in inspect(self.engine).get_columns(self.table_name)}
+        missing = [(name, ddl) for name, ddl in _ADDED_COLUMNS if name not in existing]
+        if missing:
+            with transaction(self.engine) as connection:
+                for name, ddl in missing:
+                    connection.execute(text(f"ALTER TABLE {self.table_name} ADD COLUMN {name} {ddl}"))
+            print(f"Manifest: added column(s) {', '.join(name for name, _ in missing)} to '{self.table_name}'.")
+
+    def _get_entry(self, connection, filename, target_table):
+        row = connection.execute(
+            text(f"SELECT file_size, checksum, status, chunks_committed, rows_committed, "
+                 f"source_rows_consumed, source_byte_offset, load_mode, reader, max_rows FROM {self.table_name} "
+                 f"WHERE filename = :filename AND target_table = :target_table"),
+            {'filename': filename, 'target_table': target_table}
+        ).mappings().first()
+        return dict(row) if row is not None else None
+
+    def _other_files(self, connection, filename, target_table):
+        """같은 target_table 에 행을 커밋한 다른 파일 이름 목록."""
+        return [row[0] for row in connection.execute(
+            text(f"SELECT filename FROM {self.table_name} WHERE target_table = :target_table "
+                 f"AND filename <> :filename AND rows_committed > 0"),
+            {'filename': filename, 'target_table': target_table})]
+
+    def _delete_file_rows(self, connection, filename, target_table, file_rows, rows_committed):
+        """
+        다시 적재하기 전에 이전에 커밋한 파일의 행을 지웁니다 (plan 의 트랜잭션 안에서).
+        file_rows 는 (WHERE 절, 파라미터) 이고 WHERE 절이 None 이면 테이블 전체가 이 파일의 행입니다.
+        file_rows 가 None 이거나 테이블을 다른 파일과 같이 쓰면 ValueError.
+        """
+        if file_rows is not None and file_rows[0] is None:
+            others = self._other_files(connection, filename, target_table)
+            if others:
+                file_rows = None
+        if file_rows is None:
+            raise ValueError(
+                f"'{filename}' must be reloaded from the start, but its {rows_committed} previously committed rows "
+                f"in '{target_table}' cannot be told apart from other files' rows. Delete them from "
+                f"'{target_table}' and its '{self.table_name}' entry first, then run again")
+        where, params = file_rows
+        result = connection.execute(text(f"DELETE FROM {target_table}" + (f" WHERE {where}" if where else "")),
+                                    params or {})
+        print(f"Manifest: deleted {result.rowcount} previously loaded row(s) of '{filename}' from '{target_table}' "
+              f"before reloading it.")
+
+    def plan(self, filename, target_table, csv_path, force=False, max_rows=None, file_rows=None):
+        """
+        파일을 어떻게 처리할지 결정하고 manifest 에 in_progress 항목을 준비합니다.
+        max_rows 는 이번 실행의 행 수 제한으로, manifest 에 기록됩니다.
+        file_rows ((WHERE 절 또는 None, 파라미터)) 는 target_table 에서 이 파일의 행을 고르는 조건으로,
+        처음부터 다시 적재할 때 이전 행을 지우는 데 씁니다 (None 이면 다시 적재를 거부).
+        반환값: {'action': 'skip' | 'resume' | 'start', 'rows_committed', 'chunks_committed',
+                 'source_rows_consumed', 'source_byte_offset', 'load_mode', 'reader', 'max_rows'}
+        """
+        file_size = os.path.getsize(csv_path)
+        checksum = compute_file_checksum(csv_path)
+        params = {'filename': filename, 'target_table': target_table, 'file_size': file_size,
+                  'checksum': checksum, 'max_rows': max_rows, 'now': _now()}
+        with transaction(self.engine) as connection:
+            entry = self._get_entry(connection, filename, target_table)
+            unchanged = entry is not None and entry['checksum'] == checksum and entry['file_size'] == file_size
+            if unchanged and not force:
+                if entry['status'] == STATUS_COMPLETE:
+                    print(f"Manifest: '{filename}' is unchanged and fully loaded into '{target_table}' "
+                          f"({entry['rows_committed']} rows). Skipping.")
+                    return dict(entry, action='skip')
+                if entry['chunks_committed'] > 0:
+                    print(f"Manifest: resuming '{filename}' -> '{target_table}' after {entry['chunks_committed']} "
+                          f"committed chunks ({entry['rows_committed']} rows, written by {entry['load_mode'] or '?'} "
+                          f"mode / {entry['reader'] or '?'} reader).")
+                    connection.execute(
+                        text(f"UPDATE {self.table_name} SET max_rows = :max_rows, updated_at = :now "
+                             f"WHERE filename = :filename AND target_table = :target_table"),
+                        params
+                    )
+                    return dict(entry, action='resume', max_rows=max_rows)
+
+            if entry is not None and entry['rows_committed'] > 0:
+                # 처음부터 다시 적재: 이전 행을 지우지 않으면 중복으로 append 됨 (지우기와 초기화는 같은 트랜잭션)
+                print(f"Manifest: reloading '{filename}' from the start ("
+                      f"{'--force' if unchanged else 'file changed since its last load'}).")
+                self._delete_file_rows(connection, filename, target_table, file_rows, entry['rows_committed'])
+            if entry is None:
+                connection.execute(
+                    text(f"INSERT INTO {self.table_name} (filename, target_table, file_size, checksum, status, "
+                         f"chunks_committed, rows_committed, max_rows, started_at, updated_at) "
+                         f"VALUES (:filename, :target_table, :file_size, :checksum, '{STATUS_IN_PROGRESS}', "
+                         f"0, 0, :max_rows, :now, :now)"),
+                    params
+                )
+            else:
+                connection.execute(
+                    text(f"UPDATE {self.table_name} SET file_size = :file_size, checksum = :checksum, "
+                         f"status = '{STATUS_IN_PROGRESS}', chunks_committed = 0, rows_committed = 0, "
+                         f"source_rows_consumed = NULL, source_byte_offset = NULL, load_mode = NULL, reader = NULL, "
+                         f"max_rows = :max_rows, started_at = :now, updated_at = :now "
+                         f"WHERE filename = :filename AND target_table = :target_table"),
+                    params
+                )
+        return {'action': 'start', 'chunks_committed': 0, 'rows_committed': 0,
+                'source_rows_consumed': None, 'source_byte_offset': None,
+                'load_mode': None, 'reader': None, 'max_rows': max_rows}
+
+    def record_chunk(self, connection, filename, target_table, rows, source_rows_consumed=None,
+                     source_byte_offset=None, load_mode=None, reader=None):
+        """
+        chunk 하나가 적재되었음을 기록합니다. 반드시 chunk INSERT 와 같은 트랜잭션의 connection 으로 호출해야 합니다.
+        load_mode / reader 는 진행 위치를 어떻게 해석해야 하는지 (재개할 때 쓸 리더) 를 남깁니다.
+        """
+        connection.execute(
+            text(f"UPDATE {self.table_name} SET chunks_committed = chunks_committed + 1, "
+                 f"rows_committed = rows_committed + :rows, "
+                 f"source_rows_consumed = :source_rows_consumed, source_byte_offset = :source_byte_offset, "
+                 f"load_mode = :load_mode, reader = :reader, "
+                 f"updated_at = :now WHERE filename = :filename AND target_table = :target_table"),
+            {'rows': rows, 'source_rows_consumed': source_rows_consumed,
+             'source_byte_offset': source_byte_offset, 'load_mode': load_mode, 'reader': reader, 'now': _now(),
+             'filename': filename, 'target_table': target_table}
+        )
+
+    def mark_complete(self, filename, target_table):
+        with transaction(self.engine) as connection:
+            connection.execute(
+                text(f"UPDATE {self.table_name} SET status = '{STATUS_COMPLETE}', updated_at = :now "
+                     f"WHERE filename = :filename AND target_table = :target_table"),
+                {'now': _now(), 'filename': filename, 'target_table': target_table}
+            )
@@ -0,0 +1,214 @@
+# src/database/payload_store.py
+"""
+payload 사전 (database.payload_store: 'dedup').
+
+MQTT payload 는 같은 값이 아주 많이 반복되므로 (flood / bruteforce 의 같은 메시지 등) 로그 테이블에 행마다
+문자열을 저장하지 않고 mqtt_payloads 에 한 번만 저장한 뒤 로그 테이블에는 payload_id (BIGINT) 만 둡니다.
+- payload_id 는 payload 내용의 64-bit 해시 (pd.util.hash_array, 고정 hash key) 입니다. 프로세스나 실행이 달라도
+  같은 payload 는 같은 id 가 되므로 (content-addressed) 사전을 미리 읽어 올 필요가 없습니다.
+  해시는 chunk 의 고유값에만 계산합니다. 고유 payload 천만 개일 때 충돌 확률은 약 3e-6 이고,
+  충돌은 조용히 넘어가지 않고 ValueError 로 적재를 멈춥니다 (로그 행이 다른 payload 를 가리키지 않도록):
+  새로 넣은 id 는 사전 테이블에 남은 payload_length / payload 를 읽어 비교하고, 이미 저장한 id 는
+  다른 hash key 로 계산한 검사용 64-bit 해시를 기억해 두었다가 비교합니다.
+- mqtt_payloads 에는 INSERT IGNORE (SQLite: INSERT OR IGNORE) 로 넣으므로 여러 writer / 프로세스가 같은 payload 를
+  동시에 써도 됩니다. 로그 행과 같은 트랜잭션에서 쓰므로 chunk 가 rollback 되면 payload 도 함께 rollback 됩니다.
+- 이미 저장한 id 는 프로세스에서 기억해 다시 보내지 않습니다. commit 된 뒤에만 기억하므로 rollback 된 chunk 의
+  payload 를 저장된 것으로 착각하지 않습니다.
+- 로그 테이블이 payload_id 컬럼을 가졌는지는 테이블 스키마를 보고 판단하므로 (uses_payload_ids),
+  payload 컬럼으로 만든 기존 테이블에는 지금처럼 문자열이 저장됩니다.
+"""
+import threading
+from contextlib import nullcontext
+
+import numpy as np
+import pandas as pd
+from sqlalchemy import bindparam, event, inspect, text
+from sqlalchemy.engine import Engine
+from sqlalchemy.exc import NoSuchTableError
+
+from src.database.db_utils import ensure_table
+
+PAYLOAD_TABLE = 'mqtt_payloads'
+PAYLOAD_STORES = ('inline', 'dedup')
+DEFAULT_PAYLOAD_STORE = 'inline'
+
+_MAX_KNOWN_IDS = 2_000_000 # 프로세스에서 기억하는 저장된 id 수 (넘으면 비우고 다시 모음, 약 250MB)
+_CHECK_HASH_KEY = 'payload-check-01' # 충돌 검사용 해시의 hash key (16 bytes, payload_id 의 기본 key 와 다름)
+_PENDING_KEY = 'payload_store.pending_ids'
+
+_lock = threading.Lock()
+_payload_id_tables = {} # (engine url, table) -> 로그 테이블에 payload_id 컬럼이 있는지
+_known_ids = {}         # engine url -> {commit 된 payload_id: 검사용 해시}
+
+
+def get_payload_table_schema_sql(table_name=PAYLOAD_TABLE):
+    """payload 사전 테이블 스키마 SQL (MySQL / SQLite 공통)."""
+    return f"""
+    CREATE TABLE IF NOT EXISTS {table_name} (
+        payload_id BIGINT NOT NULL PRIMARY KEY,
+        payload_length INT NOT NULL,
+        payload TEXT NOT NULL,
+        created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+    )
+    """
+
+
+def ensure_payload_table(connectable, table_name=PAYLOAD_TABLE):
+    """payload 사전 테이블을 만듭니다 (프로세스에서 한 번만)."""
+    return ensure_table(connectable, table_name, get_payload_table_schema_sql(table_name))
+
+
+def _engine_of(connectable):
+    return connectable if isinstance(connectable, Engine) else connectable.engine
+
+
+def uses_payload_ids(connectable, table_name):
+    """table_name 이 payload 대신 payload_id 컬럼을 가진 테이블인지 (테이블마다 프로세스에서 한 번만 조회)."""
+    key = (str(_engine_of(connectable).url), table_name)
+    cached = _payload_id_tables.get(key)
+    if cached is None:
+        try:
+            columns = {column['name'] for column in inspect(connectable).get_columns(table_name)}
+        except NoSuchTableError:
+            return False # 아직 없는 테이블 (to_sql 이 만들 테이블) 은 payload 컬럼을 씀
+        cached = _payload_id_tables[key] = 'payload_id' in columns and 'payload' not in columns
+    return cached
+
+
+def payload_ids(series):
+    """
+    payload Series 를 (행별 payload_id (Int64, 결측은 NA), 고유 payload DataFrame) 으로 바꿉니다.
+    고유 payload DataFrame 의 컬럼은 payload_id, payload_length, payload, payload_check (충돌 검사용 해시) 입니다.
+    서로 다른 payload 가 같은 payload_id 가 되면 ValueError 를 냅니다.
+    """
+    if isinstance(series.dtype, pd.CategoricalDtype):
+        codes = series.cat.codes.to_numpy()
+        values = series.cat.categories
+    else:
+        codes, values = pd.factorize(series)
+    values = pd.Index(values).astype(str)
+    hashes = pd.util.hash_array(values.to_numpy(dtype=object)).view(np.int64)
+    missing = codes < 0
+    row_hashes = hashes[np.where(missing, 0, codes)] if len(hashes) else np.zeros(len(codes), dtype=np.int64)
+    ids = pd.arrays.IntegerArray(row_hashes, missing)
+    used = np.zeros(len(values), dtype=bool)
+    used[codes[~missing]] = True
+    uniques = pd.DataFrame({
+        'payload_id': hashes[used],
+        'payload_length': values[used].str.len(),
+        'payload': values[used],
+        'payload_check': pd.util.hash_array(values[used].to_numpy(dtype=object),
+                                            hash_key=_CHECK_HASH_KEY).view(np.int64),
+    })
+    colliding = uniques['payload_id'].duplicated(keep=False)
+    if colliding.any():
+        raise _collision_error(uniques.loc[colliding, 'payload_id'].iloc[0], 'distinct payloads in the same chunk')
+    return pd.Series(ids, index=series.index, name='payload_id'), uniques
+
+
+def _collision_error(payload_id, detail):
+    return ValueError(f"payload_id {payload_id} collides: {detail} hash to the same 64-bit id. Load this data "
+                      f"with database.payload_store: 'inline' (the payload dictionary cannot represent both).")
+
+
+def _remember_committed(connection):
+    pending = connection.info.pop(_PENDING_KEY, None)
+    if pending:
+        with _lock:
+            known = _known_ids.setdefault(str(connection.engine.url), {})
+            if len(known) + len(pending) > _MAX_KNOWN_IDS:
+                known.clear()
+            known.update(pending)
+
+
+def _forget_pending(connection):
+    connection.info.pop(_PENDING_KEY, None)
+
+
+def _track_transactions(engine):
+    with _lock:
+        if not event.contains(engine, 'commit', _remember_committed):
+            event.listen(engine, 'commit', _remember_committed)
+            event.listen(engine, 'rollback', _forget_pending)
+
+
+def _insert_ignore_sql(dialect, table_name):
+    columns = "(payload_id, payload_length, payload) VALUES (:payload_id, :payload_length, :payload)"
+    if dialect == 'mysql':
+        return f"INSERT IGNORE INTO {table_name} {columns}"
+    if dialect == 'sqlite':
+        return f"INSERT OR IGNORE INTO {table_name} {columns}"
+    return f"INSERT INTO {table_name} {columns} ON CONFLICT (payload_id) DO NOTHING"
+
+
+def _check_stored(connection, new, table_name, batch_size):
+    """INSERT IGNORE 뒤 사전 테이블의 행이 new 의 payload 와 같은지 확인합니다 (다르면 다른 payload 가 먼저 저장된 충돌)."""
+    select_sql = text(f"SELECT payload_id, payload_length, payload FROM {table_name} "
+                      f"WHERE payload_id IN :ids").bindparams(bindparam('ids', expanding=True))
+    expected = dict(zip(new['payload_id'].tolist(), zip(new['payload_length'].tolist(), new['payload'].tolist())))
+    ids = list(expected)
+    for start in range(0, len(ids), batch_size):
+        for payload_id, payload_length, payload in connection.execute(select_sql, {'ids': ids[start:start + batch_size]}):
+            if (payload_length, payload) != expected[payload_id]:
+                raise _collision_error(payload_id, f"a payload already stored in '{table_name}' and a new payload")
+
+
+def store_payloads(connection, uniques, table_name=PAYLOAD_TABLE, batch_size=10000):
+    """
+    아직 저장하지 않은 payload 만 사전 테이블에 넣습니다 (connection 의 트랜잭션 안에서).
+    새로 보낸 payload 수를 반환합니다. payload_id 충돌을 발견하면 ValueError 를 냅니다.
+    """
+    engine = connection.engine
+    _track_transactions(engine)
+    known = _known_ids.get(str(engine.url), {})
+    pending = connection.info.setdefault(_PENDING_KEY, {})
+    new_mask = []
+    for pid, check in zip(uniques['payload_id'].tolist(), uniques['payload_check'].tolist()):
+        stored_check = pending.get(pid, known.get(pid))
+        if stored_check is not None and stored_check != check:
+            raise _collision_error(pid, f"a payload already stored in '{table_name}' and a new payload")
+        new_mask.append(stored_check is None)
+    # id 순서로 넣어 동시에 쓰는 트랜잭션끼리 같은 순서로 잠금을 잡게 함 (deadlock 방지)
+    new = uniques[new_mask].sort_values('payload_id')
+    if new.empty:
+        return 0
+    insert_sql = text(_insert_ignore_sql(connection.dialect.name, table_name))
+    rows = new.drop(columns=['payload_check']).to_dict('records')
+    for start in range(0, len(rows), batch_size):
+        connection.execute(insert_sql, rows[start:start + batch_size])
+    # 다른 writer / 이전 실행이 먼저 넣은 id 면 IGNORE 되었으므로 저장된 내용과 비교
+    _check_stored(connection, new, table_name, batch_size)
+    pending.update(zip(new['payload_id'].tolist(), new['payload_check'].tolist()))
+    return len(new)
+
+
+def replace_payloads(df, connection, table_name=PAYLOAD_TABLE):
+    """df 의 payload 컬럼을 같은 위치의 payload_id 컬럼으로 바꾸고, 새 payload 를 사전 테이블에 저장합니다."""
+    ids, uniques = payload_ids(df['payload'])
+    stored = store_payloads(connection, uniques, table_name)
+    if stored:
+        print(f"Stored {stored} new payload(s) in '{table_name}' ({len(uniques)} distinct in {len(df)} rows).")
+    position = df.columns.get_loc('payload')
+    out = df.drop(columns=['payload'])
+    out.insert(position, 'payload_id', ids)
+    return out
+
+
+def attach_payloads(df, connectable, table_name=PAYLOAD_TABLE, batch_size=1000):
+    """
+    조회 결과의 payload_id 를 사전 테이블에서 찾아 같은 위치의 payload 컬럼으로 바꿉니다.
+    payload_id 는 Int64 (또는 파이썬 int) 여야 합니다 (float64 로 읽으면 64-bit id 가 정확하지 않음).
+    """
+    ids = df['payload_id'].dropna().astype('int64').unique().tolist()
+    texts = {}
+    if ids:
+        select_sql = text(f"SELECT payload_id, payload FROM {table_name} WHERE payload_id IN :ids").bindparams(
+            bindparam('ids', expanding=True))
+        with (connectable.connect() if isinstance(connectable, Engine) else nullcontext(connectable)) as connection:
+            for start in range(0, len(ids), batch_size):
+                texts.update(connection.execute(select_sql, {'ids': ids[start:start + batch_size]}).fetchall())
+    position = df.columns.get_loc('payload_id')
+    payload = df['payload_id'].map(texts)
+    out = df.drop(columns=['payload_id'])
+    out.insert(position, 'payload', payload)
+    return out
@@ -0,0 +1,303 @@
+# src/database/unified_logs.py
+"""
+통합 로그 스키마 (database.schema_mode: 'unified').
+
+파일별 테이블 6개 대신 모든 로그를 mqtt_logs 하나에 넣습니다.
+- 원본 파일의 assumed_attack_type 을 컬럼으로 두고, 기존 테이블 이름 (logs_flood 등) 은
+  assumed_attack_type 으로 거르는 호환 view 로 만듭니다 (date / time 은 view 에서 timestamp 로 계산).
+- MySQL 에서는 TO_DAYS(timestamp) 기준 RANGE 파티션을 하루 단위로 나눕니다. 파티션은 적재할 날짜가 생길 때
+  ensure_day_partitions 가 REORGANIZE PARTITION 으로 만듭니다 (DDL 은 암묵적 commit 이 있어 chunk 트랜잭션 밖에서).
+  파티션 컬럼은 모든 unique key 에 포함되어야 하므로 PRIMARY KEY 는 (id, timestamp) 이고 timestamp 는 NOT NULL 입니다.
+  timestamp 가 없는 행은 UNKNOWN_TIMESTAMP (1970-01-01) 로 저장되고 view 에서는 다시 NULL 로 보입니다.
+- 보조 인덱스: (timestamp), (ip_src, timestamp), (attack_type, timestamp), (assumed_attack_type, timestamp) (view 용)
+- date / time 컬럼은 timestamp 와 중복이라 저장하지 않고, client_id 는 VARCHAR(255) 로 줄였습니다 (더 긴 값은 잘림).
+- payload_ids=True (database.payload_store: 'dedup') 면 payload 대신 payload_id 를 저장하고,
+  호환 view 와 iter_logs 는 mqtt_payloads 에서 payload 문자열을 찾아 보여줍니다.
+
+iter_logs 는 시간 구간 조회 결과를 DataFrame chunk 로 돌려줍니다. 서버 측 커서를 지원하는 드라이버
+(pymysql, mysqldb 등) 는 stream_results 로 읽고, 지원하지 않는 드라이버 (mysqlconnector, sqlite) 는
+(timestamp, id) 인덱스 순서의 keyset 페이지로 나눠 읽으므로 어느 쪽이든 메모리는 chunksize 로 제한됩니다.
+"""
+import datetime
+import threading
+
+import pandas as pd
+from sqlalchemy import text
+from sqlalchemy.engine import Engine
+from sqlalchemy.exc import DBAPIError
+
+from src.data_processing.schema import as_string_category
+from src.database.db_utils import ensure_table, transaction
+from src.database.payload_store import PAYLOAD_TABLE, attach_payloads, ensure_payload_table, uses_payload_ids
+
+UNIFIED_TABLE = 'mqtt_logs'
+UNKNOWN_TIMESTAMP = pd.Timestamp('1970-01-01')
+CLIENT_ID_MAX_LEN = 255
+
+UNIFIED_COLUMNS = [
+    'timestamp', 'ip_src', 'ip_dst', 'tcp_srcport', 'tcp_dstport', 'frame_len', 'client_id', 'topic',
+    'mqtt_len', 'payload', 'msg_type', 'ip_proto', 'attack_type', 'is_anomaly', 'assumed_attack_type',
+]
+
+_INDEXES = {
+    f'idx_{UNIFIED_TABLE}_ts': '(timestamp)',
+    f'idx_{UNIFIED_TABLE}_ip_src_ts': '(ip_src, timestamp)',
+    f'idx_{UNIFIED_TABLE}_attack_type_ts': '(attack_type, timestamp)',
+    f'idx_{UNIFIED_TABLE}_assumed_ts': '(assumed_attack_type, timestamp)',
+}
+
+_lock = threading.Lock()
+_partition_bounds = {} # (engine url, table) -> {TO_DAYS 경계값: 파티션 이름} (MAXVALUE 는 None)
+
+
+def _to_days(day):
+    """MySQL TO_DAYS() 와 같은 값 (0000-01-01 기준 일수)."""
+    return day.toordinal() + 365
+
+
+def get_unified_table_schema_sql(table_name=UNIFIED_TABLE, dialect='mysql', payload_ids=False):
+    """통합 로그 테이블 스키마 SQL (MySQL 은 일 단위 RANGE 파티션, 그 외 dialect 는 파티션 없음)."""
+    payload_column = 'payload_id BIGINT NULL' if payload_ids else 'payload TEXT NULL'
+    if dialect == 'sqlite':
+        # SQLite: 파티션 없이 같은 컬럼 구성 (id 는 rowid)
+        return f"""
+        CREATE TABLE IF NOT EXISTS {table_name} (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            timestamp DATETIME NOT NULL,
+            ip_src VARCHAR(45) NULL,
+            ip_dst VARCHAR(45) NULL,
+            tcp_srcport INT NULL,
+            tcp_dstport INT NULL,
+            frame_len INT NULL,
+            client_id VARCHAR({CLIENT_ID_MAX_LEN}) NULL,
+            topic VARCHAR(1024) NULL,
+            mqtt_len INT NULL,
+            {payload_column},
+            msg_type INT NULL,
+            ip_proto INT NULL,
+            attack_type VARCHAR(100) NULL,
+            is_anomaly TINYINT DEFAULT 0,
+            assumed_attack_type VARCHAR(64) NOT NULL,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )
+        """
+    index_sql = ',\n'.join(f"            INDEX {name} {columns}" for name, columns in _INDEXES.items())
+    return f"""
+        CREATE TABLE IF NOT EXISTS {table_name} (
+            id BIGINT NOT NULL AUTO_INCREMENT,
+            timestamp DATETIME(6) NOT NULL,
+            ip_src VARCHAR(45) NULL,
+            ip_dst VARCHAR(45) NULL,
+            tcp_srcport INT NULL,
+            tcp_dstport INT NULL,
+            frame_len INT NULL,
+            client_id VARCHAR({CLIENT_ID_MAX_LEN}) NULL,
+            topic VARCHAR(1024) NULL,
+            mqtt_len INT NULL,
+            {payload_column},
+            msg_type INT NULL,
+            ip_proto INT NULL,
+            attack_type VARCHAR(100) NULL,
+            is_anomaly TINYINT DEFAULT 0,
+            assumed_attack_type VARCHAR(64) NOT NULL,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            PRIMARY KEY (id, timestamp),
+{index_sql}
+        )
+        PARTITION BY RANGE (TO_DAYS(timestamp)) (
+            PARTITION p_start VALUES LESS THAN ({_to_days(datetime.date(1970, 1, 2))}),
+            PARTITION p_future VALUES LESS THAN MAXVALUE
+        )
+        """
+
+
+def get_compat_view_sql(view_name, assumed_attack_type, dialect='mysql', table_name=UNIFIED_TABLE, payload_ids=False):
+    """기존 파일별 테이블과 같은 컬럼 (date / time 포함) 을 보여주는 view SQL (payload_ids 면 payload 사전과 join)."""
+    unknown = UNKNOWN_TIMESTAMP.strftime('%Y-%m-%d %H:%M:%S.%f')
+    if dialect == 'sqlite':
+        create = f"CREATE VIEW IF NOT EXISTS {view_name}"
+        date_sql = "substr(l.timestamp, 1, 10)"
+        time_sql = ("CASE WHEN length(l.timestamp) <= 19 OR substr(l.timestamp, 20) = '.000000' "
+                    "THEN substr(l.timestamp, 12, 8) ELSE substr(l.timestamp, 12) END")
+    else:
+        create = f"CREATE OR REPLACE VIEW {view_name}"
+        # DATE_FORMAT 의 '%' 는 드라이버 paramstyle 과 겹치므로 CAST 로 같은 문자열을 만듦
+        date_sql = "CAST(DATE(l.timestamp) AS CHAR)"
+        time_sql = ("CASE WHEN MICROSECOND(l.timestamp) = 0 THEN CAST(CAST(l.timestamp AS TIME) AS CHAR) "
+                    "ELSE CAST(TIME(l.timestamp) AS CHAR) END")
+    known = f"l.timestamp > '{unknown}'"
+    payload_sql, join_sql = 'l.payload', ''
+    if payload_ids:
+        payload_sql, join_sql = 'p.payload', f"LEFT JOIN {PAYLOAD_TABLE} p ON p.payload_id = l.payload_id"
+    return f"""
+        {create} AS
+        SELECT l.id,
+               CASE WHEN {known} THEN l.timestamp END AS timestamp,
+               l.ip_src, l.ip_dst, l.tcp_srcport, l.tcp_dstport, l.frame_len, l.client_id, l.topic, l.mqtt_len,
+               {payload_sql} AS payload,
+               l.msg_type, l.ip_proto, l.attack_type, l.is_anomaly,
+               CASE WHEN {known} THEN {date_sql} END AS date,
+               CASE WHEN {known} THEN {time_sql} END AS time,
+               l.created_at
+        FROM {table_name} l {join_sql}
+        WHERE l.assumed_attack_type = '{assumed_attack_type.replace("'", "''")}'
+        """
+
+
+def ensure_unified_schema(engine, compat_views=None, table_name=UNIFIED_TABLE, payload_ids=False):
+    """
+    통합 테이블과 인덱스, 호환 view ({기존 테이블 이름: assumed_attack_type}) 를 만듭니다.
+    같은 이름의 실제 테이블 (per_file 모드로 적재한 것) 이 있으면 그 view 는 건너뜁니다.
+    """
+    dialect = engine.dialect.name
+    if payload_ids:
+        ensure_payload_table(engine)
+    create_sql = get_unified_table_schema_sql(table_name, dialect, payload_ids=payload_ids)
+    if ensure_table(engine, table_name, create_sql) and dialect == 'sqlite':
+        with transaction(engine) as connection:
+            for name, columns in _INDEXES.items():
+                connection.execute(text(f"CREATE INDEX IF NOT EXISTS {name} ON {table_name} {columns}"))
+    for view_name, assumed_attack_type in (compat_views or {}).items():
+        with transaction(engine) as connection:
+            if dialect == 'sqlite':
+                kind = connection.execute(text("SELECT type FROM sqlite_master WHERE name = :name"),
+                                          {'name': view_name}).scalar()
+            else:
+                kind = connection.execute(
+                    text("SELECT TABLE_TYPE FROM information_schema.TABLES "
+                         "WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = :name"), {'name': view_name}).scalar()
+            if kind is not None and kind.upper() in ('TABLE', 'BASE TABLE'):
+                print(f"Warning: '{view_name}' is an existing table (per_file schema); not replacing it with a view.")
+                continue
+            connection.execute(text(get_compat_view_sql(view_name, assumed_attack_type, dialect, table_name,
+                                                        payload_ids=uses_payload_ids(connection, table_name))))
+    print(f"Unified log table '{table_name}' ready" + (f" with {len(compat_views)} compatibility views." if compat_views else "."))
+
+
+def _load_partition_bounds(engine, table_name):
+    with engine.connect() as connection:
+        rows = connection.execute(
+            text("SELECT PARTITION_NAME, PARTITION_DESCRIPTION FROM information_schema.PARTITIONS "
+                 "WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = :table AND PARTITION_NAME IS NOT NULL"),
+            {'table': table_name}).fetchall()
+    return {(None if bound == 'MAXVALUE' else int(bound)): name for name, bound in rows}
+
+
+def ensure_day_partitions(connectable, days, table_name=UNIFIED_TABLE):
+    """
+    days (datetime.date 들) 가 각각 자기 일 파티션에 들어가도록 파티션을 나눕니다 (MySQL 만, 이미 있으면 DB 에 가지 않음).
+    여러 프로세스가 동시에 나누다 충돌하면 파티션 목록을 다시 읽어 확인합니다. 새로 만든 파티션 수를 반환합니다.
+    """
+    engine = connectable if isinstance(connectable, Engine) else connectable.engine
+    if engine.dialect.name != 'mysql':
+        return 0
+    key = (str(engine.url), table_name)
+    created = 0
+    with _lock:
+        bounds = _partition_bounds.get(key)
+        if bounds is None:
+            bounds = _partition_bounds[key] = _load_partition_bounds(engine, table_name)
+        for day in sorted(set(days)):
+            upper = _to_days(day + datetime.timedelta(days=1))
+            if upper in bounds:
+                continue
+            # 이 날짜를 포함하는 파티션 (경계가 upper 보다 큰 것 중 가장 작은 것, 없으면 MAXVALUE) 을 둘로 나눔
+            containing = min((b for b in bounds if b is not None and b > upper), default=None)
+            name = bounds[containing]
+            containing_sql = 'MAXVALUE' if containing is None else f'({containing})'
+            try:
+                with engine.connect() as connection:
+                    connection.execute(text(
+                        f"ALTER TABLE {table_name} REORGANIZE PARTITION {name} INTO ("
+                        f"PARTITION p{day:%Y%m%d} VALUES LESS THAN ({upper}), "
+                        f"PARTITION {name} VALUES LESS THAN {containing_sql})"))
+                created += 1
+            except DBAPIError:
+                # 다른 프로세스가 먼저 나눴을 수 있음: 목록을 다시 읽고 그래도 없으면 오류
+                bounds = _partition_bounds[key] = _load_partition_bounds(engine, table_name)
+                if upper not in bounds:
+                    raise
+                continue
+            bounds[upper] = f"p{day:%Y%m%d}"
+    if created:
+        print(f"Created {created} day partition(s) in '{table_name}'.")
+    return created
+
+
+def to_unified_frame(df, assumed_attack_type):
+    """전처리 결과를 통합 테이블 컬럼으로 바꿉니다 (date/time 제거, 결측 timestamp 는 UNKNOWN_TIMESTAMP)."""
+    out = df.drop(columns=[col for col in ('date', 'time') if col in df.columns])
+    out['timestamp'] = out['timestamp'].fillna(UNKNOWN_TIMESTAMP)
+    if 'client_id' in out.columns:
+        out['client_id'] = as_string_category(out['client_id'], max_len=CLIENT_ID_MAX_LEN)
+    out['assumed_attack_type'] = assumed_attack_type or 'Unknown'
+    return out[[col for col in UNIFIED_COLUMNS if col in out.columns]]
+
+
+def prepare_frame_for_table(df, target_table, connectable, assumed_attack_type=None):
+    """
+    target_table 이 통합 테이블이면 행을 통합 스키마로 바꾸고 필요한 일 파티션을 만든 뒤 돌려줍니다.
+    그 외 테이블이면 df 를 그대로 돌려줍니다. chunk 트랜잭션을 열기 전에 호출해야 합니다.
+    """
+    if target_table != UNIFIED_TABLE or df.empty:
+        return df
+    df = to_unified_frame(df, assumed_attack_type)
+    ensure_day_partitions(connectable, df['timestamp'].dt.date.unique())
+    return df
+
+
+def _timestamp_param(value):
+    return pd.Timestamp(value).strftime('%Y-%m-%d %H:%M:%S.%f')
+
+
+def iter_logs(engine, start, end, chunksize=100000, ip_src=None, attack_type=None, assumed_attack_type=None,
+              columns=None, table_name=UNIFIED_TABLE):
+    """
+    [start, end) 구간의 로그를 timestamp 순서로 chunksize 행씩 DataFrame 으로 돌려줍니다.
+    ip_src / attack_type / assumed_attack_type 을 주면 해당 인덱스로 범위를 좁힙니다.
+    payload_id 로 저장한 테이블이면 chunk 마다 payload 사전에서 payload 문자열을 찾아 채웁니다.
+    """
+    columns = list(columns or ['id'] + UNIFIED_COLUMNS)
+    resolve_payloads = 'payload' in columns and uses_payload_ids(engine, table_name)
+    stored_columns = ['payload_id' if resolve_payloads and col == 'payload' else col for col in columns]
+    selected = list(dict.fromkeys(stored_columns + ['id', 'timestamp']))
+    conditions = ["timestamp >= :start", "timestamp < :end"]
+    params = {'start': _timestamp_param(start), 'end': _timestamp_param(end)}
+    for name, value in (('ip_src', ip_src), ('attack_type', attack_type), ('assumed_attack_type', assumed_attack_type)):
+        if value is not None:
+            conditions.append(f"{name} = :{name}")
+            params[name] = value
+    select_sql = f"SELECT {', '.join(selected)} FROM {table_name} WHERE {' AND '.join(conditions)}"
+
+    def to_frame(rows, keys):
+        df = pd.DataFrame(rows, columns=list(keys))
+        df['timestamp'] = pd.to_datetime(df['timestamp'], format='ISO8601')
+        if resolve_payloads:
+            # NULL 이 섞이면 float64 가 되어 64-bit id 가 뭉개지므로 원래 정수값으로 Int64 를 만듦
+            position = list(keys).index('payload_id')
+            df['payload_id'] = pd.array([row[position] for row in rows], dtype='Int64')
+            # 스트리밍 중인 커넥션에는 다른 쿼리를 보낼 수 없으므로 풀에서 다른 커넥션으로 조회
+            df = attach_payloads(df, engine)
+        return df[columns]
+
+    with engine.connect() as connection:
+        if connection.dialect.supports_server_side_cursors:
+            result = connection.execution_options(stream_results=True, max_row_buffer=chunksize).execute(
+                text(select_sql + " ORDER BY timestamp, id"), params)
+            for rows in result.partitions(chunksize):
+                yield to_frame(rows, result.keys())
+            return
+        # keyset 페이지: 마지막으로 읽은 (timestamp, id) 다음부터
+        page_sql = (select_sql + " AND (timestamp > :last_ts OR (timestamp = :last_ts AND id > :last_id))"
+                    " ORDER BY timestamp, id LIMIT :limit")
+        page_params = dict(params, last_ts=params['start'], last_id=-1, limit=chunksize)
+        while True:
+            result = connection.execute(text(page_sql), page_params)
+            rows = result.fetchall()
+            if not rows:
+                return
+            yield to_frame(rows, result.keys())
+            if len(rows) < chunksize:
+                return
+            last = rows[-1]._mapping
+            page_params.update(last_ts=last['timestamp'], last_id=last['id'])
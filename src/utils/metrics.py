@@ -0,0 +1,203 @@
+# src/utils/metrics.py
+"""
+ingest 단계별 구조화 metrics 와 (선택적) 프로파일링.
+
+    with metrics.stage('read', file='flood.csv') as record:
+        df = ...
+        record['rows'] = len(df)
+
+- stage 가 끝나면 한 줄짜리 JSON 레코드 (stage, file, table, rows, seconds, rows_per_sec, bytes_read,
+  peak_rss_mb, db_round_trips, error, pid, thread, run_id) 를 metrics 파일 (JSON lines) 에 append 합니다.
+- file / table 을 생략하면 metrics.context(...) 로 현재 스레드에 지정한 값을 씁니다
+  (db_loader 처럼 파일 이름을 모르는 하위 단계도 파일/테이블별로 집계할 수 있도록).
+- db_round_trips: instrument_engine() 을 거친 엔진에서 이 스레드가 stage 동안 실행한 SQL 문 (cursor execute) 수.
+- peak_rss_mb: 프로세스 시작 이후 최대 RSS (stage 단독 값이 아니라 그 시점까지의 최대값).
+- profile 에 stage 이름 (또는 'all') 을 지정하면 해당 stage 를 cProfile + tracemalloc 으로 감싸
+  profile_dir 에 .prof (pstats) 와 메모리 할당 상위 목록 (.txt) 을 남깁니다.
+
+설정은 configure() 가 환경 변수에 기록하므로 spawn 된 worker 프로세스도 같은 파일에 기록합니다.
+configure() 를 호출하지 않으면 stage() 는 시간을 재지 않고 record dict 만 돌려줍니다.
+"""
+import contextlib
+import cProfile
+import datetime
+import json
+import os
+import re
+import resource
+import threading
+import time
+import tracemalloc
+
+_ENV_PATH = 'MQTT_PIPELINE_METRICS'
+_ENV_PROFILE = 'MQTT_PIPELINE_PROFILE'
+_ENV_PROFILE_DIR = 'MQTT_PIPELINE_PROFILE_DIR'
+_ENV_RUN_ID = 'MQTT_PIPELINE_RUN_ID'
+
+DEFAULT_PROFILE_DIR = 'logs/profile'
+_TRACEMALLOC_TOP = 25
+
+_write_lock = threading.Lock()
+# cProfile / tracemalloc 은 한 번에 한 stage 만 (tracemalloc 은 프로세스 전역)
+_profile_lock = threading.Lock()
+_local = threading.local()
+_state = {'key': None, 'file': None, 'profile': frozenset(), 'sequence': 0}
+
+
+def configure(path=None, profile=None, profile_dir=DEFAULT_PROFILE_DIR, run_id=None):
+    """
+    metrics 파일 경로와 프로파일링할 stage 목록 (['read', 'preprocess'] / 'all' / 'read,db_write') 을 설정합니다.
+    path 와 profile 이 모두 비어 있으면 비활성화합니다. run_id 를 반환합니다.
+    """
+    if isinstance(profile, str):
+        profile = [name.strip() for name in profile.split(',') if name.strip()]
+    run_id = run_id or os.environ.get(_ENV_RUN_ID) or f"{datetime.datetime.now():%Y%m%d-%H%M%S}-{os.getpid()}"
+    settings = {
+        _ENV_PATH: os.path.abspath(path) if path else '',
+        _ENV_PROFILE: ','.join(profile or []),
+        _ENV_PROFILE_DIR: os.path.abspath(profile_dir or DEFAULT_PROFILE_DIR),
+        _ENV_RUN_ID: run_id,
+    }
+    os.environ.update(settings)
+    if settings[_ENV_PATH]:
+        os.makedirs(os.path.dirname(settings[_ENV_PATH]), exist_ok=True)
+    if settings[_ENV_PROFILE]:
+        os.makedirs(settings[_ENV_PROFILE_DIR], exist_ok=True)
+    return run_id
+
+
+def _settings():
+    """환경 변수의 설정을 읽고, 바뀌었으면 열린 metrics 파일을 다시 엽니다."""
+    key = (os.environ.get(_ENV_PATH, ''), os.environ.get(_ENV_PROFILE, ''))
+    if key != _state['key']:
+        with _write_lock:
+            if _state['file'] is not None:
+                _state['file'].close()
+            _state['file'] = None
+            _state['profile'] = frozenset(name for name in key[1].split(',') if name)
+            _state['key'] = key
+    return key[0], _state['profile']
+
+
+def enabled():
+    path, profile = _settings()
+    return bool(path or profile)
+
+
+def emit(record):
+    """record (dict) 를 metrics 파일에 JSON 한 줄로 append 합니다 (비활성화 상태면 무시)."""
+    path, _ = _settings()
+    if not path:
+        return
+    record = dict(record, run_id=os.environ.get(_ENV_RUN_ID), pid=os.getpid(),
+                  ts=datetime.datetime.now().isoformat(timespec='milliseconds'))
+    line = json.dumps(record, default=str) + '\n'
+    with _write_lock:
+        if _state['file'] is None:
+            # 여러 프로세스가 같은 파일에 쓰므로 append 모드로 열고 한 줄씩 write + flush
+            _state['file'] = open(path, 'a', encoding='utf-8')
+        _state['file'].write(line)
+        _state['file'].flush()
+
+
+def _count_round_trip(conn, cursor, statement, parameters, context, executemany):
+    _local.round_trips = getattr(_local, 'round_trips', 0) + 1
+
+
+def instrument_engine(engine):
+    """engine 에서 실행되는 SQL 문 수를 스레드별로 셉니다 (같은 엔진에 여러 번 호출해도 한 번만 등록)."""
+    from sqlalchemy import event
+
+    if not event.contains(engine, 'before_cursor_execute', _count_round_trip):
+        event.listen(engine, 'before_cursor_execute', _count_round_trip)
+    return engine
+
+
+@contextlib.contextmanager
+def context(**fields):
+    """현재 스레드의 기본 레코드 필드 (file, table 등) 를 지정합니다."""
+    previous = getattr(_local, 'context', {})
+    _local.context = dict(previous, **{k: v for k, v in fields.items() if v is not None})
+    try:
+        yield
+    finally:
+        _local.context = previous
+
+
+def _peak_rss_mb():
+    # Linux 의 ru_maxrss 는 KB 단위
+    return round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024.0, 1)
+
+
+def _start_profile():
+    if not _profile_lock.acquire(blocking=False):
+        return None # 다른 stage 를 프로파일링 중이면 건너뜀
+    started_tracemalloc = not tracemalloc.is_tracing()
+    if started_tracemalloc:
+        tracemalloc.start()
+    tracemalloc.reset_peak()
+    profiler = cProfile.Profile()
+    profiler.enable()
+    return profiler, started_tracemalloc
+
+
+def _finish_profile(handle, record):
+    profiler, started_tracemalloc = handle
+    try:
+        profiler.disable()
+        snapshot = tracemalloc.take_snapshot()
+        _, peak = tracemalloc.get_traced_memory()
+        if started_tracemalloc:
+            tracemalloc.stop()
+        with _write_lock:
+            _state['sequence'] += 1
+            sequence = _state['sequence']
+        label = re.sub(r'[^A-Za-z0-9_.-]+', '_', '_'.join(
+            str(part) for part in (record['stage'], record.get('file'), record.get('table')) if part))
+        base = os.path.join(os.environ.get(_ENV_PROFILE_DIR, DEFAULT_PROFILE_DIR),
+                            f"{os.environ.get(_ENV_RUN_ID, 'run')}_{label}_{os.getpid()}_{sequence}")
+        profiler.dump_stats(base + '.prof')
+        with open(base + '.tracemalloc.txt', 'w', encoding='utf-8') as f:
+            f.write(f"stage: {record['stage']}  file: {record.get('file')}  table: {record.get('table')}\n")
+            f.write(f"peak traced memory: {peak / (1024 * 1024):.1f} MB\n\n")
+            for stat in snapshot.statistics('lineno')[:_TRACEMALLOC_TOP]:
+                f.write(f"{stat}\n")
+        record['profile'] = base + '.prof'
+        record['tracemalloc_peak_mb'] = round(peak / (1024 * 1024), 1)
+    finally:
+        _profile_lock.release()
+
+
+@contextlib.contextmanager
+def stage(name, **fields):
+    """
+    with 블록을 stage 하나로 측정해 metrics 파일에 기록합니다. yield 된 record 에 rows / bytes_read 등을 채우면
+    함께 기록됩니다. 블록에서 예외가 나면 error 를 기록하고 예외는 그대로 올립니다.
+    """
+    record = dict(getattr(_local, 'context', {}), stage=name)
+    record.update({k: v for k, v in fields.items() if v is not None})
+    path, profile = _settings()
+    if not path and not profile:
+        yield record
+        return
+    profile_handle = _start_profile() if name in profile or 'all' in profile else None
+    round_trips_before = getattr(_local, 'round_trips', 0)
+    start = time.perf_counter()
+    try:
+        yield record
+    except BaseException as e:
+        record['error'] = f"{type(e).__name__}: {e}"
+        raise
+    finally:
+        seconds = time.perf_counter() - start
+        if profile_handle is not None:
+            _finish_profile(profile_handle, record)
+        rows = record.get('rows')
+        record.update({
+            'seconds': round(seconds, 6),
+            'rows_per_sec': round(rows / seconds, 1) if rows and seconds > 0 else None,
+            'peak_rss_mb': _peak_rss_mb(),
+            'db_round_trips': getattr(_local, 'round_trips', 0) - round_trips_before,
+            'thread': threading.current_thread().name,
+        })
+        emit(record)
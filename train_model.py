@@ -10,71 +10,135 @@ from sklearn.neural_network import MLPClassifier
 #from tensorflow.keras.callbacks import EarlyStopping
 from sklearn.preprocessing import StandardScaler
 import joblib
+import json
+import os
 import time
+from feature_cache import load_encoded_data
+from feature_encoder import CategoricalEncoder
+from tree_compiler import export_compiled_model
+from model_registry import ModelRegistry
 
 
 def load_data(train_path, test_path):
     df_train = pd.read_csv(train_path)
     df_test = pd.read_csv(test_path)
 
-    df_train = df_train.astype("category")
-    df_test = df_test.astype("category")
-
-    for df in [df_train, df_test]:
-        cat_columns = df.select_dtypes(['category']).columns
-        df[cat_columns] = df[cat_columns].apply(lambda x: x.cat.codes)
-
-    X_train = df_train.drop("target", axis=1)
-    y_train = df_train["target"]
-    X_test = df_test.drop("target", axis=1)
-    y_test = df_test["target"]
+    # 범주형 어휘는 train 에서 한 번만 만들고 test 에도 같은 코드를 씀 (test 에만 있는 값은 -1)
+    encoder = CategoricalEncoder(target="target")
+    X_train, y_train = encoder.fit_transform(df_train)
+    X_test = encoder.transform(df_test)
+    y_test = encoder.transform_target(df_test["target"])
 
     scaler = StandardScaler()
     X_train_scaled = scaler.fit_transform(X_train)
     X_test_scaled = scaler.transform(X_test)
 
-    return X_train_scaled, y_train, X_test_scaled, y_test, scaler
+    return X_train_scaled, y_train, X_test_scaled, y_test, scaler, encoder
 
 
-def train_random_forest(X_train, y_train):
-    print("Training: Random Forest")
-    model = RandomForestClassifier(random_state=42, verbose=1, n_jobs=-1)
-    model.fit(X_train, y_train)
-    joblib.dump(model, "models/rf_model.pkl")
+def load_data_cached(train_path, test_path, use_cache=True):
+    """load_data 결과를 data/cache 에 memory-map 가능한 .npy 로 캐시해서 재사용합니다."""
+    return load_encoded_data(load_data, train_path, test_path, use_cache=use_cache)
+
+
+# 모델 이름 -> 저장 경로 / 병렬 학습 가능 여부 (n_jobs 를 쓰는 모델만 여러 코어를 사용)
+MODEL_SPECS = {
+    'rf': {'label': 'Random Forest', 'path': 'models/rf_model.pkl', 'compiled_path': 'models/rf_model.npz', 'parallel': True},
+    'dt': {'label': 'Decision Tree', 'path': 'models/dt_model.pkl', 'compiled_path': 'models/dt_model.npz', 'parallel': False},
+    'nb': {'label': 'Naive Bayes', 'path': 'models/nb_model.pkl', 'compiled_path': None, 'parallel': False},
+    'gb': {'label': 'Gradient Boost', 'path': 'models/gb_model.pkl', 'compiled_path': 'models/gb_model.npz', 'parallel': False},
+    'mlp': {'label': 'Multi-layer Perceptron', 'path': 'models/mlp_model.pkl', 'compiled_path': None, 'parallel': False},
+}
+
+
+# hyperparameter_search 가 모델별로 찾은 파라미터 ({name: {'params': {...}, ...}})
+TUNED_PARAMS_PATH = 'models/tuned_params.json'
+
+
+def load_tuned_params(path=TUNED_PARAMS_PATH):
+    """tuned params 파일을 {name: params} 로 읽습니다 (파일이 없으면 빈 dict)."""
+    if not path or not os.path.exists(path):
+        return {}
+    with open(path, 'r', encoding='utf-8') as f:
+        return {name: entry['params'] for name, entry in json.load(f).items()}
+
+
+def _default_model(name, n_jobs):
+    if name == 'rf':
+        return RandomForestClassifier(random_state=42, verbose=1, n_jobs=n_jobs)
+    if name == 'dt':
+        return DecisionTreeClassifier()
+    if name == 'nb':
+        return GaussianNB()
+    if name == 'gb':
+        return GradientBoostingClassifier(n_estimators=50, random_state=42, verbose=1)
+    if name == 'mlp':
+        return MLPClassifier(max_iter=130, batch_size=1000, alpha=1e-4,
+                             activation='relu', solver='adam', verbose=10, random_state=42)
+    raise ValueError(f"Unknown model '{name}'. Expected one of {list(MODEL_SPECS)}.")
+
+
+def build_model(name, n_jobs=-1, params=None):
+    """
+    MODEL_SPECS 의 이름으로 (학습 전) 모델을 만듭니다. n_jobs 는 병렬 모델에만 적용됩니다.
+    params (예: load_tuned_params()[name]) 를 주면 기본 파라미터 위에 덮어씁니다.
+    """
+    model = _default_model(name, n_jobs)
+    if params:
+        model.set_params(**params)
     return model
 
 
-def train_decision_tree(X_train, y_train):
-    print("Training: Decision Tree")
-    model = DecisionTreeClassifier()
+def save_model(name, model, path=None, compiled_path=None, registry=None, **metadata):
+    """
+    모델을 joblib 으로 저장하고, 트리 모델이면 tree_compiler 용 .npz 도 내보냅니다.
+    registry (ModelRegistry) 를 주면 metadata (feature_columns, preprocessors, metrics 등) 와 함께 새 버전으로도 등록합니다.
+    """
+    spec = MODEL_SPECS[name]
+    joblib.dump(model, path or spec['path'])
+    compiled_path = compiled_path or spec['compiled_path']
+    if compiled_path:
+        export_compiled_model(model, compiled_path)
+    if registry is not None:
+        return registry.register(name, model, **metadata)
+
+
+def _fit_and_save(name, X_train, y_train, registry=None, metadata=None, model_params=None):
+    metadata = dict(metadata or {})
+    if model_params:
+        print(f"Using tuned parameters for {name}: {model_params}")
+    model = build_model(name, params=model_params)
+    start = time.perf_counter()
     model.fit(X_train, y_train)
-    joblib.dump(model, "models/dt_model.pkl")
+    metadata['metrics'] = {'fit_seconds': round(time.perf_counter() - start, 3), 'train_rows': int(len(X_train)),
+                           **(metadata.get('metrics') or {})}
+    save_model(name, model, registry=registry, **metadata)
     return model
 
 
-def train_naive_bayes(X_train, y_train):
+def train_random_forest(X_train, y_train, registry=None, model_params=None, **metadata):
+    print("Training: Random Forest")
+    return _fit_and_save('rf', X_train, y_train, registry, metadata, model_params)
+
+
+def train_decision_tree(X_train, y_train, registry=None, model_params=None, **metadata):
+    print("Training: Decision Tree")
+    return _fit_and_save('dt', X_train, y_train, registry, metadata, model_params)
+
+
+def train_naive_bayes(X_train, y_train, registry=None, model_params=None, **metadata):
     print("Training: Naive Bayes")
-    model = GaussianNB()
-    model.fit(X_train, y_train)
-    joblib.dump(model, "models/nb_model.pkl")
-    return model
+    return _fit_and_save('nb', X_train, y_train, registry, metadata, model_params)
 
 
-def train_gradient_boost(X_train, y_train):
+def train_gradient_boost(X_train, y_train, registry=None, model_params=None, **metadata):
     print("Training: Gradient Boost")
-    model = GradientBoostingClassifier(n_estimators=50, random_state=42, verbose=1)
-    model.fit(X_train, y_train)
-    joblib.dump(model, "models/gb_model.pkl")
-    return model
+    return _fit_and_save('gb', X_train, y_train, registry, metadata, model_params)
 
 
-def train_mlp(X_train, y_train):
+def train_mlp(X_train, y_train, registry=None, model_params=None, **metadata):
     print("Training: Multi-layer Perceptron")
-    model = MLPClassifier(max_iter=130, batch_size=1000, alpha=1e-4,
-                          activation='relu', solver='adam', verbose=10, random_state=42)
-    model.fit(X_train, y_train)
-    joblib.dump(model, "models/mlp_model.pkl")
-    return model
+    return _fit_and_save('mlp', X_train, y_train, registry, metadata, model_params)
 
 
 # def train_keras_nn(X_train, y_train, X_test, y_test):
@@ -95,15 +159,25 @@ def train_mlp(X_train, y_train):
 
 if __name__ == "__main__":
     start = time.time()
-    X_train, y_train, X_test, y_test, scaler = load_data("data/processed/train70_reduced.csv", "data/processed/test30_reduced.csv")
+    X_train, y_train, X_test, y_test, scaler, encoder = load_data_cached("data/processed/train70_reduced.csv", "data/processed/test30_reduced.csv")
     joblib.dump(scaler, "models/scaler.pkl")
+    joblib.dump(encoder, "models/encoder.pkl")
+
+    # models/registry 에 버전별로도 등록 (encoder / scaler 는 내용 해시로 한 번만 저장)
+    registry = ModelRegistry()
+    metadata = {'preprocessors': registry.register_preprocessors(encoder, scaler),
+                'feature_columns': encoder.feature_columns}
+
+    # hyperparameter_search 로 찾은 파라미터가 있으면 사용 (없으면 build_model 의 기본값)
+    tuned = load_tuned_params()
 
     # 선택적으로 원하는 모델 학습 실행
-    rf_model = train_random_forest(X_train, y_train)
-    dt_model = train_decision_tree(X_train, y_train)
-    nb_model = train_naive_bayes(X_train, y_train)
-    gb_model = train_gradient_boost(X_train, y_train)
-    mlp_model = train_mlp(X_train, y_train)
+    rf_model = train_random_forest(X_train, y_train, registry, tuned.get('rf'), **metadata)
+    dt_model = train_decision_tree(X_train, y_train, registry, tuned.get('dt'), **metadata)
+    nb_model = train_naive_bayes(X_train, y_train, registry, tuned.get('nb'), **metadata)
+    gb_model = train_gradient_boost(X_train, y_train, registry, tuned.get('gb'), **metadata)
+    mlp_model = train_mlp(X_train, y_train, registry, tuned.get('mlp'), **metadata)
     #keras_model = train_keras_nn(X_train, y_train, X_test, y_test)
+    # 여러 모델을 동시에 학습하려면: python train_orchestrator.py
 
     print("✅ All models trained and saved.")
@@ -0,0 +1,244 @@
+# src/train_orchestrator.py
+"""
+여러 모델을 동시에 학습하는 오케스트레이터.
+
+- 모델마다 코어 예산을 정하고 (기본: n_jobs 를 쓰는 rf 는 남는 코어 전부, 나머지는 1개),
+  실행 중인 모델들의 예산 합이 --cores 를 넘지 않는 범위에서 동시에 실행합니다.
+- 각 모델은 별도 프로세스 (spawn, 작업 하나마다 새 프로세스) 에서 학습하고,
+  threadpoolctl 로 BLAS/OpenMP 스레드도 예산에 맞춥니다.
+- 학습 행렬은 pickle 로 복사해 넘기지 않고 .npy 경로만 넘겨 worker 가 읽기 전용 memmap 으로 엽니다.
+  (feature_cache 의 캐시 파일을 그대로 쓰므로 모든 worker 가 같은 페이지 캐시를 공유)
+- 모델별 학습 시간, peak RSS, 저장된 모델 크기를 run summary JSON 으로 남깁니다.
+- 학습한 모델은 model_registry 에도 새 버전으로 등록합니다 (--no-registry 로 끔).
+- hyperparameter_search 가 저장한 tuned params (--params) 가 있으면 그 파라미터로 학습합니다.
+
+    python train_orchestrator.py --models rf dt nb gb mlp --cores 8
+"""
+import argparse
+import json
+import multiprocessing
+import os
+import resource
+import tempfile
+import time
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+
+import joblib
+import numpy as np
+
+from model_registry import DEFAULT_REGISTRY_DIR, ModelRegistry
+from train_model import MODEL_SPECS, TUNED_PARAMS_PATH, build_model, load_data_cached, load_tuned_params, save_model
+
+DEFAULT_SUMMARY_PATH = 'models/training_summary.json'
+
+
+def plan_core_budgets(models, total_cores, overrides=None):
+    """
+    모델별 코어 수를 정합니다. overrides ({name: cores}) 가 우선이고,
+    병렬 모델은 직렬 모델에 1개씩 준 나머지를 나눠 갖습니다 (최소 1).
+    """
+    overrides = overrides or {}
+    budgets = {name: overrides[name] for name in models if name in overrides}
+    serial = [name for name in models if name not in budgets and not MODEL_SPECS[name]['parallel']]
+    parallel = [name for name in models if name not in budgets and MODEL_SPECS[name]['parallel']]
+    for name in serial:
+        budgets[name] = 1
+    if parallel:
+        remaining = total_cores - sum(budgets.values())
+        share = max(1, remaining // len(parallel))
+        for name in parallel:
+            budgets[name] = share
+    return {name: min(max(1, budgets[name]), total_cores) for name in models}
+
+
+def _as_npy_path(array, tmp_dir, name):
+    """array 가 .npy 파일 전체의 memmap 이면 그 파일 경로를, 아니면 tmp_dir 에 .npy 로 한 번 써서 그 경로를 반환합니다."""
+    filename = getattr(array, 'filename', None)
+    if isinstance(array, np.memmap) and filename and filename.endswith('.npy'):
+        on_disk = np.load(filename, mmap_mode='r')
+        if on_disk.shape == array.shape and on_disk.dtype == array.dtype:
+            return filename
+    path = os.path.join(tmp_dir, f'{name}.npy')
+    np.save(path, np.ascontiguousarray(array))
+    return path
+
+
+def _peak_rss_mb():
+    # Linux 의 ru_maxrss 는 KB 단위 (memmap 으로 읽은 페이지도 포함)
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024.0
+
+
+def _train_model_job(name, X_path, y_path, cores, output_dir, registry_root=None, registry_metadata=None,
+                     model_params=None):
+    """
+    worker 프로세스: memmap 입력으로 모델 하나를 학습하고 저장한 뒤 측정값 dict 를 반환합니다.
+    registry_root 를 주면 registry_metadata (preprocessors, feature_columns) 와 측정값으로 registry 에 등록합니다.
+    model_params 는 build_model 의 기본 파라미터 위에 덮어쓸 파라미터입니다.
+    """
+    from threadpoolctl import threadpool_limits
+
+    X_train = np.load(X_path, mmap_mode='r')
+    y_train = np.load(y_path, mmap_mode='r')
+    spec = MODEL_SPECS[name]
+    path = os.path.join(output_dir, os.path.basename(spec['path']))
+    compiled_path = os.path.join(output_dir, os.path.basename(spec['compiled_path'])) if spec['compiled_path'] else None
+    print(f"[{name}] Training {spec['label']} on {X_train.shape[0]} rows with {cores} core(s) (pid {os.getpid()})")
+    with threadpool_limits(limits=cores):
+        model = build_model(name, n_jobs=cores, params=model_params)
+        start = time.perf_counter()
+        model.fit(X_train, y_train)
+        fit_seconds = time.perf_counter() - start
+    registry = ModelRegistry(registry_root) if registry_root else None
+    metrics = {'fit_seconds': round(fit_seconds, 3), 'train_rows': int(X_train.shape[0]), 'cores': cores,
+               'peak_rss_mb': round(_peak_rss_mb(), 1)}
+    registered = save_model(name, model, path=path, compiled_path=compiled_path, registry=registry,
+                            metrics=metrics, **(registry_metadata or {}))
+    return {
+        'model': name,
+        'label': spec['label'],
+        'cores': cores,
+        'fit_seconds': metrics['fit_seconds'],
+        'peak_rss_mb': metrics['peak_rss_mb'],
+        'model_bytes': os.path.getsize(path),
+        'compiled_bytes': os.path.getsize(compiled_path) if compiled_path else None,
+        'path': path,
+        'registry_version': registered['version'] if registered else None,
+        'pid': os.getpid(),
+        'error': None,
+    }
+
+
+def train_models(X_train, y_train, models, total_cores=None, core_overrides=None, output_dir='models',
+                 summary_path=DEFAULT_SUMMARY_PATH, registry_root=None, registry_metadata=None, model_params=None):
+    """
+    models 를 코어 예산 안에서 동시에 학습하고 run summary (dict) 를 반환 / summary_path 에 저장합니다.
+    X_train 이 feature_cache 의 memmap 이면 그 파일을 그대로 worker 에 넘깁니다.
+    registry_root 를 주면 학습한 모델을 그 registry 에 등록합니다.
+    model_params ({name: params}, 예: load_tuned_params()) 에 있는 모델은 그 파라미터로 학습합니다.
+    """
+    models = list(dict.fromkeys(models))
+    unknown = [name for name in models if name not in MODEL_SPECS]
+    if unknown:
+        raise ValueError(f"Unknown model(s) {unknown}. Expected some of {list(MODEL_SPECS)}.")
+    total_cores = total_cores or os.cpu_count() or 1
+    budgets = plan_core_budgets(models, total_cores, core_overrides)
+    os.makedirs(output_dir, exist_ok=True)
+    print(f"Training {len(models)} model(s) with {total_cores} core(s): "
+          + ', '.join(f"{name}={budgets[name]}" for name in models))
+
+    run_start = time.time()
+    results = {}
+    with tempfile.TemporaryDirectory(prefix='train_inputs_') as tmp_dir:
+        X_path = _as_npy_path(X_train, tmp_dir, 'X_train')
+        y_path = _as_npy_path(np.asarray(y_train), tmp_dir, 'y_train')
+        pending = list(models)
+        running = {}
+        cores_in_use = 0
+        # max_tasks_per_child=1: 모델마다 새 프로세스 -> peak RSS 가 모델별 값이 되고 메모리도 바로 반환됨
+        with ProcessPoolExecutor(max_workers=len(models), mp_context=multiprocessing.get_context('spawn'),
+                                 max_tasks_per_child=1) as executor:
+            while pending or running:
+                # 예산이 남는 동안 순서대로 시작 (아무것도 안 돌고 있으면 예산보다 커도 시작)
+                while pending and (not running or cores_in_use + budgets[pending[0]] <= total_cores):
+                    name = pending.pop(0)
+                    future = executor.submit(_train_model_job, name, X_path, y_path, budgets[name], output_dir,
+                                             registry_root, registry_metadata, (model_params or {}).get(name))
+                    running[future] = (name, time.time())
+                    cores_in_use += budgets[name]
+                done, _ = wait(running, return_when=FIRST_COMPLETED)
+                for future in done:
+                    name, started_at = running.pop(future)
+                    cores_in_use -= budgets[name]
+                    try:
+                        result = future.result()
+                    except Exception as e:
+                        result = {'model': name, 'label': MODEL_SPECS[name]['label'], 'cores': budgets[name],
+                                  'error': f"{type(e).__name__}: {e}"}
+                        print(f"[{name}] Training failed: {result['error']}")
+                    result['wall_seconds'] = round(time.time() - started_at, 3)
+                    results[name] = result
+                    if result['error'] is None:
+                        print(f"[{name}] done: fit {result['fit_seconds']:.1f}s, peak RSS {result['peak_rss_mb']:.0f} MB, "
+                              f"model {result['model_bytes'] / (1024 * 1024):.1f} MB")
+
+    summary = {
+        'started_at': time.strftime('%Y-%m-%dT%H:%M:%S', time.localtime(run_start)),
+        'total_seconds': round(time.time() - run_start, 3),
+        'total_cores': total_cores,
+        'train_rows': int(X_train.shape[0]),
+        'train_features': int(X_train.shape[1]),
+        'models': [results[name] for name in models],
+    }
+    if summary_path:
+        summary_dir = os.path.dirname(summary_path)
+        if summary_dir:
+            os.makedirs(summary_dir, exist_ok=True)
+        with open(summary_path, 'w', encoding='utf-8') as f:
+            json.dump(summary, f, indent=2)
+        print(f"Run summary written to {summary_path}")
+    return summary
+
+
+def print_summary(summary):
+    print("\n" + "=" * 78)
+    print(f"{'model':<8}{'cores':>6}{'fit (s)':>10}{'wall (s)':>10}{'peak RSS (MB)':>15}{'size (MB)':>11}  status")
+    for result in summary['models']:
+        if result['error']:
+            print(f"{result['model']:<8}{result['cores']:>6}{'':>10}{result['wall_seconds']:>10.1f}{'':>15}{'':>11}  {result['error']}")
+            continue
+        print(f"{result['model']:<8}{result['cores']:>6}{result['fit_seconds']:>10.1f}{result['wall_seconds']:>10.1f}"
+              f"{result['peak_rss_mb']:>15.0f}{result['model_bytes'] / (1024 * 1024):>11.1f}  ok")
+    print(f"Total: {summary['total_seconds']:.1f}s on {summary['total_cores']} core(s)")
+    print("=" * 78)
+
+
+def _parse_overrides(values):
+    overrides = {}
+    for value in values or []:
+        name, _, cores = value.partition('=')
+        overrides[name] = int(cores)
+    return overrides
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Train several models concurrently on memory-mapped data")
+    parser.add_argument('--train', default="data/processed/train70_reduced.csv")
+    parser.add_argument('--test', default="data/processed/test30_reduced.csv")
+    parser.add_argument('--models', nargs='+', default=list(MODEL_SPECS), help=f"학습할 모델 ({', '.join(MODEL_SPECS)})")
+    parser.add_argument('--cores', type=int, default=None, help="전체 코어 예산 (기본값: os.cpu_count())")
+    parser.add_argument('--model-cores', nargs='*', default=None, metavar='NAME=N',
+                        help="모델별 코어 수 지정 (예: rf=6 gb=1)")
+    parser.add_argument('--output-dir', default='models')
+    parser.add_argument('--summary', default=DEFAULT_SUMMARY_PATH, help="run summary JSON 경로")
+    parser.add_argument('--registry', default=DEFAULT_REGISTRY_DIR, help="모델 registry 디렉터리")
+    parser.add_argument('--no-registry', action='store_true', help="registry 에 등록하지 않음")
+    parser.add_argument('--params', default=TUNED_PARAMS_PATH,
+                        help="hyperparameter_search 가 저장한 tuned params JSON (없으면 기본 파라미터)")
+    parser.add_argument('--default-params', action='store_true', help="tuned params 를 쓰지 않고 기본 파라미터로 학습")
+    args = parser.parse_args(argv)
+
+    X_train, y_train, _, _, scaler, encoder = load_data_cached(args.train, args.test)
+    os.makedirs(args.output_dir, exist_ok=True)
+    joblib.dump(scaler, os.path.join(args.output_dir, 'scaler.pkl'))
+    joblib.dump(encoder, os.path.join(args.output_dir, 'encoder.pkl'))
+    registry_root = registry_metadata = None
+    if not args.no_registry:
+        registry_root = args.registry
+        registry_metadata = {'preprocessors': ModelRegistry(registry_root).register_preprocessors(encoder, scaler),
+                             'feature_columns': encoder.feature_columns}
+
+    model_params = {} if args.default_params else load_tuned_params(args.params)
+    for name in args.models:
+        if name in model_params:
+            print(f"[{name}] Using tuned parameters: {model_params[name]}")
+
+    summary = train_models(X_train, y_train, args.models, total_cores=args.cores,
+                           core_overrides=_parse_overrides(args.model_cores), output_dir=args.output_dir,
+                           summary_path=args.summary, registry_root=registry_root, registry_metadata=registry_metadata,
+                           model_params=model_params)
+    print_summary(summary)
+    return 0 if all(result['error'] is None for result in summary['models']) else 1
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,265 @@
+# src/tree_compiler.py
+"""
+학습된 sklearn 트리 모델 (DecisionTree / RandomForest / GradientBoosting 분류기) 을
+연속된 NumPy 노드 배열로 펼쳐 저장하고, 배치 단위로 벡터화해서 순회하는 예측기.
+
+- 모든 트리의 노드를 하나의 배열 (feature, threshold, left, right, value) 로 이어 붙입니다.
+  leaf 는 left == right == 자기 자신 으로 표시합니다.
+- 한 번에 (행 chunk x 전체 트리) 를 같이 한 단계씩 내려가고, leaf 에 도달한 칸은 빼 나가므로
+  반복 횟수는 가장 깊은 경로 길이, 작업량은 실제 경로 길이의 합입니다.
+- sklearn 과 같이 입력을 float32 로 바꾼 뒤 float64 threshold 와 비교하므로 예측이 동일합니다.
+- .npz 하나로 저장되어 pickle 된 sklearn 모델보다 작고 빨리 로드됩니다.
+  save_arrays / load_arrays 는 배열마다 .npy 로 저장하고 mmap_mode 로 열어, 같은 모델을 쓰는 여러 프로세스가
+  (순회용 파생 배열까지) 페이지 캐시를 공유합니다 (model_registry 가 사용).
+- 한 번 호출의 고정 비용이 작아서 빠른 것은 작은 batch 뿐이고, 큰 batch 에서는 sklearn 의 Cython 순회가 더 빠릅니다.
+  benchmarks/bench_tree_inference.py (30 features, 1 core) 측정, sklearn 대비 속도:
+      batch          1      16      64     256    4096
+      DecisionTree  0.6x   0.4x   0.4x   0.4x   0.3x   (항상 느림)
+      RandomForest  8.0x   3.7x   1.9x   0.9x   0.3x   (100 trees)
+      GradientBoost 5.0x   1.5x   0.8x   0.4x   0.2x   (300 trees, depth 3)
+  sklearn 이 n_jobs 로 여러 코어를 쓰면 차이는 더 커지므로, prefer_compiled 는 측정한 손익분기보다
+  작은 batch (COMPILED_MAX_BATCH) 에서만 compiled 를 고릅니다.
+"""
+import json
+import os
+
+import numpy as np
+
+KIND_TREE = 'tree'
+KIND_FOREST = 'forest'
+KIND_GRADIENT_BOOSTING = 'gradient_boosting'
+
+# compiled 예측이 sklearn 보다 빠른 최대 batch 크기 (위 측정의 손익분기보다 한 단계 작게, DecisionTree 는 없음)
+COMPILED_MAX_BATCH = {KIND_TREE: 0, KIND_FOREST: 64, KIND_GRADIENT_BOOSTING: 16}
+
+_KIND_BY_CLASS = {'DecisionTreeClassifier': KIND_TREE, 'RandomForestClassifier': KIND_FOREST,
+                  'GradientBoostingClassifier': KIND_GRADIENT_BOOSTING}
+
+# save_arrays / load_arrays 로 저장하는 노드 배열 (파생 배열 is_leaf / children 포함)
+_ARRAY_NAMES = ('feature', 'threshold', 'left', 'right', 'missing_go_to_left', 'value', 'roots', 'is_leaf', 'children')
+
+# 한 번에 순회하는 (행 수 x 트리 수) 상한. 중간 배열이 CPU 캐시에 머물 정도로 작게 유지합니다.
+_MAX_CELLS_PER_CHUNK = 1 << 18
+
+
+def _flatten_trees(estimators, node_values):
+    """sklearn Tree 목록을 이어 붙인 노드 배열 dict 로 만듭니다. node_values(tree) 는 (n_nodes, n_outputs)."""
+    features, thresholds, lefts, rights, values, missing_left, roots, depths = [], [], [], [], [], [], [], []
+    offset = 0
+    for estimator in estimators:
+        tree = estimator.tree_
+        n_nodes = tree.node_count
+        node_ids = np.arange(n_nodes)
+        is_leaf = tree.children_left == -1
+        features.append(np.where(is_leaf, 0, tree.feature).astype(np.int32))
+        thresholds.append(np.where(is_leaf, np.inf, tree.threshold).astype(np.float64))
+        lefts.append((np.where(is_leaf, node_ids, tree.children_left) + offset).astype(np.int32))
+        rights.append((np.where(is_leaf, node_ids, tree.children_right) + offset).astype(np.int32))
+        missing = getattr(tree, 'missing_go_to_left', None)
+        missing_left.append(np.zeros(n_nodes, dtype=bool) if missing is None else np.asarray(missing, dtype=bool))
+        values.append(node_values(tree))
+        roots.append(offset)
+        depths.append(tree.max_depth)
+        offset += n_nodes
+    return {
+        'feature': np.concatenate(features),
+        'threshold': np.concatenate(thresholds),
+        'left': np.concatenate(lefts),
+        'right': np.concatenate(rights),
+        'missing_go_to_left': np.concatenate(missing_left),
+        'value': np.concatenate(values).astype(np.float64),
+        'roots': np.asarray(roots, dtype=np.int32),
+        'max_depth': int(max(depths)),
+    }
+
+
+def _class_proba(tree):
+    """노드별 클래스 비율 (sklearn DecisionTreeClassifier.predict_proba 와 같은 정규화)."""
+    value = tree.value[:, 0, :]
+    normalizer = value.sum(axis=1, keepdims=True)
+    normalizer[normalizer == 0.0] = 1.0
+    return value / normalizer
+
+
+def prefer_compiled(kind, batch_size):
+    """
+    batch_size 행씩 예측할 때 compiled 예측기가 sklearn 보다 빠른지 (COMPILED_MAX_BATCH 기준).
+    kind 는 CompiledTreeEnsemble.kind 또는 sklearn 클래스 이름 (model_registry 메타데이터의 model_class 도 가능).
+    """
+    kind = _KIND_BY_CLASS.get(str(kind).rsplit('.', 1)[-1], kind)
+    return batch_size <= COMPILED_MAX_BATCH.get(kind, 0)
+
+
+def compile_tree_model(model):
+    """fit 된 DecisionTreeClassifier / RandomForestClassifier / GradientBoostingClassifier 를 변환합니다."""
+    from sklearn.ensemble import GradientBoostingClassifier, RandomForestClassifier
+    from sklearn.tree import DecisionTreeClassifier
+
+    if isinstance(model, DecisionTreeClassifier):
+        kind, arrays, extra = KIND_TREE, _flatten_trees([model], _class_proba), {}
+    elif isinstance(model, RandomForestClassifier):
+        kind, arrays, extra = KIND_FOREST, _flatten_trees(model.estimators_, _class_proba), {}
+    elif isinstance(model, GradientBoostingClassifier):
+        if model.init_ != 'zero' and type(model.init_).__name__ != 'DummyClassifier':
+            raise ValueError("Only GradientBoostingClassifier with the default (prior) or 'zero' init can be compiled.")
+        # stage 마다 클래스 수 (이진 분류는 1) 만큼의 회귀 트리. learning_rate 를 leaf 값에 미리 곱해 둠
+        estimators = model.estimators_.ravel()
+        arrays = _flatten_trees(estimators, lambda tree: tree.value[:, 0, :1] * model.learning_rate)
+        n_features = model.n_features_in_
+        # prior/zero init 은 입력과 무관한 상수
+        init_raw = model._raw_predict_init(np.zeros((1, n_features), dtype=np.float32))[0]
+        kind = KIND_GRADIENT_BOOSTING
+        extra = {'init_raw': np.asarray(init_raw, dtype=np.float64),
+                 'trees_per_stage': model.estimators_.shape[1]}
+    else:
+        raise TypeError(f"Unsupported model type for compilation: {type(model).__name__}")
+    return CompiledTreeEnsemble(kind, model.classes_, model.n_features_in_, arrays, **extra)
+
+
+class CompiledTreeEnsemble:
+    def __init__(self, kind, classes, n_features, arrays, init_raw=None, trees_per_stage=1):
+        self.kind = kind
+        self.classes_ = np.asarray(classes)
+        self.n_features_in_ = int(n_features)
+        self.feature = arrays['feature']
+        self.threshold = arrays['threshold']
+        self.left = arrays['left']
+        self.right = arrays['right']
+        self.missing_go_to_left = arrays['missing_go_to_left']
+        self.value = arrays['value']
+        self.roots = arrays['roots']
+        self.max_depth = int(arrays['max_depth'])
+        self.init_raw = init_raw
+        self.trees_per_stage = int(trees_per_stage)
+        self._has_missing_rule = bool(self.missing_go_to_left.any())
+        if 'children' in arrays:
+            # load_arrays: 저장해 둔 파생 배열 (memmap) 을 그대로 사용
+            self.is_leaf, self.children = arrays['is_leaf'], arrays['children']
+            return
+        # 순회용 파생 배열: 노드 i 의 자식은 children[2i] (왼쪽) / children[2i + 1] (오른쪽).
+        # 자식이 leaf 면 ~번호 (음수) 로 저장해 leaf 여부를 추가 조회 없이 판별
+        self.is_leaf = self.left == np.arange(len(self.left))
+        children = np.column_stack([self.left, self.right]).ravel()
+        self.children = np.where(self.is_leaf[children], ~children, children).astype(np.int32)
+
+    @property
+    def n_trees(self):
+        return len(self.roots)
+
+    def _leaves(self, X):
+        """X (n, n_features, float32, C 연속) 의 각 행이 트리마다 도달하는 leaf 노드 번호 (n, n_trees)."""
+        n_rows, n_trees = len(X), self.n_trees
+        X_flat = X.ravel()
+        leaves = np.tile(self.roots, n_rows)
+        # 아직 leaf 에 도달하지 않은 (행, 트리) 칸만 남겨 가며 한 단계씩 내려감
+        cells = np.flatnonzero(~self.is_leaf[leaves]).astype(np.int32)
+        nodes = leaves[cells]
+        row_offsets = (cells // n_trees) * np.int32(self.n_features_in_)
+        while len(cells):
+            x = X_flat[row_offsets + self.feature[nodes]]
+            go_right = ~(x <= self.threshold[nodes])
+            if self._has_missing_rule:
+                go_right &= ~(np.isnan(x) & self.missing_go_to_left[nodes])
+            nodes = self.children[2 * nodes + go_right]
+            done = nodes < 0
+            if done.any():
+                leaves[cells[done]] = ~nodes[done]
+                keep = ~done
+                cells, nodes, row_offsets = cells[keep], nodes[keep], row_offsets[keep]
+        return leaves.reshape(n_rows, n_trees)
+
+    def _aggregate(self, X):
+        X = np.ascontiguousarray(X, dtype=np.float32)
+        if X.ndim != 2 or X.shape[1] != self.n_features_in_:
+            raise ValueError(f"X has shape {X.shape}; expected (n_samples, {self.n_features_in_}).")
+        chunk_rows = max(1, _MAX_CELLS_PER_CHUNK // max(1, self.n_trees))
+        n_outputs = self.trees_per_stage if self.kind == KIND_GRADIENT_BOOSTING else self.value.shape[1]
+        out = np.empty((len(X), n_outputs), dtype=np.float64)
+        for start in range(0, len(X), chunk_rows):
+            leaves = self._leaves(X[start:start + chunk_rows])
+            # sklearn 과 같은 순서로 트리 하나씩 더해야 부동소수 합이 동일함
+            if self.kind == KIND_GRADIENT_BOOSTING:
+                # 트리 순서: stage 0 의 클래스 0..K-1, stage 1 ... -> 클래스 별 누적
+                leaf_values = self.value[leaves, 0].reshape(len(leaves), -1, self.trees_per_stage)
+                acc = np.broadcast_to(self.init_raw, (len(leaves), n_outputs)).copy()
+                for stage in range(leaf_values.shape[1]):
+                    acc += leaf_values[:, stage]
+            else:
+                acc = self.value[leaves[:, 0]]
+                for tree in range(1, self.n_trees):
+                    acc += self.value[leaves[:, tree]]
+            out[start:start + len(leaves)] = acc
+        if self.kind == KIND_GRADIENT_BOOSTING:
+            return out
+        return out / self.n_trees
+
+    def predict_proba(self, X):
+        scores = self._aggregate(X)
+        if self.kind != KIND_GRADIENT_BOOSTING:
+            return scores
+        if scores.shape[1] == 1: # 이진 분류: log-odds
+            positive = 1.0 / (1.0 + np.exp(-scores[:, 0]))
+            return np.column_stack([1.0 - positive, positive])
+        scores = scores - scores.max(axis=1, keepdims=True)
+        exp = np.exp(scores)
+        return exp / exp.sum(axis=1, keepdims=True)
+
+    def predict(self, X):
+        scores = self._aggregate(X)
+        if self.kind == KIND_GRADIENT_BOOSTING and scores.shape[1] == 1:
+            return self.classes_[(scores[:, 0] > 0).astype(int)]
+        return self.classes_[np.argmax(scores, axis=1)]
+
+    def save(self, path):
+        meta = {'kind': self.kind, 'n_features': self.n_features_in_, 'max_depth': self.max_depth,
+                'trees_per_stage': self.trees_per_stage}
+        extra = {'init_raw': self.init_raw} if self.init_raw is not None else {}
+        np.savez(path, feature=self.feature, threshold=self.threshold, left=self.left, right=self.right,
+                 missing_go_to_left=self.missing_go_to_left, value=self.value, roots=self.roots,
+                 classes=self.classes_.astype(str) if self.classes_.dtype == object else self.classes_, meta=np.asarray(json.dumps(meta)), **extra)
+
+    @classmethod
+    def load(cls, path):
+        with np.load(path, allow_pickle=False) as data:
+            meta = json.loads(str(data['meta']))
+            arrays = {name: data[name] for name in
+                      ('feature', 'threshold', 'left', 'right', 'missing_go_to_left', 'value', 'roots')}
+            arrays['max_depth'] = meta['max_depth']
+            init_raw = data['init_raw'] if 'init_raw' in data.files else None
+            classes = data['classes']
+        return cls(meta['kind'], classes, meta['n_features'], arrays, init_raw=init_raw,
+                   trees_per_stage=meta['trees_per_stage'])
+
+    def save_arrays(self, directory):
+        """배열마다 directory/<이름>.npy 로 저장합니다 (파생 배열 포함, load_arrays 로 memory-map 가능)."""
+        os.makedirs(directory, exist_ok=True)
+        arrays = {name: getattr(self, name) for name in _ARRAY_NAMES}
+        arrays['classes'] = self.classes_.astype(str) if self.classes_.dtype == object else self.classes_
+        if self.init_raw is not None:
+            arrays['init_raw'] = self.init_raw
+        for name, array in arrays.items():
+            np.save(os.path.join(directory, f'{name}.npy'), np.ascontiguousarray(array))
+        meta = {'kind': self.kind, 'n_features': self.n_features_in_, 'max_depth': self.max_depth,
+                'trees_per_stage': self.trees_per_stage}
+        with open(os.path.join(directory, 'meta.json'), 'w', encoding='utf-8') as f:
+            json.dump(meta, f)
+
+    @classmethod
+    def load_arrays(cls, directory, mmap_mode='r'):
+        """save_arrays 로 저장한 모델을 엽니다. mmap_mode='r' 이면 배열을 복사하지 않고 읽기 전용 memmap 으로 씁니다."""
+        with open(os.path.join(directory, 'meta.json'), 'r', encoding='utf-8') as f:
+            meta = json.load(f)
+        arrays = {name: np.load(os.path.join(directory, f'{name}.npy'), mmap_mode=mmap_mode) for name in _ARRAY_NAMES}
+        arrays['max_depth'] = meta['max_depth']
+        init_raw_path = os.path.join(directory, 'init_raw.npy')
+        init_raw = np.load(init_raw_path) if os.path.exists(init_raw_path) else None
+        return cls(meta['kind'], np.load(os.path.join(directory, 'classes.npy')), meta['n_features'], arrays,
+                   init_raw=init_raw, trees_per_stage=meta['trees_per_stage'])
+
+
+def export_compiled_model(model, path):
+    """모델을 변환해 path (.npz) 로 저장하고 CompiledTreeEnsemble 을 반환합니다."""
+    compiled = compile_tree_model(model)
+    compiled.save(path)
+    print(f"Exported compiled model ({compiled.kind}, {compiled.n_trees} trees, {len(compiled.feature)} nodes) to {path}")
+    return compiled